@@ -19,15 +19,28 @@ Reviewer:
 
 from framework.Test import Test
 from framework import api
-from framework.model.utility.connectivityImpairment import KImpairment
 from framework.model.utility.errorDetection import ErrorCheck
 from framework.model.utility.sdoLib import SDOLib
 from framework.model.application.linearTV.LinearTV import LinearTV
 from framework.model.utility.testUtil import handleTestException, defineStep, setStepStatus, resetStepNumber
 from framework.model.application.Application import Application
 from framework.model.utility.SDONavigator import SDONavigator
-from framework.factory.services.ADBLogsv2 import ADBLogs
 from framework.configs.slotInfo import slotInfo
+from testCaseUtils.adaptiveTimeouts import readFirmware
+from testCaseUtils.bootDetector import BootDetector
+from testCaseUtils.deviceAddress import checkDeviceAddress, describeAddressCheck
+from testCaseUtils.errorScreenCache import CachedErrorCheck
+from testCaseUtils.impairmentSession import getImpairmentSession
+from testCaseUtils.latencyMetrics import LatencyRecorder
+from testCaseUtils.logArchive import LogArchive
+from testCaseUtils.logcatStream import getLogcatStream
+from testCaseUtils.logStore import LogStore
+from testCaseUtils.motionEngine import MotionEngine
+from testCaseUtils.netemImpairment import createFilterLease
+from testCaseUtils.ocrCache import OcrCache, ETHERNET_IP_REGION
+from testCaseUtils.screenIndex import ScreenIdentifier
+from testCaseUtils.screenRecorder import ScreenRecorder
+from testCaseUtils.waitEngine import waitUntil, errorCodeCleared
 
 # Parmeters
 parameters = [
@@ -49,6 +62,18 @@ parameters = [
         "type": "boolean",
         "value": True,
         "description": "Detect motion continuously "
+    },
+    {
+        "name": "ocrAudit",
+        "type": "boolean",
+        "value": False,
+        "description": "Also open the network settings and read the Ethernet IP by OCR (slow audit of the adb check)"
+    },
+    {
+        "name": "impairmentBackend",
+        "type": "string",
+        "value": "kmax",
+        "description": "kmax, or netem[:<interface>] for tc/nftables on a local Linux bridge"
     }
 ]
 
@@ -56,12 +81,16 @@ t = Test(initialiseDUT=True, optionsDict=parameters, autoRecover=True)
 config = t.config
 application = Application(config)
 tv = LinearTV(config)
+motion = MotionEngine(tv)
+screens = ScreenIdentifier(tv)
 sdoLib = SDOLib()
-adbLogs = ADBLogs(verbose=True, port=5038)
 sodNavigator = SDONavigator()
 deviceIP = slotInfo[t.server][str(t.slotNo)]["ip"]
-kmaxImpairment = KImpairment(deviceIP=deviceIP)
-errorCheck = ErrorCheck()
+logcat = getLogcatStream(deviceIP, port=5038)
+bootDetector = BootDetector(logcat, motion)
+kmaxImpairment = getImpairmentSession(config.getConfigItem("impairmentBackend"), deviceIP)
+errorCheck = CachedErrorCheck(ErrorCheck())
+ocr = OcrCache()
 nav = tv.utility.navigator
 
 # Config File Parameter
@@ -69,43 +98,55 @@ slotNo = config.getConfigItem("slotNumber")
 server = config.getConfigItem("server")
 timesLoop = config.getConfigItem("times")
 ipKmax = config.getConfigItem("ipKmax")
-filterNo = (slotNo % 4) + 1
+filterLease = createFilterLease(kmaxImpairment, ipKmax, slotNo)
+filterNo = None
+metrics = LatencyRecorder("41.2", server, slotNo, firmware=readFirmware(deviceIP))
+logArchive = LogArchive(logcat, "41.2", slotNo)
+logStore = LogStore(logcat, "41.2", server, slotNo)
+defineStep = logStore.tracking(defineStep)
+recorder = ScreenRecorder(slotNo)
 
 # Dynamic Parameters
 reboot = config.getConfigItem("reboot")
 motionTime = (config.getConfigItem("motionTime"))
 verifySettings = (config.getConfigItem("verifySettings"))
+ocrAudit = config.getConfigItem("ocrAudit")
 
-# ============
-# STEP
-# ============
+try:
+    filterNo = filterLease.acquire()
+    recorder.start()
 
-step_name = "Precondition: Open Linear Channel"
-expected_result = "Precondition should be fulfilled"
-defineStep(step_name, step_name, expected_result)
+    # ============
+    # STEP
+    # ============
 
-kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-api.pressButtons(['OK', 'MENU', '5'], 3)
+    step_name = "Precondition: Open Linear Channel"
+    expected_result = "Precondition should be fulfilled"
+    defineStep(step_name, step_name, expected_result)
 
-result = tv.open('LiveScreen')
-api.writeDebugLine("Return values for tv.open(): {}".format(result))
-if result[0]:
-    setStepStatus(api.TM.PASS)
-else:
-    result = tv.checkUnExpectedScreen()
-    api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
+    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    api.pressButtons(['OK', 'MENU', '5'], 3)
 
-    if result[1] != 'Motion':
-        result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
-        api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
+    result = tv.open('LiveScreen')
+    api.writeDebugLine("Return values for tv.open(): {}".format(result))
+    if result[0]:
+        setStepStatus(api.TM.PASS)
+    else:
+        result = screens.checkUnExpectedScreen()
+        api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
 
-        if result is None or not result[0]:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
-            errorMessage = "Unexpected Screen. Cannot proceed...."
-            raise Exception(errorMessage)
+        if result[1] != 'Motion':
+            result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
+            api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
+
+            if result is None or not result[0]:
+                recorder.capture("Failure_Exception.png")
+                errorMessage = "Unexpected Screen. Cannot proceed...."
+                raise Exception(errorMessage)
 
-try:
     for iteration in range(1, int(timesLoop) + 1):
+        metrics.startIteration(iteration)
+        logStore.startIteration(iteration)
 
         # ============
         # STEP
@@ -130,7 +171,8 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         kmaxImpairment.switchImpairment_ON(impairment='DHCP', drop=0, delay=20, filterNo=filterNo)
-        api.waitSec(105)
+        metrics.markImpairmentOn(kmaxImpairment.lastToggleSeconds)
+        metrics.timeToError(errorCheck.waitForErrorCode('Code-0100', timeout=105))
         setStepStatus(api.TM.PASS)
 
         # ============
@@ -147,7 +189,7 @@ try:
             setStepStatus(api.TM.PASS)
         else:
             print('Not an error screen/Unknown error screen')
-            api.captureImageEx(None, "currentScreen.png")[0][2].Close()
+            recorder.capture("currentScreen.png")
             setStepStatus(api.TM.FAIL)
 
         # ============
@@ -158,23 +200,24 @@ try:
         expected_result = "Reset the KMAX and recover the error state"
         defineStep(step_name, step_name, expected_result)
 
+        dhcpAck = logcat.cursor()
         kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-        api.waitSec(180)
+        metrics.markImpairmentOff(kmaxImpairment.lastToggleSeconds)
+        metrics.timeToRecovery(waitUntil(errorCodeCleared(errorCheck), timeout=180, stableFor=10,
+                                         description="Error screen cleared"))
 
         errorResult = errorCheck.getErrorCode()
         print(errorResult)
         if errorResult[0]:
             print('DUT stuck in the error state')
-            api.powerOffSTB()
-            api.powerOnSTB()
-            api.waitSec(100)
+            metrics.bootDuration(bootDetector.powerCycle(timeout=100))
             api.pressButton('5', 5)
             setStepStatus(api.TM.FAIL)
         else:
-            api.waitSec(300)
+            dhcpAck.waitFor(tag="DhcpClient:D", search="ACK", timeout=300)
             api.writeDebugLine("Successfully recover from the error state")
             print('DHCP server ACK')
-            adbLogs.printGenericLogs(t.server, t.slotNo, tag="DhcpClient:D", search="ACK")
+            logcat.printGenericLogs(tag="DhcpClient:D", search="ACK")
             setStepStatus(api.TM.PASS)
 
         # ============
@@ -187,37 +230,37 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         if verifySettings:
-            nav.resetLastNavScreen()
-            nav.navigateTo("OpenSystemSetting")
-            api.waitSec(5)
-            api.pressButtons(["OK", "OK", "DOWN", "DOWN", "DOWN", "DOWN"], 5)
-            ethernetIP_rect = (2492, 1529, 265, 54)
-            region = api.ocrRegion("", "ethernetIP", rect=ethernetIP_rect, verify=False)
-            sdo = api.screenDefinition()
-            sdo.Regions.append(region)
-            returnSDO = sdo.Match()[0][1]
-            api.writeDebugLine("Actual IP: {}".format(returnSDO.Regions[0].ResultText))
+            addressCheck = checkDeviceAddress(deviceIP)
+            api.writeDebugLine(describeAddressCheck(addressCheck))
+            # the settings screen is read when adb does not answer or as an audit of the adb check
+            if ocrAudit or addressCheck.actual is None:
+                nav.resetLastNavScreen()
+                nav.navigateTo("OpenSystemSetting")
+                api.waitSec(5)
+                api.pressButtons(["OK", "OK", "DOWN", "DOWN", "DOWN", "DOWN"], 5)
+                ocrTexts = ocr.read([ETHERNET_IP_REGION])
+                api.writeDebugLine("Actual IP (settings): {}".format(ocrTexts["ethernetIP"]))
         api.pressButtons(['MENU', '5'], 10)
 
         checkForReady = False
-        screenStatus = tv.identifyScreen()
+        screenStatus = screens.identifyScreen()
         if screenStatus[1] == "LiveScreen":
             checkForReady = True
         elif screenStatus[1] == "parentalPIN":
             checkForReady = tv.verifyAndEnterParentalPin()[0]
             if not checkForReady:
-                api.captureImageEx(None, "parentalPIN.png")[0][2].Close()
+                recorder.capture("parentalPIN.png")
                 comments = "Unable to find livescreen after entering parental pin"
         elif screenStatus[1] in ["premiumChannel", "technicalErrorPage", "generalLinearStreamingError"]:
-            api.captureImageEx(None, "{}.png".format(screenStatus[1]))[0][2].Close()
+            recorder.capture("{}.png".format(screenStatus[1]))
             comments = screenStatus[1]
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             comments = "Unexpected Screen"
             api.pressButtons(['BACK', 'BACK', 'BACK'], 2)
 
         if checkForReady:
-            motionDetected, motionStatusList, successRate = tv.detectMotionContinuously(motionTime)
+            motionDetected, motionStatusList, successRate = motion.detectMotionContinuously(motionTime)
             api.writeDebugLine("DetectMotion:: " + str(motionDetected))
 
             if motionDetected:
@@ -226,12 +269,14 @@ try:
 
             else:
                 api.writeDebugLine("Motion Not Detected, success rate: {}".format(successRate))
-                api.captureImageEx(None, "MotionDetection_Failure.png")[0][2].Close()
+                recorder.capture("MotionDetection_Failure.png")
                 setStepStatus(api.TM.FAIL, "Motion detection failed. SuccessRate was {}".format(successRate))
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             setStepStatus(api.TM.FAIL, "Unexpected Screen")
 
+        metrics.emitIteration()
+        logArchive.markIteration(iteration)
         defineStep("Closing Iteration {}".format(str(iteration)), "Close test gracefully")
         if iteration != int(timesLoop):
             resetStepNumber()
@@ -250,12 +295,18 @@ try:
 
 
 except Exception as e:
-    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    if filterNo is not None:
+        kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
     print(e)
-    api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+    recorder.capture("Failure_Exception.png")
     handleTestException()
     api.returnTestResult(api.TM.FAIL)
 
 finally:
-    t.adb.saveAllLogs(server, slotNo)
+    logArchive.saveAllLogs(t.adb, server)
+    metrics.close()
+    logStore.close()
+    recorder.stop()
+    filterLease.release()
+    logArchive.close()
     t.disconnect()
@@ -17,15 +17,30 @@ Reviewer:
 
 """
 
+import time
+
 from framework.Test import Test
 from framework import api
 from framework.model.utility.sdoLib import SDOLib
 from framework.model.application.linearTV.LinearTV import LinearTV
 from framework.model.utility.testUtil import defineStep, setStepStatus, handleTestException, resetStepNumber
-from framework.model.utility.connectivityImpairment import KImpairment
 from framework.model.utility.errorDetection import ErrorCheck
-from framework.factory.services.ADBLogsv2 import ADBLogs
 from framework.configs.slotInfo import slotInfo
+from testCaseUtils.adaptiveTimeouts import readFirmware
+from testCaseUtils.bootDetector import BootDetector
+from testCaseUtils.dhcpStandIn import createDhcpStandIn
+from testCaseUtils.dhcpTimeline import DhcpLeaseMonitor, readUtcOffset
+from testCaseUtils.errorScreenCache import CachedErrorCheck
+from testCaseUtils.impairmentSession import getImpairmentSession
+from testCaseUtils.latencyMetrics import LatencyRecorder
+from testCaseUtils.logArchive import LogArchive
+from testCaseUtils.logcatStream import getLogcatStream
+from testCaseUtils.logStore import LogStore
+from testCaseUtils.motionEngine import MotionEngine
+from testCaseUtils.netemImpairment import createFilterLease
+from testCaseUtils.screenIndex import ScreenIdentifier
+from testCaseUtils.screenRecorder import ScreenRecorder
+from testCaseUtils.waitEngine import waitUntil, errorCodeCleared
 
 # Parmeters
 parameters = [
@@ -40,61 +55,98 @@ parameters = [
         "type": "int",
         "value": 10,
         "description": "Detect motion continuously "
+    },
+    {
+        "name": "impairmentBackend",
+        "type": "string",
+        "value": "kmax",
+        "description": "kmax, or netem[:<interface>] for tc/nftables on a local Linux bridge"
+    },
+    {
+        "name": "dhcpStandIn",
+        "type": "string",
+        "value": "",
+        "description": "<interface>[:<leaseSeconds>[:<router>[:<dns>,...]]] serves the DUT from a local DHCP server "
+                       "with short leases"
     }
 ]
 
 t = Test(initialiseDUT=True, optionsDict=parameters, autoRecover=True)
 config = t.config
 tv = LinearTV(config)
+motion = MotionEngine(tv)
+screens = ScreenIdentifier(tv)
 deviceIP = slotInfo[t.server][str(t.slotNo)]["ip"]
-kmaxImpairment = KImpairment(deviceIP=deviceIP)
-errorCheck = ErrorCheck()
+logcat = getLogcatStream(deviceIP, port=5038)
+utcOffset = readUtcOffset(deviceIP)
+bootDetector = BootDetector(logcat, motion)
+kmaxImpairment = getImpairmentSession(config.getConfigItem("impairmentBackend"), deviceIP)
+errorCheck = CachedErrorCheck(ErrorCheck())
 sdoLib = SDOLib()
 nav = tv.utility.navigator
-adbLogs = ADBLogs(verbose=True, port=5038)
 
 # Config File Parameters
 server = config.getConfigItem("server")
 slotNo = config.getConfigItem("slotNumber")
 timesLoop = config.getConfigItem("times")
 ipKmax = config.getConfigItem("ipKmax")
-filterNo = (slotNo % 4) + 1
+filterLease = createFilterLease(kmaxImpairment, ipKmax, slotNo)
+filterNo = None
+metrics = LatencyRecorder("41.3", server, slotNo, firmware=readFirmware(deviceIP))
+logArchive = LogArchive(logcat, "41.3", slotNo)
+logStore = LogStore(logcat, "41.3", server, slotNo)
+defineStep = logStore.tracking(defineStep)
+recorder = ScreenRecorder(slotNo)
+# the stand-in drops its own replies, the production server is not used while it runs
+dhcpServer = createDhcpStandIn(config.getConfigItem("dhcpStandIn"), deviceIP,
+                               clientMac=slotInfo[t.server][str(t.slotNo)].get("mac"))
+dhcpImpairment = kmaxImpairment
+renewalTimeout = 265
+if dhcpServer is not None:
+    dhcpImpairment = dhcpServer
+    renewalTimeout = dhcpServer.leaseSeconds // 2 + 15
 
 # Dynamic Parameter
 reboot = config.getConfigItem("reboot")
 motionTime = (config.getConfigItem("motionTime"))
 
+try:
+    filterNo = filterLease.acquire()
+    recorder.start()
+    if dhcpServer is not None:
+        dhcpServer.start()
 
-# ============
-# STEP
-# ============
+    # ============
+    # STEP
+    # ============
 
-step_name = "Precondition: Open Linear Channel"
-expected_result = "Precondition should be fulfilled"
-defineStep(step_name, step_name, expected_result)
+    step_name = "Precondition: Open Linear Channel"
+    expected_result = "Precondition should be fulfilled"
+    defineStep(step_name, step_name, expected_result)
 
-kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-api.pressButtons(['OK', 'MENU', '5'], 3)
+    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    api.pressButtons(['OK', 'MENU', '5'], 3)
 
-result = tv.open('LiveScreen')
-api.writeDebugLine("Return values for tv.open(): {}".format(result))
-if result[0]:
-    setStepStatus(api.TM.PASS)
-else:
-    result = tv.checkUnExpectedScreen()
-    api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
+    result = tv.open('LiveScreen')
+    api.writeDebugLine("Return values for tv.open(): {}".format(result))
+    if result[0]:
+        setStepStatus(api.TM.PASS)
+    else:
+        result = screens.checkUnExpectedScreen()
+        api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
 
-    if result[1] != 'Motion':
-        result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
-        api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
+        if result[1] != 'Motion':
+            result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
+            api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
 
-        if result is None or not result[0]:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
-            errorMessage = "Unexpected Screen. Cannot proceed...."
-            raise Exception(errorMessage)
+            if result is None or not result[0]:
+                recorder.capture("Failure_Exception.png")
+                errorMessage = "Unexpected Screen. Cannot proceed...."
+                raise Exception(errorMessage)
 
-try:
     for iteration in range(1, int(timesLoop) + 1):
+        metrics.startIteration(iteration)
+        logStore.startIteration(iteration)
 
         # ============
         # STEP
@@ -104,15 +156,13 @@ try:
         expected_result = "Linear Channel should be played and motion should be detected continuously"
         defineStep(step_name, step_name, expected_result)
         if reboot:
-            api.powerOffSTB()
-            api.powerOnSTB()
-            api.waitSec(100)
+            metrics.bootDuration(bootDetector.powerCycle(timeout=100))
         else:
             print("No need to reboot")
 
         api.pressButtons(['MENU', '5'], 10)
 
-        motion_result = tv.isMotion()
+        motion_result = motion.isMotion()
         api.writeDebugLine("Result::{}".format(motion_result))
 
         if motion_result[0]:
@@ -127,13 +177,15 @@ try:
         expected_result = "Set up network impairment as per filter"
         defineStep(step_name, step_name, expected_result)
 
-        kmaxImpairment.switchImpairment_ON(impairment='DHCP', drop=100, filterNo=filterNo)
+        dhcp = DhcpLeaseMonitor(logcat.cursor(), utcOffset=utcOffset)
+        dhcpImpairment.switchImpairment_ON(impairment='DHCP', drop=100, filterNo=filterNo)
+        metrics.markImpairmentOn(dhcpImpairment.lastToggleSeconds)
 
-        api.waitSec(220)
         print("DHCP Request Message ")
-        for x in range(6):
-            api.waitSec(45)
-            adbLogs.printGenericLogs(t.server, t.slotNo, tag="DhcpClient:D", search="DHCPREQUEST")
+        retries = dhcp.waitForRetryPattern("REQUEST", minRetries=3, maxRetries=5, firstTimeout=renewalTimeout,
+                                           timeout=45)
+        api.writeDebugLine("DHCPREQUEST retries {} after {}s, intervals {}, confirmed {}".format(
+            retries.retries, retries.elapsed, retries.intervals, retries.confirmed))
 
         setStepStatus(api.TM.PASS)
 
@@ -145,7 +197,7 @@ try:
         expected_result = "Error code 0100 on the screen"
         defineStep(step_name, step_name, expected_result)
 
-        api.waitSec(60)
+        metrics.timeToError(errorCheck.waitForErrorCode('Code-0100', timeout=60 + retries.unusedSeconds))
 
         errorResult = errorCheck.getErrorCode()
         print(errorResult)
@@ -163,16 +215,23 @@ try:
         expected_result = "Reset the KMAX and recover the error state"
         defineStep(step_name, step_name, expected_result)
 
-        kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-        api.waitSec(180)
+        impairmentOffAt = time.monotonic()
+        dhcpImpairment.switchImpairment_OFF(filterNo=filterNo)
+        metrics.markImpairmentOff(dhcpImpairment.lastToggleSeconds)
+        metrics.timeToRecovery(waitUntil(errorCodeCleared(errorCheck), timeout=180, stableFor=10,
+                                         description="Error screen cleared"))
+        dhcp.update()
+        dhcpAck = dhcp.firstEvent("ACK", after=impairmentOffAt)
+        if dhcpAck is not None:
+            metrics.markEvent("dhcpAck", since="impairmentOff", at=dhcp.monotonic(dhcpAck))
+        for line in dhcp.report():
+            api.writeDebugLine(line)
         errorResult = errorCheck.getErrorCode()
         print(errorResult)
         if errorResult[0]:
             print("DUT stuck in the error state")
-            api.captureImageEx(None, "currentScreen.png")[0][2].Close()
-            api.powerOffSTB()
-            api.powerOnSTB()
-            api.waitSec(100)
+            recorder.capture("currentScreen.png")
+            metrics.bootDuration(bootDetector.powerCycle(timeout=100))
             api.pressButton("5", 10)
             setStepStatus(api.TM.FAIL)
 
@@ -192,24 +251,24 @@ try:
         api.pressButtons(['MENU', '5'], 10)
 
         checkForReady = False
-        screenStatus = tv.identifyScreen()
+        screenStatus = screens.identifyScreen()
         if screenStatus[1] == "LiveScreen":
             checkForReady = True
         elif screenStatus[1] == "parentalPIN":
             checkForReady = tv.verifyAndEnterParentalPin()[0]
             if not checkForReady:
-                api.captureImageEx(None, "parentalPIN.png")[0][2].Close()
+                recorder.capture("parentalPIN.png")
                 comments = "Unable to find livescreen after entering parental pin"
         elif screenStatus[1] in ["premiumChannel", "technicalErrorPage", "generalLinearStreamingError"]:
-            api.captureImageEx(None, "{}.png".format(screenStatus[1]))[0][2].Close()
+            recorder.capture("{}.png".format(screenStatus[1]))
             comments = screenStatus[1]
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             comments = "Unexpected Screen"
             api.pressButtons(['BACK', 'BACK', 'BACK'], 2)
 
         if checkForReady:
-            motionDetected, motionStatusList, successRate = tv.detectMotionContinuously(motionTime)
+            motionDetected, motionStatusList, successRate = motion.detectMotionContinuously(motionTime)
             api.writeDebugLine("DetectMotion:: " + str(motionDetected))
 
             if motionDetected:
@@ -218,12 +277,14 @@ try:
 
             else:
                 api.writeDebugLine("Motion Not Detected, success rate: {}".format(successRate))
-                api.captureImageEx(None, "MotionDetection_Failure.png")[0][2].Close()
+                recorder.capture("MotionDetection_Failure.png")
                 setStepStatus(api.TM.FAIL, "Motion detection failed. SuccessRate was {}".format(successRate))
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             setStepStatus(api.TM.FAIL, "Unexpected Screen")
 
+        metrics.emitIteration()
+        logArchive.markIteration(iteration)
         defineStep("Closing Iteration {}".format(str(iteration)), "Close test gracefully")
         if iteration != int(timesLoop):
             resetStepNumber()
@@ -241,12 +302,20 @@ try:
     api.returnTestResult(api.TM.PASS)
 
 except Exception as e:
-    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    if filterNo is not None:
+        dhcpImpairment.switchImpairment_OFF(filterNo=filterNo)
     print(e)
-    api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+    recorder.capture("Failure_Exception.png")
     handleTestException()
     api.returnTestResult(api.TM.FAIL)
 
 finally:
-    t.adb.saveAllLogs(server, slotNo)
+    logArchive.saveAllLogs(t.adb, server)
+    metrics.close()
+    logStore.close()
+    if dhcpServer is not None:
+        dhcpServer.stop()
+    recorder.stop()
+    filterLease.release()
+    logArchive.close()
     t.disconnect()
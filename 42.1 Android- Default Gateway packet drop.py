@@ -18,11 +18,23 @@ Reviewer:
 """
 from framework.Test import Test
 from framework import api
-from framework.model.utility.connectivityImpairment import KImpairment
 from framework.model.utility.errorDetection import ErrorCheck
 from framework.model.application.linearTV.LinearTV import LinearTV
 from framework.model.utility.testUtil import defineStep, setStepStatus,handleTestException,resetStepNumber
 from framework.configs.slotInfo import slotInfo
+from testCaseUtils.adaptiveTimeouts import readFirmware
+from testCaseUtils.bootDetector import BootDetector
+from testCaseUtils.errorScreenCache import CachedErrorCheck
+from testCaseUtils.impairmentSession import getImpairmentSession
+from testCaseUtils.latencyMetrics import LatencyRecorder
+from testCaseUtils.logArchive import LogArchive
+from testCaseUtils.logcatStream import getLogcatStream
+from testCaseUtils.logStore import LogStore
+from testCaseUtils.motionEngine import MotionEngine
+from testCaseUtils.netemImpairment import createFilterLease
+from testCaseUtils.screenIndex import ScreenIdentifier
+from testCaseUtils.screenRecorder import ScreenRecorder
+from testCaseUtils.waitEngine import waitUntil, errorCodeCleared
 
 # Parmeters
 parameters = [
@@ -38,6 +50,12 @@ parameters = [
         "type": "int",
         "value": 10,
         "description": "Detect motion continuously "
+    },
+    {
+        "name": "impairmentBackend",
+        "type": "string",
+        "value": "kmax",
+        "description": "kmax, or netem[:<interface>] for tc/nftables on a local Linux bridge"
     }
 ]
 
@@ -45,9 +63,13 @@ parameters = [
 t = Test(initialiseDUT=True, optionsDict=parameters, autoRecover=True)
 config = t.config
 tv = LinearTV(config)
+motion = MotionEngine(tv)
+screens = ScreenIdentifier(tv)
 deviceIP = slotInfo[t.server][str(t.slotNo)]["ip"]
-kmaxImpairment = KImpairment(deviceIP=deviceIP)
-errorCheck = ErrorCheck()
+logcat = getLogcatStream(deviceIP, port=5038)
+bootDetector = BootDetector(logcat, motion)
+kmaxImpairment = getImpairmentSession(config.getConfigItem("impairmentBackend"), deviceIP)
+errorCheck = CachedErrorCheck(ErrorCheck())
 
 
 # Config attributes
@@ -55,43 +77,53 @@ slotNo = config.getConfigItem("slotNumber")
 server = config.getConfigItem("server")
 timesLoop = config.getConfigItem("times")
 ipKmax = config.getConfigItem("ipKmax")
-filterNo = (slotNo % 4) + 1
+filterLease = createFilterLease(kmaxImpairment, ipKmax, slotNo)
+filterNo = None
+metrics = LatencyRecorder("42.1", server, slotNo, firmware=readFirmware(deviceIP))
+logArchive = LogArchive(logcat, "42.1", slotNo)
+logStore = LogStore(logcat, "42.1", server, slotNo)
+defineStep = logStore.tracking(defineStep)
+recorder = ScreenRecorder(slotNo)
 
 # Dynamic Parameter
 reboot = config.getConfigItem("reboot")
 motionTime = (config.getConfigItem("motionTime"))
 
-# ============
-# STEP
-# ============
+try:
+    filterNo = filterLease.acquire()
+    recorder.start()
 
-step_name = "Precondition: Open Linear Channel"
-expected_result = "Precondition should be fulfilled"
-defineStep(step_name, step_name, expected_result)
+    # ============
+    # STEP
+    # ============
 
-kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-api.pressButtons(['OK', 'MENU', '5'], 3)
+    step_name = "Precondition: Open Linear Channel"
+    expected_result = "Precondition should be fulfilled"
+    defineStep(step_name, step_name, expected_result)
 
-result = tv.open('LiveScreen')
-api.writeDebugLine("Return values for tv.open(): {}".format(result))
-if result[0]:
-    setStepStatus(api.TM.PASS)
-else:
-    result = tv.checkUnExpectedScreen()
-    api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
+    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    api.pressButtons(['OK', 'MENU', '5'], 3)
 
-    if result[1] != 'Motion':
-        result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
-        api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
+    result = tv.open('LiveScreen')
+    api.writeDebugLine("Return values for tv.open(): {}".format(result))
+    if result[0]:
+        setStepStatus(api.TM.PASS)
+    else:
+        result = screens.checkUnExpectedScreen()
+        api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
 
-        if result is None or not result[0]:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
-            errorMessage = "Unexpected Screen. Cannot proceed...."
-            raise Exception(errorMessage)
+        if result[1] != 'Motion':
+            result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
+            api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
 
+            if result is None or not result[0]:
+                recorder.capture("Failure_Exception.png")
+                errorMessage = "Unexpected Screen. Cannot proceed...."
+                raise Exception(errorMessage)
 
-try:
     for iteration in range(1, int(timesLoop) + 1):
+        metrics.startIteration(iteration)
+        logStore.startIteration(iteration)
         # ============
         # STEP
         # ============
@@ -116,8 +148,9 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         kmaxImpairment.switchImpairment_ON(impairment='Gateway', drop=100, filterNo=filterNo)
+        metrics.markImpairmentOn(kmaxImpairment.lastToggleSeconds)
 
-        api.waitSec(280)
+        metrics.timeToError(errorCheck.waitForErrorCode('Code-0101', timeout=280))
         setStepStatus(api.TM.PASS)
 
         # ============
@@ -134,7 +167,7 @@ try:
             setStepStatus(api.TM.PASS)
         else:
             print('Not an error screen/Unknown error screen')
-            api.captureImageEx(None, "currentScreen.png")[0][2].Close()
+            recorder.capture("currentScreen.png")
             setStepStatus(api.TM.FAIL)
 
         # ============
@@ -146,15 +179,15 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-        api.waitSec(90)
+        metrics.markImpairmentOff(kmaxImpairment.lastToggleSeconds)
+        metrics.timeToRecovery(waitUntil(errorCodeCleared(errorCheck), timeout=90, stableFor=10,
+                                         description="Error screen cleared"))
 
         errorResult = errorCheck.getErrorCode()
         print(errorResult)
         if errorResult[0]:
             print('DUT stuck in the error state')
-            api.powerOffSTB()
-            api.powerOnSTB()
-            api.waitSec(100)
+            metrics.bootDuration(bootDetector.powerCycle(timeout=100))
             setStepStatus(api.TM.FAIL)
         else:
             api.writeDebugLine("Successfully recover from the error state")
@@ -169,24 +202,24 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         checkForReady = False
-        screenStatus = tv.identifyScreen()
+        screenStatus = screens.identifyScreen()
         if screenStatus[1] == "LiveScreen":
             checkForReady = True
         elif screenStatus[1] == "parentalPIN":
             checkForReady = tv.verifyAndEnterParentalPin()[0]
             if not checkForReady:
-                api.captureImageEx(None, "parentalPIN.png")[0][2].Close()
+                recorder.capture("parentalPIN.png")
                 comments = "Unable to find livescreen after entering parental pin"
         elif screenStatus[1] in ["premiumChannel", "technicalErrorPage", "generalLinearStreamingError"]:
-            api.captureImageEx(None, "{}.png".format(screenStatus[1]))[0][2].Close()
+            recorder.capture("{}.png".format(screenStatus[1]))
             comments = screenStatus[1]
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             comments = "Unexpected Screen"
             api.pressButtons(['BACK', 'BACK', 'BACK'], 2)
 
         if checkForReady:
-            motionDetected, motionStatusList, successRate = tv.detectMotionContinuously(motionTime)
+            motionDetected, motionStatusList, successRate = motion.detectMotionContinuously(motionTime)
             api.writeDebugLine("DetectMotion:: " + str(motionDetected))
 
             if motionDetected:
@@ -195,12 +228,13 @@ try:
 
             else:
                 api.writeDebugLine("Motion Not Detected, success rate: {}".format(successRate))
-                api.captureImageEx(None, "MotionDetection_Failure.png")[0][2].Close()
+                recorder.capture("MotionDetection_Failure.png")
                 setStepStatus(api.TM.FAIL, "Motion detection failed. SuccessRate was {}".format(successRate))
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             setStepStatus(api.TM.FAIL, "Unexpected Screen")
 
+        logArchive.markIteration(iteration)
         defineStep("Closing Iteration {}:".format(str(iteration)), "Close test gracefully")
         if iteration != int(timesLoop):
             resetStepNumber()
@@ -219,12 +253,18 @@ try:
 
 
 except Exception as e:
-    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    if filterNo is not None:
+        kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
     print(e)
-    api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+    recorder.capture("Failure_Exception.png")
     handleTestException()
     api.returnTestResult(api.TM.FAIL)
 
 finally:
-    t.adb.saveAllLogs(server, slotNo)
+    logArchive.saveAllLogs(t.adb, server)
+    metrics.close()
+    logStore.close()
+    recorder.stop()
+    filterLease.release()
+    logArchive.close()
     t.disconnect()
@@ -18,12 +18,24 @@ Reviewer:
 """
 from framework.Test import Test
 from framework import api
-from framework.model.utility.connectivityImpairment import KImpairment
 from framework.model.utility.errorDetection import ErrorCheck
 from framework.configs.slotInfo import slotInfo
 from framework.model.application.linearTV.LinearTV import LinearTV
 from framework.model.utility.testUtil import defineStep, setStepStatus, handleTestException, resetStepNumber
-from framework.factory.services.ADBLogsv2 import ADBLogs
+from testCaseUtils.adaptiveTimeouts import readFirmware
+from testCaseUtils.bootDetector import BootDetector
+from testCaseUtils.dnsStandIn import createDnsStandIn
+from testCaseUtils.errorScreenCache import CachedErrorCheck
+from testCaseUtils.impairmentSession import getImpairmentSession
+from testCaseUtils.latencyMetrics import LatencyRecorder
+from testCaseUtils.logArchive import LogArchive
+from testCaseUtils.logcatStream import getLogcatStream
+from testCaseUtils.logStore import LogStore
+from testCaseUtils.motionEngine import MotionEngine
+from testCaseUtils.netemImpairment import createFilterLease
+from testCaseUtils.screenIndex import ScreenIdentifier
+from testCaseUtils.screenRecorder import ScreenRecorder
+from testCaseUtils.waitEngine import waitUntil, errorCodeCleared
 
 # Parmeters
 parameters = [
@@ -39,16 +51,31 @@ parameters = [
         "type": "int",
         "value": 10,
         "description": "Detect motion continuously "
+    },
+    {
+        "name": "impairmentBackend",
+        "type": "string",
+        "value": "kmax",
+        "description": "kmax, or netem[:<interface>] for tc/nftables on a local Linux bridge"
+    },
+    {
+        "name": "dnsStandIn",
+        "type": "string",
+        "value": "",
+        "description": "<interface>[:<host>,<host>] DNS impairment on a local resolver, only for those hosts"
     }
 ]
 
 t = Test(initialiseDUT=True, optionsDict=parameters, autoRecover=True)
 config = t.config
 tv = LinearTV(config)
-adbLogs = ADBLogs(verbose=True, port=5038)
+motion = MotionEngine(tv)
+screens = ScreenIdentifier(tv)
 deviceIP = slotInfo[t.server][str(t.slotNo)]["ip"]
-kmaxImpairment = KImpairment(deviceIP=deviceIP)
-errorCheck = ErrorCheck()
+logcat = getLogcatStream(deviceIP, port=5038)
+bootDetector = BootDetector(logcat, motion)
+kmaxImpairment = getImpairmentSession(config.getConfigItem("impairmentBackend"), deviceIP)
+errorCheck = CachedErrorCheck(ErrorCheck())
 
 
 # Config attributes
@@ -56,43 +83,60 @@ slotNo = config.getConfigItem("slotNumber")
 server = config.getConfigItem("server")
 timesLoop = config.getConfigItem("times")
 ipKmax = config.getConfigItem("ipKmax")
-filterNo = (slotNo % 4) + 1
+filterLease = createFilterLease(kmaxImpairment, ipKmax, slotNo)
+filterNo = None
+metrics = LatencyRecorder("42.3", server, slotNo, firmware=readFirmware(deviceIP))
+logArchive = LogArchive(logcat, "42.3", slotNo)
+logStore = LogStore(logcat, "42.3", server, slotNo)
+defineStep = logStore.tracking(defineStep)
+recorder = ScreenRecorder(slotNo)
+# the stand-in drops/delays only the answers for its hosts, the KMAX is not used for DNS while it runs
+dnsServer = createDnsStandIn(config.getConfigItem("dnsStandIn"), deviceIP, slotNo)
+dnsImpairment = kmaxImpairment
+if dnsServer is not None:
+    dnsImpairment = dnsServer
 
 # Dynamic Parameter
 reboot = config.getConfigItem("reboot")
 motionTime = (config.getConfigItem("motionTime"))
 
+try:
+    filterNo = filterLease.acquire()
+    recorder.start()
+    if dnsServer is not None:
+        dnsServer.start()
 
-# ============
-# STEP
-# ============
+    # ============
+    # STEP
+    # ============
 
-step_name = "Precondition: Open Linear Channel"
-expected_result = "Precondition should be fulfilled"
-defineStep(step_name, step_name, expected_result)
+    step_name = "Precondition: Open Linear Channel"
+    expected_result = "Precondition should be fulfilled"
+    defineStep(step_name, step_name, expected_result)
 
-kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-api.pressButtons(['OK', 'MENU', '5'], 3)
+    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    api.pressButtons(['OK', 'MENU', '5'], 3)
 
-result = tv.open('LiveScreen')
-api.writeDebugLine("Return values for tv.open(): {}".format(result))
-if result[0]:
-    setStepStatus(api.TM.PASS)
-else:
-    result = tv.checkUnExpectedScreen()
-    api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
+    result = tv.open('LiveScreen')
+    api.writeDebugLine("Return values for tv.open(): {}".format(result))
+    if result[0]:
+        setStepStatus(api.TM.PASS)
+    else:
+        result = screens.checkUnExpectedScreen()
+        api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
 
-    if result[1] != 'Motion':
-        result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
-        api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
+        if result[1] != 'Motion':
+            result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
+            api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
 
-        if result is None or not result[0]:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
-            errorMessage = "Unexpected Screen. Cannot proceed...."
-            raise Exception(errorMessage)
+            if result is None or not result[0]:
+                recorder.capture("Failure_Exception.png")
+                errorMessage = "Unexpected Screen. Cannot proceed...."
+                raise Exception(errorMessage)
 
-try:
     for iteration in range(1, int(timesLoop) + 1):
+        metrics.startIteration(iteration)
+        logStore.startIteration(iteration)
         # ============
         # STEP
         # ============
@@ -116,9 +160,10 @@ try:
         expected_result = "Set up network impairment as per filter"
         defineStep(step_name, step_name, expected_result)
 
-        kmaxImpairment.switchImpairment_ON(impairment='DNS', delay=15, filterNo=filterNo)
+        dnsImpairment.switchImpairment_ON(impairment='DNS', delay=15, filterNo=filterNo)
+        metrics.markImpairmentOn(dnsImpairment.lastToggleSeconds)
 
-        api.waitSec(250)
+        metrics.timeToError(errorCheck.waitForErrorCode('Code-0102', timeout=250))
 
         setStepStatus(api.TM.PASS)
 
@@ -131,9 +176,11 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         print('DNS server connectivity')
-        adbLogs.printGenericLogs(t.server, t.slotNo, tag="chromium:E", search="Connectivity check")
-        adbLogs.printGenericLogs(t.server, t.slotNo, tag="VeopApp:E", search="www.google.com")
-        adbLogs.printGenericLogs(t.server, t.slotNo, tag="VeopApp:E", search="Unable to resolve host")
+        logcat.printGenericLogsMulti([
+            ("chromium:E", "Connectivity check"),
+            ("VeopApp:E", "www.google.com"),
+            ("VeopApp:E", "Unable to resolve host")
+        ])
         errorResult = errorCheck.getErrorCode()
         print(errorResult)
 
@@ -150,11 +197,16 @@ try:
         expected_result = "Reset the KMAX and recover the error state"
         defineStep(step_name, step_name, expected_result)
 
-        kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-        api.waitSec(30)
+        dnsImpairment.switchImpairment_OFF(filterNo=filterNo)
+        metrics.markImpairmentOff(dnsImpairment.lastToggleSeconds)
+        metrics.timeToRecovery(waitUntil(errorCodeCleared(errorCheck), timeout=30, stableFor=10,
+                                         description="Error screen cleared"))
 
         print("DUT restore the DNS server connectivity")
-        adbLogs.printGenericLogs(t.server, t.slotNo, tag="chromium:I", search="Global connection")
+        logcat.printGenericLogs(tag="chromium:I", search="Global connection")
+        if dnsServer is not None:
+            for line in dnsServer.report(since=dnsServer.impairedAt):
+                api.writeDebugLine(line)
 
         errorResult = errorCheck.getErrorCode()
         print(errorResult)
@@ -163,9 +215,7 @@ try:
             if errorResult[1] == 'Code-0204':
                 api.pressButtons(['OK', 'MENU'], 10)
             else:
-                api.powerOffSTB()
-                api.powerOnSTB()
-                api.waitSec(100)
+                metrics.bootDuration(bootDetector.powerCycle(timeout=100))
             setStepStatus(api.TM.FAIL)
         else:
             api.writeDebugLine("Successfully recover from the error state")
@@ -180,24 +230,24 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         checkForReady = False
-        screenStatus = tv.identifyScreen()
+        screenStatus = screens.identifyScreen()
         if screenStatus[1] == "LiveScreen":
             checkForReady = True
         elif screenStatus[1] == "parentalPIN":
             checkForReady = tv.verifyAndEnterParentalPin()[0]
             if not checkForReady:
-                api.captureImageEx(None, "parentalPIN.png")[0][2].Close()
+                recorder.capture("parentalPIN.png")
                 comments = "Unable to find livescreen after entering parental pin"
         elif screenStatus[1] in ["premiumChannel", "technicalErrorPage", "generalLinearStreamingError"]:
-            api.captureImageEx(None, "{}.png".format(screenStatus[1]))[0][2].Close()
+            recorder.capture("{}.png".format(screenStatus[1]))
             comments = screenStatus[1]
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             comments = "Unexpected Screen"
             api.pressButtons(['BACK', 'BACK', 'BACK'], 2)
 
         if checkForReady:
-            motionDetected, motionStatusList, successRate = tv.detectMotionContinuously(motionTime)
+            motionDetected, motionStatusList, successRate = motion.detectMotionContinuously(motionTime)
             api.writeDebugLine("DetectMotion:: " + str(motionDetected))
 
             if motionDetected:
@@ -206,12 +256,14 @@ try:
 
             else:
                 api.writeDebugLine("Motion Not Detected, success rate: {}".format(successRate))
-                api.captureImageEx(None, "MotionDetection_Failure.png")[0][2].Close()
+                recorder.capture("MotionDetection_Failure.png")
                 setStepStatus(api.TM.FAIL, "Motion detection failed. SuccessRate was {}".format(successRate))
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             setStepStatus(api.TM.FAIL, "Unexpected Screen")
 
+        metrics.emitIteration()
+        logArchive.markIteration(iteration)
         defineStep("Closing Iteration {}".format(str(iteration)), "Close test gracefully")
         if iteration != int(timesLoop):
             resetStepNumber()
@@ -230,12 +282,20 @@ try:
 
 
 except Exception as e:
-    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    if filterNo is not None:
+        dnsImpairment.switchImpairment_OFF(filterNo=filterNo)
     print(e)
-    api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+    recorder.capture("Failure_Exception.png")
     handleTestException()
     api.returnTestResult(api.TM.FAIL)
 
 finally:
-    t.adb.saveAllLogs(server, slotNo)
+    logArchive.saveAllLogs(t.adb, server)
+    metrics.close()
+    logStore.close()
+    if dnsServer is not None:
+        dnsServer.stop()
+    recorder.stop()
+    filterLease.release()
+    logArchive.close()
     t.disconnect()
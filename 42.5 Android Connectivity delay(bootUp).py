@@ -18,12 +18,24 @@ Reviewer:
 """
 from framework.Test import Test
 from framework import api
-from framework.model.utility.connectivityImpairment import KImpairment
 from framework.model.utility.errorDetection import ErrorCheck
 from framework.configs.slotInfo import slotInfo
 from framework.model.application.linearTV.LinearTV import LinearTV
 from framework.model.utility.testUtil import handleTestException, defineStep, setStepStatus, resetStepNumber
 from framework.factory.services.ADBLogsv2 import ADBLogs
+from testCaseUtils.adaptiveTimeouts import readFirmware
+from testCaseUtils.bootDetector import BootDetector
+from testCaseUtils.errorScreenCache import CachedErrorCheck
+from testCaseUtils.impairmentSession import getImpairmentSession
+from testCaseUtils.latencyMetrics import LatencyRecorder
+from testCaseUtils.logArchive import LogArchive
+from testCaseUtils.logcatStream import getLogcatStream
+from testCaseUtils.logStore import LogStore
+from testCaseUtils.motionEngine import MotionEngine
+from testCaseUtils.netemImpairment import createFilterLease
+from testCaseUtils.screenIndex import ScreenIdentifier
+from testCaseUtils.screenRecorder import ScreenRecorder
+from testCaseUtils.waitEngine import waitUntil, errorCodeCleared
 
 # Parmeters
 parameters = [
@@ -39,16 +51,26 @@ parameters = [
         "type": "int",
         "value": 10,
         "description": "Detect motion continuously "
+    },
+    {
+        "name": "impairmentBackend",
+        "type": "string",
+        "value": "kmax",
+        "description": "kmax, or netem[:<interface>] for tc/nftables on a local Linux bridge"
     }
 ]
 
 t = Test(initialiseDUT=True, optionsDict=parameters, autoRecover=True)
 config = t.config
 tv = LinearTV(config)
+motion = MotionEngine(tv)
+screens = ScreenIdentifier(tv)
 adbLogs = ADBLogs(verbose=True, port=5038)
 deviceIP = slotInfo[t.server][str(t.slotNo)]["ip"]
-kmaxImpairment = KImpairment(deviceIP=deviceIP)
-errorCheck = ErrorCheck()
+logcat = getLogcatStream(deviceIP, port=5038)
+bootDetector = BootDetector(logcat, motion)
+kmaxImpairment = getImpairmentSession(config.getConfigItem("impairmentBackend"), deviceIP)
+errorCheck = CachedErrorCheck(ErrorCheck())
 
 
 # Config attributes
@@ -56,43 +78,54 @@ slotNo = config.getConfigItem("slotNumber")
 server = config.getConfigItem("server")
 timesLoop = config.getConfigItem("times")
 ipKmax = config.getConfigItem("ipKmax")
-filterNo = (slotNo % 4) + 1
+filterLease = createFilterLease(kmaxImpairment, ipKmax, slotNo)
+filterNo = None
+metrics = LatencyRecorder("42.5", server, slotNo, firmware=readFirmware(deviceIP))
+logArchive = LogArchive(logcat, "42.5", slotNo)
+logStore = LogStore(logcat, "42.5", server, slotNo)
+defineStep = logStore.tracking(defineStep)
+recorder = ScreenRecorder(slotNo)
 
 # Dynamic Parameter
 reboot = config.getConfigItem("reboot")
 motionTime = (config.getConfigItem("motionTime"))
 
-# ============
-# STEP
-# ============
+try:
+    filterNo = filterLease.acquire()
+    recorder.start()
 
-step_name = "Precondition: Open Linear Channel"
-expected_result = "Precondition should be fulfilled"
-defineStep(step_name, step_name, expected_result)
+    # ============
+    # STEP
+    # ============
 
-kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-api.pressButtons(['OK', 'MENU', '5'], 3)
+    step_name = "Precondition: Open Linear Channel"
+    expected_result = "Precondition should be fulfilled"
+    defineStep(step_name, step_name, expected_result)
 
-result = tv.open('LiveScreen')
-api.writeDebugLine("Return values for tv.open(): {}".format(result))
-if result[0]:
-    setStepStatus(api.TM.PASS)
-else:
-    result = tv.checkUnExpectedScreen()
-    api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
+    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    api.pressButtons(['OK', 'MENU', '5'], 3)
+
+    result = tv.open('LiveScreen')
+    api.writeDebugLine("Return values for tv.open(): {}".format(result))
+    if result[0]:
+        setStepStatus(api.TM.PASS)
+    else:
+        result = screens.checkUnExpectedScreen()
+        api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
 
-    if result[1] != 'Motion':
-        result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
-        api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
+        if result[1] != 'Motion':
+            result = tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
+            api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
 
-        if result is None or not result[0]:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
-            errorMessage = "Unexpected Screen. Cannot proceed...."
-            raise Exception(errorMessage)
+            if result is None or not result[0]:
+                recorder.capture("Failure_Exception.png")
+                errorMessage = "Unexpected Screen. Cannot proceed...."
+                raise Exception(errorMessage)
 
-try:
 
     for iteration in range(1, int(timesLoop) + 1):
+        metrics.startIteration(iteration)
+        logStore.startIteration(iteration)
         # ============
         # STEP
         # ============
@@ -115,7 +148,8 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         kmaxImpairment.switchImpairment_ON(impairment='AndroidConnectivity', delay=5, filterNo=filterNo)
-        api.waitSec(150)
+        metrics.markImpairmentOn(kmaxImpairment.lastToggleSeconds)
+        metrics.timeToError(errorCheck.waitForErrorCode('Code-0102', timeout=150))
         setStepStatus(api.TM.PASS)
 
         # ============
@@ -127,10 +161,10 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         api.writeDebugLine("Android Connectivity check")
-        adbLogs.printGenericLogs(t.server, t.slotNo, tag="chromium:E", search="time out")
-
-        adbLogs.printGenericLogs(t.server, t.slotNo, tag="NetworkMonitor/NetworkAgentInfo [Ethernet () - 100]:D",
-                                      search="https://www.google.com/generate_204")
+        logcat.printGenericLogsMulti([
+            ("chromium:E", "time out"),
+            ("NetworkMonitor/NetworkAgentInfo [Ethernet () - 100]:D", "https://www.google.com/generate_204")
+        ])
 
         errorResult = errorCheck.getErrorCode()
         print(errorResult)
@@ -138,7 +172,7 @@ try:
             setStepStatus(api.TM.PASS)
         else:
             print('Not an error screen/Unknown error screen')
-            api.captureImageEx(None, "currentScreen.png")[0][2].Close()
+            recorder.capture("currentScreen.png")
             setStepStatus(api.TM.FAIL)
 
         # ============
@@ -150,20 +184,20 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
-        api.waitSec(35)
+        metrics.markImpairmentOff(kmaxImpairment.lastToggleSeconds)
+        metrics.timeToRecovery(waitUntil(errorCodeCleared(errorCheck), timeout=35, stableFor=10,
+                                         description="Error screen cleared"))
 
         errorResult = errorCheck.getErrorCode()
         print(errorResult)
         if errorResult[0]:
             print('DUT stuck in the error state')
-            api.powerOffSTB()
-            api.powerOnSTB()
-            api.waitSec(100)
+            metrics.bootDuration(bootDetector.powerCycle(timeout=100))
             setStepStatus(api.TM.FAIL)
         else:
             api.writeDebugLine("Successfully recover from the error state")
             print('Android connectivity')
-            adbLogs.printGenericLogs(t.server, t.slotNo, tag="chromium:I", search="Global connection")
+            logcat.printGenericLogs(tag="chromium:I", search="Global connection")
             setStepStatus(api.TM.PASS)
 
         # ============
@@ -175,24 +209,24 @@ try:
         defineStep(step_name, step_name, expected_result)
 
         checkForReady = False
-        screenStatus = tv.identifyScreen()
+        screenStatus = screens.identifyScreen()
         if screenStatus[1] == "LiveScreen":
             checkForReady = True
         elif screenStatus[1] == "parentalPIN":
             checkForReady = tv.verifyAndEnterParentalPin()[0]
             if not checkForReady:
-                api.captureImageEx(None, "parentalPIN.png")[0][2].Close()
+                recorder.capture("parentalPIN.png")
                 comments = "Unable to find livescreen after entering parental pin"
         elif screenStatus[1] in ["premiumChannel", "technicalErrorPage", "generalLinearStreamingError"]:
-            api.captureImageEx(None, "{}.png".format(screenStatus[1]))[0][2].Close()
+            recorder.capture("{}.png".format(screenStatus[1]))
             comments = screenStatus[1]
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             comments = "Unexpected Screen"
             api.pressButtons(['BACK', 'BACK', 'BACK'], 2)
 
         if checkForReady:
-            motionDetected, motionStatusList, successRate = tv.detectMotionContinuously(motionTime)
+            motionDetected, motionStatusList, successRate = motion.detectMotionContinuously(motionTime)
             api.writeDebugLine("DetectMotion:: " + str(motionDetected))
 
             if motionDetected:
@@ -201,12 +235,14 @@ try:
 
             else:
                 api.writeDebugLine("Motion Not Detected, success rate: {}".format(successRate))
-                api.captureImageEx(None, "MotionDetection_Failure.png")[0][2].Close()
+                recorder.capture("MotionDetection_Failure.png")
                 setStepStatus(api.TM.FAIL, "Motion detection failed. SuccessRate was {}".format(successRate))
         else:
-            api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+            recorder.capture("Failure_Exception.png")
             setStepStatus(api.TM.FAIL, "Unexpected Screen")
 
+        metrics.emitIteration()
+        logArchive.markIteration(iteration)
         defineStep("Closing Iteration {}".format(str(iteration)), "Close test gracefully")
         if iteration != int(timesLoop):
             resetStepNumber()
@@ -225,12 +261,18 @@ try:
 
 
 except Exception as e:
-    kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+    if filterNo is not None:
+        kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
     print(e)
-    api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+    recorder.capture("Failure_Exception.png")
     handleTestException()
     api.returnTestResult(api.TM.FAIL)
 
 finally:
-    adbLogs.saveAllLogs(server, slotNo)
+    logArchive.saveAllLogs(adbLogs, server)
+    metrics.close()
+    logStore.close()
+    recorder.stop()
+    filterLease.release()
+    logArchive.close()
     t.disconnect()
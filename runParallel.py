@@ -0,0 +1,34 @@
+"""
+Description:
+Spreads the 41.x/42.x/43.x impairment test cases over all slots of a StormTest server, one worker per slot.
+Every test case runs as its own process with the given --server and the slot of the worker. Arguments that are not
+known to this runner (e.g. --times 5 --motionTime 10) are passed through to every test case.
+
+Parameters:
+--server 10.13.130.182 --slots 13 14 15 16 --scenarios 41.1 42.2 --times 5
+
+"""
+import argparse
+import os
+import sys
+
+from framework.configs.slotInfo import slotInfo
+from testCaseUtils.slotRunner import SlotRunner, discoverScenarios, freeSlots
+
+parser = argparse.ArgumentParser(description="Run the impairment test cases in parallel on all free slots")
+parser.add_argument("--server", required=True, help="StormTest server, key of slotInfo")
+parser.add_argument("--slots", type=int, nargs="*", help="Use only these slots (default: all slots of the server)")
+parser.add_argument("--exclude", type=int, nargs="*", help="Slots that are busy and must not be used")
+parser.add_argument("--scenarios", nargs="*", help="Test case numbers to run, e.g. 41.1 43.10 (default: all)")
+parser.add_argument("--logDir", default="results", help="Directory for the per slot console logs")
+args, testArgs = parser.parse_known_args()
+
+scripts = discoverScenarios(os.path.dirname(os.path.abspath(__file__)), args.scenarios)
+slots = freeSlots(slotInfo, args.server, args.slots, args.exclude)
+if not scripts or not slots:
+    print("Nothing to run: {} test cases, {} slots".format(len(scripts), len(slots)))
+    sys.exit(1)
+
+print("Running {} test cases on slots {}".format(len(scripts), slots))
+results = SlotRunner(args.server, slots, scripts, extraArgs=testArgs, logDir=args.logDir).run()
+sys.exit(0 if all(result[2] for result in results) else 1)
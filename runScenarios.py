@@ -0,0 +1,152 @@
+"""
+Description:
+Runs the 41.x/42.x/43.x impairment scenarios back to back from the scenario table (testCaseUtils/scenarios.py) in a
+single StormTest session. The DUT is initialised once, every scenario then runs the 8 step flow from the README with
+its own impairment, error code, waits and ADB checks. With reuseSession the precondition of the following scenarios is
+only run when the DUT fails a quick health probe.
+
+Prerequisite:
+First time installation is successful and linear channel is playing for 5 minutes
+KMAX Network emulator reset
+Developer option should be enabled in GigaTV Net STB to get the ADB logcat
+Check the DUT VF launcher version, if a debug APK is installed on the DUT, use debugApk as a parameter and assign it True
+to get the application related logcat.
+
+Parameters:
+--server 10.13.130.182 --slot 13 --times 5 --scenarios 41.1,42.2,43.10
+
+"""
+from framework.Test import Test
+from framework import api
+from framework.model.utility.testUtil import handleTestException, defineStep, setStepStatus
+from testCaseUtils.scenarioEngine import ScenarioEngine
+from testCaseUtils.scenarios import selectScenarios
+
+# Parameters
+parameters = [
+    {
+        "name": "scenarios",
+        "type": "string",
+        "value": "all",
+        "description": "Comma separated scenario ids (e.g. 41.1,43.10) or all"
+    },
+    {
+        "name": "motionTime",
+        "type": "int",
+        "value": 10,
+        "description": "Detect motion continuously "
+    },
+    {
+        "name": "reboot",
+        "type": "boolean",
+        "value": True,
+        "description": "Deep standby wake up"
+    },
+    {
+        "name": "debugApk",
+        "type": "boolean",
+        "value": True,
+        "description": "Release APK install on the DUT"
+    },
+    {
+        "name": "verifySettings",
+        "type": "boolean",
+        "value": True,
+        "description": "Verify the system settings"
+    },
+    {
+        "name": "reuseSession",
+        "type": "boolean",
+        "value": True,
+        "description": "Skip the precondition of a scenario while the DUT is healthy"
+    },
+    {
+        "name": "impairmentBackend",
+        "type": "string",
+        "value": "kmax",
+        "description": "kmax, or netem[:<interface>] for tc/nftables on a local Linux bridge"
+    },
+    {
+        "name": "impairmentProfile",
+        "type": "string",
+        "value": "",
+        "description": "Impairment profile for all scenarios, e.g. ramp:delay:0:20:60+off:90 (empty: scenario default)"
+    },
+    {
+        "name": "adaptiveTimeouts",
+        "type": "boolean",
+        "value": True,
+        "description": "Shorten the error/recovery waits to what earlier iterations on this firmware needed"
+    },
+    {
+        "name": "captureInterface",
+        "type": "string",
+        "value": "",
+        "description": "Local interface that sees the DUT traffic, tcpdump writes the DHCP/DNS/TCP timeline per "
+                       "iteration"
+    },
+    {
+        "name": "dhcpStandIn",
+        "type": "string",
+        "value": "",
+        "description": "<interface>[:<leaseSeconds>[:<router>[:<dns>,...]]] serves the DUT from a local DHCP server "
+                       "with short leases"
+    },
+    {
+        "name": "dnsStandIn",
+        "type": "string",
+        "value": "",
+        "description": "<interface>[:<host>,<host>] DNS impairment on a local resolver, only for those hosts"
+    },
+    {
+        "name": "ocrAudit",
+        "type": "boolean",
+        "value": False,
+        "description": "Also open the network settings and read the Ethernet IP by OCR (slow audit of the adb check)"
+    }
+]
+
+t = Test(initialiseDUT=True, optionsDict=parameters, autoRecover=True)
+config = t.config
+
+# Config File Parameters
+timesLoop = config.getConfigItem("times")
+
+# Dynamic Parameters
+scenarios = selectScenarios(config.getConfigItem("scenarios"))
+engine = ScenarioEngine(t, motionTime=config.getConfigItem("motionTime"), debugApk=config.getConfigItem("debugApk"),
+                        verifySettings=config.getConfigItem("verifySettings"), reboot=config.getConfigItem("reboot"),
+                        reuseSession=config.getConfigItem("reuseSession"),
+                        impairmentBackend=config.getConfigItem("impairmentBackend"),
+                        impairmentProfile=config.getConfigItem("impairmentProfile"),
+                        adaptiveTimeouts=config.getConfigItem("adaptiveTimeouts"),
+                        captureInterface=config.getConfigItem("captureInterface"),
+                        dhcpStandIn=config.getConfigItem("dhcpStandIn"),
+                        dnsStandIn=config.getConfigItem("dnsStandIn"),
+                        ocrAudit=config.getConfigItem("ocrAudit"))
+
+try:
+    engine.open()
+    passed = engine.runAll(scenarios, timesLoop)
+
+    # ============
+    # STEP
+    # ============
+
+    step_name = "Teardown Environment"
+    expected_result = "Successfully disconnect from StormTest"
+    defineStep(step_name, step_name, expected_result)
+    setStepStatus(api.TM.PASS)
+    api.returnTestResult(api.TM.PASS if passed else api.TM.FAIL)
+
+except Exception as e:
+    if engine.filterNo is not None:
+        engine.kmaxImpairment.switchImpairment_OFF(filterNo=engine.filterNo)
+    print(e)
+    engine.recorder.capture("Failure_Exception.png")
+    handleTestException()
+    api.returnTestResult(api.TM.FAIL)
+
+finally:
+    engine.close()
+    t.disconnect()
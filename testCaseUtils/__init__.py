@@ -0,0 +1,5 @@
+"""
+Description:
+Shared helpers for the network impairment test cases (41.x Platform, 42.x Android, 43.x Application).
+The modules only depend on the StormTest framework objects that the test cases already create and pass in.
+"""
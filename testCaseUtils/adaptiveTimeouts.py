@@ -0,0 +1,128 @@
+"""
+Description:
+Wait ceilings learned from the iterations that already ran. LatencyRecorder keeps time-to-error and time-to-recovery
+of every iteration in results/metrics/<scenario>_slot<n>.jsonl; TimeoutHistory reads these records for the scenario
+and firmware of the DUT and returns a high percentile of the observed latencies plus a margin as the timeout.
+
+The hand-tuned value of the scenario stays the upper limit, the learned timeout only makes the wait shorter. Until
+MIN_SAMPLES iterations are known for the firmware the hand-tuned value is used. A timed out iteration counts as an
+endless latency, so once timeouts reach the percentile the full hand-tuned value is used again.
+
+regressions() compares the median latency of the firmware with the one of the other firmware versions, a recovery
+that got much slower shows up in the debug log without anybody looking at the timings. Records without a firmware
+(adb did not answer) are not attributed to any firmware: they are neither learned from nor compared against.
+
+Usage:
+firmware = readFirmware(deviceIP)
+metrics = LatencyRecorder("41.1", server, slotNo, firmware=firmware)
+timeouts = TimeoutHistory("41.1", firmware)
+errorCheck.waitForErrorCode("Code-0100", timeout=timeouts.timeout("timeToError", 120))
+waitUntil(errorCodeCleared(errorCheck), timeout=timeouts.timeout("timeToRecovery", 180, pad=10), stableFor=10)
+for message in timeouts.regressions():
+    api.writeDebugLine(message)
+"""
+import glob
+import json
+import math
+import os
+import subprocess
+
+from testCaseUtils.latencyMetrics import DEFAULT_METRICS_DIR
+from testCaseUtils.logcatStream import adbCommand, ADB_PORT
+
+PERCENTILE = 95
+MARGIN = 1.25
+MIN_SECONDS = 10
+MIN_SAMPLES = 5
+# only the latest iterations per firmware count, older ones may come from a different network setup
+MAX_SAMPLES = 50
+REGRESSION_FACTOR = 1.5
+
+
+def readFirmware(deviceIP, port=ADB_PORT, timeout=10):
+    """ Build fingerprint of the DUT, None if adb does not answer """
+    try:
+        output = subprocess.check_output(adbCommand(deviceIP, ["shell", "getprop", "ro.build.fingerprint"], port),
+                                         stderr=subprocess.DEVNULL, timeout=timeout)
+    except (OSError, subprocess.SubprocessError) as e:
+        print("Cannot read the firmware version: {}".format(e))
+        return None
+    lines = output.decode(errors="replace").strip().splitlines()
+    return lines[0].strip() if lines else None
+
+
+def percentile(values, percent):
+    """ Nearest rank percentile of values """
+    ordered = sorted(values)
+    rank = max(1, int(math.ceil(percent / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class TimeoutHistory(object):
+
+    def __init__(self, scenario, firmware=None, metricsDir=DEFAULT_METRICS_DIR):
+        self.scenario = scenario
+        self.firmware = firmware
+        # firmware -> metric -> latencies in seconds, inf for a timed out wait
+        self.samples = {}
+        for path in sorted(glob.glob(os.path.join(metricsDir, "{}_slot*.jsonl".format(scenario)))):
+            self._read(path)
+        # the slots write their own files, order the iterations by their start time
+        for samples in self.samples.values():
+            for metric, values in samples.items():
+                samples[metric] = [value for _, value in sorted(values, key=lambda sample: sample[0])]
+
+    def latencies(self, metric, firmware=None):
+        """ Latest MAX_SAMPLES latencies of metric on firmware (default: the DUT firmware), none if it is unknown """
+        firmware = self.firmware if firmware is None else firmware
+        if firmware is None:
+            return []
+        return self.samples.get(firmware, {}).get(metric, [])[-MAX_SAMPLES:]
+
+    def timeout(self, metric, ceiling, pad=0):
+        """
+        PERCENTILE of the known latencies * MARGIN (at least MIN_SECONDS) + pad, never more than ceiling.
+        pad: time the wait needs after the event, e.g. stableFor
+        """
+        latencies = self.latencies(metric)
+        if len(latencies) < MIN_SAMPLES:
+            return ceiling
+        observed = percentile(latencies, PERCENTILE)
+        if math.isinf(observed):
+            print("{} {}: timed out too often, keeping {} Seconds".format(self.scenario, metric, ceiling))
+            return ceiling
+        learned = int(math.ceil(max(MIN_SECONDS, observed * MARGIN) + pad))
+        print("{} {}: P{} {:.1f}s of {} iterations, timeout {} Seconds (ceiling {})".format(
+            self.scenario, metric, PERCENTILE, observed, len(latencies), min(learned, ceiling), ceiling))
+        return min(learned, ceiling)
+
+    def regressions(self, metrics=("timeToError", "timeToRecovery")):
+        """ Messages for the metrics whose median on this firmware is REGRESSION_FACTOR above the other firmware """
+        messages = []
+        for metric in metrics:
+            current = [value for value in self.latencies(metric) if not math.isinf(value)]
+            previous = [value for firmware in self.samples if firmware not in (None, self.firmware)
+                        for value in self.latencies(metric, firmware) if not math.isinf(value)]
+            if len(current) < MIN_SAMPLES or len(previous) < MIN_SAMPLES:
+                continue
+            currentMedian = percentile(current, 50)
+            previousMedian = percentile(previous, 50)
+            if currentMedian > max(previousMedian * REGRESSION_FACTOR, previousMedian + 1):
+                messages.append("{} {} regression on {}: median {:.1f}s, other firmware {:.1f}s".format(
+                    self.scenario, metric, self.firmware, currentMedian, previousMedian))
+        return messages
+
+    def _read(self, path):
+        with open(path) as metricsFile:
+            for line in metricsFile:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                samples = self.samples.setdefault(record.get("firmware"), {})
+                startedAt = record.get("startedAt") or ""
+                for metric, value in record.get("metrics", {}).items():
+                    if value.get("seconds") is not None:
+                        samples.setdefault(metric, []).append((startedAt, value["seconds"]))
+                    elif "timedOutAfter" in value:
+                        samples.setdefault(metric, []).append((startedAt, float("inf")))
@@ -0,0 +1,68 @@
+"""
+Description:
+Boot readiness probe for the power cycles of the test cases. Instead of api.waitSec(100) after api.powerOnSTB() the
+detector watches the logcat stream for the Android boot completed markers and then the video output for motion, it
+returns as soon as the DUT is usable. The old fixed wait is the timeout, so a DUT without ADB is never slower than
+before. The elapsed time of the returned WaitResult is the boot duration.
+
+Usage:
+bootDetector = BootDetector(logcat, tv)
+bootResult = bootDetector.powerCycle(timeout=100)
+metrics.bootDuration(bootResult)
+"""
+from framework import api
+
+from testCaseUtils.waitEngine import waitUntil, motionResumed
+
+BOOT_TIMEOUT = 100
+BOOT_INTERVAL = 2
+
+# (tag, search) lines Android writes once the boot is completed
+BOOT_MARKERS = [
+    ("SurfaceFlinger", "Boot is finished"),
+    ("ActivityManager", "BOOT_COMPLETED")
+]
+
+
+class BootDetector(object):
+
+    def __init__(self, logcat, tv, markers=None, readyCondition=None, interval=BOOT_INTERVAL):
+        """
+        logcat: LogcatStream of the DUT, tv: LinearTV or MotionEngine. readyCondition replaces the motion check on
+        the video output (e.g. when the DUT boots into a static launcher), it is only polled once a boot marker was
+        seen.
+        """
+        self.logcat = logcat
+        self.markers = markers or BOOT_MARKERS
+        self.readyCondition = readyCondition or motionResumed(tv)
+        self.interval = interval
+
+    def powerCycle(self, timeout=BOOT_TIMEOUT):
+        """ powerOffSTB/powerOnSTB and wait for the boot, returns the WaitResult of waitForBoot() """
+        cursor = self.logcat.cursor()
+        api.powerOffSTB()
+        api.powerOnSTB()
+        return self.waitForBoot(cursor, timeout)
+
+    def powerOn(self, timeout=BOOT_TIMEOUT):
+        cursor = self.logcat.cursor()
+        api.powerOnSTB()
+        return self.waitForBoot(cursor, timeout)
+
+    def waitForBoot(self, cursor, timeout=BOOT_TIMEOUT):
+        """
+        Wait until a boot marker arrived on the cursor and the ready condition holds. The cursor has to be created
+        before the power on, so the markers of the boot are not missed.
+        """
+        state = {"marker": None}
+
+        def condition():
+            if state["marker"] is None:
+                hits = cursor.searchMany(self.markers)
+                if not hits:
+                    return False
+                state["marker"] = hits[0]
+                api.writeDebugLine("Boot marker: {}".format(hits[0].entry.line))
+            return self.readyCondition()
+
+        return waitUntil(condition, timeout, interval=self.interval, description="Boot completed")
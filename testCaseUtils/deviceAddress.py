@@ -0,0 +1,128 @@
+"""
+Description:
+Reads the IPv4 address of the DUT over the ADB connection of the logcat stream (adb server port 5038) and checks it
+against the address of the slot in slotInfo, instead of opening the network settings of the launcher and reading the
+Ethernet IP by OCR (about 30 seconds of key presses per iteration).
+
+"ip -4 -o addr show" gives the interface addresses with their prefix and lifetime (the remaining DHCP lease when the
+address was configured with one, None for "forever"), "ip -4 route show table all" the default gateway. Link-local
+and loopback addresses are ignored. The MAC address and the DNS servers (LinkProperties of "dumpsys connectivity") are
+read for the stand-ins of the network services.
+
+Usage:
+addressCheck = checkDeviceAddress(deviceIP)
+api.writeDebugLine(describeAddressCheck(addressCheck))
+if addressCheck.actual is None:
+    # adb did not answer, read the settings screen instead
+"""
+import re
+import socket
+import struct
+import subprocess
+from collections import namedtuple
+
+from testCaseUtils.logcatStream import adbCommand, ADB_PORT
+
+# validLifetime: seconds, None for "forever"
+InterfaceAddress = namedtuple("InterfaceAddress", ["interface", "address", "prefixLength", "validLifetime"])
+# matches: actual == expected, actual: InterfaceAddress of the expected address (or the first one), None without adb
+AddressCheck = namedtuple("AddressCheck", ["matches", "expected", "actual", "addresses", "gateway"])
+
+ADDRESS_PATTERN = re.compile(r"^\d+:\s+(\S+)\s+inet\s+(\d+\.\d+\.\d+\.\d+)/(\d+).*?valid_lft\s+(\S+)")
+GATEWAY_PATTERN = re.compile(r"^default via (\d+\.\d+\.\d+\.\d+)")
+MAC_PATTERN = re.compile(r"^[0-9a-f]{2}(:[0-9a-f]{2}){5}$")
+DNS_PATTERN = re.compile(r"DnsAddresses: \[([^\]]*)\]")
+IPV4_PATTERN = re.compile(r"\d+\.\d+\.\d+\.\d+")
+
+
+def adbShell(deviceIP, command, port=ADB_PORT, timeout=10):
+    """ Output lines of the shell command on the DUT, None if adb does not answer """
+    try:
+        output = subprocess.check_output(adbCommand(deviceIP, ["shell"] + command, port), stderr=subprocess.DEVNULL,
+                                         timeout=timeout)
+    except (OSError, subprocess.SubprocessError) as e:
+        print("adb shell {} failed: {}".format(" ".join(command), e))
+        return None
+    return output.decode(errors="replace").splitlines()
+
+
+def parseAddresses(lines):
+    """ InterfaceAddresses of "ip -4 -o addr show" lines, without loopback and link-local addresses """
+    addresses = []
+    for line in lines:
+        match = ADDRESS_PATTERN.match(line.strip())
+        if not match:
+            continue
+        interface, address, prefixLength, lifetime = match.groups()
+        if address.startswith("127.") or address.startswith("169.254."):
+            continue
+        validLifetime = None if lifetime == "forever" else int(lifetime.rstrip("sec"))
+        addresses.append(InterfaceAddress(interface, address, int(prefixLength), validLifetime))
+    return addresses
+
+
+def readAddresses(deviceIP, port=ADB_PORT):
+    """ InterfaceAddresses of the DUT, None if adb does not answer """
+    lines = adbShell(deviceIP, ["ip", "-4", "-o", "addr", "show"], port)
+    return None if lines is None else parseAddresses(lines)
+
+
+def readGateway(deviceIP, port=ADB_PORT):
+    """ Default gateway of the DUT (Android keeps it in the table of the network), None if there is none """
+    for line in adbShell(deviceIP, ["ip", "-4", "route", "show", "table", "all"], port) or []:
+        match = GATEWAY_PATTERN.match(line.strip())
+        if match:
+            return match.group(1)
+    return None
+
+
+def readMacAddress(deviceIP, interface="eth0", port=ADB_PORT):
+    """ MAC address of the interface of the DUT ("00:11:22:33:44:55"), None if adb does not answer """
+    lines = adbShell(deviceIP, ["cat", "/sys/class/net/{}/address".format(interface)], port)
+    mac = lines[0].strip().lower() if lines else ""
+    return mac if MAC_PATTERN.match(mac) else None
+
+
+def readDeviceMac(deviceIP, port=ADB_PORT):
+    """ MAC address of the interface of the DUT that has deviceIP, None if adb does not answer """
+    current = next((address for address in readAddresses(deviceIP, port) or [] if address.address == deviceIP), None)
+    return None if current is None else readMacAddress(deviceIP, current.interface, port)
+
+
+def readDnsServers(deviceIP, port=ADB_PORT):
+    """ IPv4 DNS servers of the networks of the DUT, [] if there are none or adb does not answer """
+    servers = []
+    for line in adbShell(deviceIP, ["dumpsys", "connectivity"], port) or []:
+        match = DNS_PATTERN.search(line)
+        if match:
+            servers += [server for server in IPV4_PATTERN.findall(match.group(1)) if server not in servers]
+    return servers
+
+
+def prefixNetmask(prefixLength):
+    """ Netmask of a prefix length, 24 -> "255.255.255.0" """
+    return socket.inet_ntoa(struct.pack("!I", (0xffffffff << (32 - prefixLength)) & 0xffffffff))
+
+
+def checkDeviceAddress(deviceIP, port=ADB_PORT):
+    """ AddressCheck of the addresses of the DUT against deviceIP (slotInfo[server][slot]["ip"]) """
+    addresses = readAddresses(deviceIP, port)
+    if addresses is None:
+        return AddressCheck(False, deviceIP, None, [], None)
+    actual = next((address for address in addresses if address.address == deviceIP),
+                  addresses[0] if addresses else None)
+    matches = actual is not None and actual.address == deviceIP
+    return AddressCheck(matches, deviceIP, actual, addresses, readGateway(deviceIP, port))
+
+
+def describeAddressCheck(addressCheck):
+    """ Debug line of an AddressCheck """
+    if addressCheck.actual is None:
+        return "Actual IP: no IPv4 address read over adb, expected {}".format(addressCheck.expected)
+    actual = addressCheck.actual
+    lease = "forever" if actual.validLifetime is None else "{}s".format(actual.validLifetime)
+    line = "Actual IP: {}/{} on {} (valid {}, gateway {})".format(actual.address, actual.prefixLength,
+                                                                  actual.interface, lease, addressCheck.gateway)
+    if not addressCheck.matches:
+        line += ", does not match the slot IP {}".format(addressCheck.expected)
+    return line
@@ -0,0 +1,222 @@
+"""
+Description:
+Local DHCP server that stands in for the production server of the DUT, so renewal and rebinding come in seconds
+instead of minutes: the DUT gets its usual address (deviceIP) with a short lease (T1 = lease / 2, T2 = lease * 7 / 8)
+and runs through the same DhcpClient code path.
+
+The server listens on the interface of the host that bridges the DUT and only answers the MAC address of the DUT,
+the other clients of the segment keep the production server. The DUT keeps its network settings as well: the gateway,
+netmask and DNS servers it has from the production server are read over adb when the stand-in starts (or given in the
+spec), start() fails when they can not be read. With blockUpstream the replies of the production server to the MAC of
+the DUT are dropped in the bridge (nftables, like the netem backend), the replies of the stand-in are sent by the host
+itself and are not affected. The DHCP impairment is done by the stand-in: it has the switchImpairment_ON/OFF
+API of KImpairment for impairment 'DHCP' and drops/delays its own replies, the KMAX would never see them.
+
+Selected with the dhcpStandIn parameter: "" (production server, default) or
+"<interface>[:<leaseSeconds>[:<router>[:<dnsServer>,<dnsServer>...]]]". Needs root or sudo (port 67, SO_BINDTODEVICE,
+nft).
+
+Usage:
+dhcpServer = createDhcpStandIn("eth1:60", deviceIP, clientMac=slotInfo[server][slotNo].get("mac"))
+dhcpServer.start()
+dhcpServer.switchImpairment_ON(impairment='DHCP', drop=100)
+dhcpServer.switchImpairment_OFF()
+dhcpServer.stop()
+"""
+import random
+import socket
+import struct
+import threading
+import time
+
+from testCaseUtils.deviceAddress import prefixNetmask, readAddresses, readDnsServers, readGateway, readMacAddress
+from testCaseUtils.hostCommands import nft, tableName
+from testCaseUtils.packetDissector import DHCP_MAGIC_COOKIE, DHCP_MESSAGE_TYPES, dhcpOptions
+
+DEFAULT_LEASE_SECONDS = 60
+SIOCGIFADDR = 0x8915
+DISCOVER, OFFER, REQUEST, DECLINE, ACK, NAK, RELEASE = 1, 2, 3, 4, 5, 6, 7
+
+
+def createDhcpStandIn(spec, deviceIP, clientMac=None):
+    """
+    DhcpStandIn for "<interface>[:<leaseSeconds>[:<router>[:<dnsServer>,...]]]", None for an empty spec (production
+    DHCP server). clientMac (slotInfo "mac"), router and DNS servers that are not given are read from the DUT.
+    """
+    if not spec:
+        return None
+    fields = spec.split(":") + ["", "", ""]
+    interface, leaseSeconds, router, dnsServers = fields[:4]
+    return DhcpStandIn(interface, deviceIP, leaseSeconds=int(leaseSeconds or DEFAULT_LEASE_SECONDS),
+                       router=router or None, dnsServers=dnsServers.split(",") if dnsServers else None,
+                       clientMac=clientMac)
+
+
+def interfaceAddress(interface):
+    # Linux only, like the stand-in itself
+    import fcntl
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        request = struct.pack("256s", interface[:15].encode())
+        return socket.inet_ntoa(fcntl.ioctl(probe.fileno(), SIOCGIFADDR, request)[20:24])
+
+
+class DhcpStandIn(object):
+
+    def __init__(self, interface, deviceIP, leaseSeconds=DEFAULT_LEASE_SECONDS, serverIP=None, netmask=None,
+                 router=None, dnsServers=None, clientMac=None, blockUpstream=True):
+        self.interface = interface
+        self.deviceIP = deviceIP
+        self.leaseSeconds = leaseSeconds
+        self.serverIP = serverIP
+        # None: the settings the DUT has from the production server, read over adb by start()
+        self.netmask = netmask
+        self.router = router
+        self.dnsServers = dnsServers
+        # MAC of the DUT ("00:11:22:33:44:55"), the only client that is answered
+        self.clientMac = clientMac.lower() if clientMac else None
+        self.blockUpstream = blockUpstream
+        self.table = tableName("testCaseDhcp", interface, deviceIP)
+        # (time, received message, mac, reply or None)
+        self.exchanges = []
+        self.drop = 0
+        self.delay = 0
+        self.lastToggleSeconds = 0.0
+        self._socket = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.serverIP is None:
+            self.serverIP = interfaceAddress(self.interface)
+        self._readNetwork()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, self.interface.encode())
+        self._socket.bind(("", 67))
+        self._socket.settimeout(1)
+        if self.blockUpstream:
+            nft(["add table bridge {}".format(self.table),
+                 "add chain bridge {} forward {{ type filter hook forward priority -10; policy accept; }}".format(
+                     self.table),
+                 "flush chain bridge {} forward".format(self.table),
+                 # chaddr of the BOOTP reply (UDP payload offset 28)
+                 "add rule bridge {} forward udp sport 67 udp dport 68 @th,288,48 0x{} drop".format(
+                     self.table, self.clientMac.replace(":", ""))])
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._serve, name="dhcpStandIn", daemon=True)
+        self._thread.start()
+        print("DHCP stand-in on {} ({}): {} for {} with {}s leases, gateway {}, DNS {}".format(
+            self.interface, self.serverIP, self.deviceIP, self.clientMac, self.leaseSeconds, self.router,
+            ", ".join(self.dnsServers)))
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self.blockUpstream:
+            nft(["delete table bridge {}".format(self.table)], check=False)
+
+    def _readNetwork(self):
+        """ MAC, netmask, gateway and DNS servers of the DUT that were not given, ValueError if adb cannot read them """
+        addresses = readAddresses(self.deviceIP) or []
+        current = next((address for address in addresses if address.address == self.deviceIP), None)
+        if current is not None:
+            self.clientMac = self.clientMac or readMacAddress(self.deviceIP, current.interface)
+            self.netmask = self.netmask or prefixNetmask(current.prefixLength)
+        self.router = self.router or readGateway(self.deviceIP)
+        self.dnsServers = self.dnsServers or readDnsServers(self.deviceIP)
+        missing = [name for name, value in (("MAC address", self.clientMac), ("netmask", self.netmask),
+                                            ("gateway", self.router), ("DNS servers", self.dnsServers)) if not value]
+        if missing:
+            raise ValueError("DHCP stand-in: {} of {} not readable over adb, give the gateway and DNS servers in the "
+                             "dhcpStandIn spec and the MAC address in slotInfo".format(", ".join(missing),
+                                                                                       self.deviceIP))
+
+    def switchImpairment_ON(self, impairment="DHCP", drop=None, delay=None, filterNo=None):
+        """ drop: % of the replies dropped, delay: seconds, like KImpairment.switchImpairment_ON() """
+        if impairment != "DHCP":
+            raise ValueError("The DHCP stand-in only impairs DHCP, not {}".format(impairment))
+        self.drop = drop or 0
+        self.delay = delay or 0
+        print("DHCP stand-in: drop {}% delay {}s".format(self.drop, self.delay))
+
+    def switchImpairment_OFF(self, filterNo=None):
+        self.drop = 0
+        self.delay = 0
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                data, _ = self._socket.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            try:
+                self._handle(data)
+            except (IndexError, struct.error) as e:
+                print("DHCP stand-in: malformed packet ({})".format(e))
+
+    def _handle(self, data):
+        if len(data) < 240 or data[0] != 1 or data[236:240] != DHCP_MAGIC_COOKIE:
+            return
+        mac = ":".join("{:02x}".format(byte) for byte in data[28:34])
+        if mac != self.clientMac:
+            return
+        options = dhcpOptions(data[240:])
+        messageType = options.get(53, b"\x00")[0]
+        clientIP = socket.inet_ntoa(data[12:16])
+        reply = None
+        if messageType == DISCOVER:
+            reply = OFFER
+        elif messageType == REQUEST:
+            requested = socket.inet_ntoa(options[50]) if 50 in options else clientIP
+            serverId = socket.inet_ntoa(options[54]) if 54 in options else None
+            if serverId is not None and serverId != self.serverIP:
+                # the DUT selected another server
+                reply = None
+            else:
+                reply = ACK if requested == self.deviceIP else NAK
+        self.exchanges.append((time.time(), DHCP_MESSAGE_TYPES.get(messageType, messageType), mac,
+                               DHCP_MESSAGE_TYPES.get(reply) if reply else None))
+        if reply is None:
+            return
+        if self.drop and random.uniform(0, 100) < self.drop:
+            print("DHCP stand-in: {} to {} dropped".format(DHCP_MESSAGE_TYPES[reply], mac))
+            return
+        packet = self._reply(data, reply)
+        destination = clientIP if clientIP != "0.0.0.0" and reply != NAK else "255.255.255.255"
+        if self.delay:
+            timer = threading.Timer(self.delay, self._send, (packet, destination))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._send(packet, destination)
+
+    def _reply(self, request, messageType):
+        transactionId, flags = request[4:8], request[10:12]
+        yourIP = socket.inet_aton(self.deviceIP if messageType != NAK else "0.0.0.0")
+        header = struct.pack("!BBBB", 2, 1, 6, 0) + transactionId + b"\x00\x00" + flags
+        header += request[12:16] + yourIP + socket.inet_aton(self.serverIP) + request[24:28] + request[28:44]
+        header += b"\x00" * 192 + DHCP_MAGIC_COOKIE
+        options = [(53, bytes([messageType])), (54, socket.inet_aton(self.serverIP))]
+        if messageType != NAK:
+            options += [(51, struct.pack("!I", self.leaseSeconds)),
+                        (58, struct.pack("!I", self.leaseSeconds // 2)),
+                        (59, struct.pack("!I", self.leaseSeconds * 7 // 8)),
+                        (1, socket.inet_aton(self.netmask)),
+                        (3, socket.inet_aton(self.router)),
+                        (6, b"".join(socket.inet_aton(address) for address in self.dnsServers))]
+        body = b"".join(bytes([code, len(value)]) + value for code, value in options) + b"\xff"
+        return header + body
+
+    def _send(self, packet, destination):
+        if self._socket is not None:
+            self._socket.sendto(packet, (destination, 68))
@@ -0,0 +1,257 @@
+"""
+Description:
+DHCP lease state machine of the DUT rebuilt from the DhcpClient logcat lines and/or captured DHCP packets: DISCOVER
+retries and their backoff, OFFER, REQUEST/ACK/NAK, renewal (unicast REQUEST after T1), rebinding (broadcast REQUEST
+after T2) and lease expiry (back to DISCOVER), with the lease timers the DUT scheduled.
+
+Events keep the wall clock time they were logged/captured at, so retry intervals are exact. The logcat timestamps are
+local times of the DUT, they are converted with the UTC offset of the DUT (readUtcOffset) where it is known, the
+timezone of the host otherwise. monotonic() maps them to the host monotonic clock of the latency metrics with the
+smallest (arrival - logged) difference seen while following the live stream, or the wall clock offset of the host when
+nothing was followed live.
+
+waitForRetryPattern() follows the logcat stream and returns as soon as the DUT has retransmitted a message minRetries
+times without an answer (the first send is not a retry), instead of waiting for a fixed number of retries with fixed
+timeouts.
+
+Usage:
+dhcp = DhcpLeaseMonitor(logcat.cursor(), utcOffset=readUtcOffset(deviceIP))
+kmaxImpairment.switchImpairment_ON(impairment='DHCP', drop=100, filterNo=filterNo)
+retries = dhcp.waitForRetryPattern("REQUEST", minRetries=3, maxRetries=5, firstTimeout=265, timeout=45)
+...
+dhcp.update()
+ack = dhcp.firstEvent("ACK", after=impairmentOffAt)
+metrics.markEvent("dhcpAck", since="impairmentOff", at=dhcp.monotonic(ack))
+for line in dhcp.report():
+    print(line)
+"""
+import calendar
+import datetime
+import re
+import time
+from collections import namedtuple
+
+from testCaseUtils.deviceAddress import adbShell
+
+# at: wall clock seconds
+DhcpEvent = namedtuple("DhcpEvent", ["at", "message", "delivery", "source", "detail"])
+# sends: every send of the message, retries: the retransmissions among them
+RetryPattern = namedtuple("RetryPattern", ["message", "sends", "retries", "intervals", "answered", "confirmed",
+                                           "elapsed", "unusedSeconds"])
+
+CLIENT_MESSAGES = ("DISCOVER", "REQUEST", "DECLINE", "RELEASE", "INFORM")
+SERVER_MESSAGES = ("OFFER", "ACK", "NAK")
+
+# Android DhcpClient: "Broadcasting DHCPDISCOVER", "Unicasting DHCPREQUEST ciaddr=...", "Received packet: ... ACK: ..."
+SEND_PATTERN = re.compile(r"(Broadcasting|Unicasting) DHCP(DISCOVER|REQUEST|DECLINE|RELEASE|INFORM)")
+RECEIVE_PATTERN = re.compile(r"Received packet.*?\b(OFFER|ACK|NAK)\b")
+TIMER_PATTERN = re.compile(r"Scheduling (renewal|rebind|expiry) in (\d+)s")
+LEASE_PATTERN = re.compile(r"lease time (\d+)")
+UTC_OFFSET_PATTERN = re.compile(r"^([+-])(\d\d)(\d\d)$")
+
+
+def readUtcOffset(deviceIP):
+    """ Seconds east of UTC of the clock of the DUT ("date +%z"), None if adb does not answer """
+    lines = adbShell(deviceIP, ["date", "+%z"])
+    match = UTC_OFFSET_PATTERN.match(lines[0].strip()) if lines else None
+    if match is None:
+        return None
+    sign, hours, minutes = match.groups()
+    return (-1 if sign == "-" else 1) * (int(hours) * 3600 + int(minutes) * 60)
+
+
+def logSeconds(timestamp, utcOffset=None):
+    """
+    Epoch seconds of a logcat threadtime timestamp ("10-18 12:34:56.789", the year is not logged), utcOffset: seconds
+    east of UTC of the DUT, None for the timezone of the host
+    """
+    if utcOffset is None:
+        now = datetime.datetime.now()
+    else:
+        now = datetime.datetime.fromtimestamp(time.time() + utcOffset, datetime.timezone.utc).replace(tzinfo=None)
+    logged = datetime.datetime.strptime("{}-{}".format(now.year, timestamp), "%Y-%m-%d %H:%M:%S.%f")
+    if logged > now + datetime.timedelta(days=1):
+        # logged last year
+        logged = logged.replace(year=now.year - 1)
+    if utcOffset is None:
+        return time.mktime(logged.timetuple()) + logged.microsecond / 1e6
+    return calendar.timegm(logged.timetuple()) - utcOffset + logged.microsecond / 1e6
+
+
+def retryRuns(events, message):
+    """ Lists of consecutive sends of message without a server answer in between """
+    runs, current = [], []
+    for event in events:
+        if event.message == message:
+            current.append(event)
+        elif event.message in SERVER_MESSAGES or event.message in CLIENT_MESSAGES:
+            if current:
+                runs.append(current)
+            current = []
+    if current:
+        runs.append(current)
+    return runs
+
+
+def intervals(run):
+    return [round(second.at - first.at, 3) for first, second in zip(run, run[1:])]
+
+
+class DhcpLeaseMonitor(object):
+
+    def __init__(self, cursor=None, tag="DhcpClient", utcOffset=None):
+        self.cursor = cursor
+        self.tag = tag
+        # of the DUT clock, None: timezone of the host
+        self.utcOffset = utcOffset
+        self.events = []
+        # "renewal"/"rebind"/"expiry"/"lease" -> seconds, as last scheduled/granted
+        self.timers = {}
+        # host monotonic = wall clock seconds + clockOffset
+        self.clockOffset = None
+
+    def update(self):
+        """ Read the new DhcpClient lines of the cursor, returns the new events """
+        if self.cursor is None:
+            return []
+        newEvents = []
+        for entry in self.cursor.newEntries():
+            event = self.addLogEntry(entry)
+            if event is not None:
+                newEvents.append(event)
+        return newEvents
+
+    def addLogEntry(self, entry, arrivedAt=None):
+        if entry.tag != self.tag:
+            return None
+        at = logSeconds(entry.timestamp, self.utcOffset)
+        if arrivedAt is not None and (self.clockOffset is None or arrivedAt - at < self.clockOffset):
+            self.clockOffset = arrivedAt - at
+
+        timer = TIMER_PATTERN.search(entry.message)
+        if timer:
+            self.timers[timer.group(1)] = int(timer.group(2))
+            return None
+        send = SEND_PATTERN.search(entry.message)
+        if send:
+            delivery = "broadcast" if send.group(1) == "Broadcasting" else "unicast"
+            return self._add(DhcpEvent(at, send.group(2), delivery, "log", entry.message))
+        receive = RECEIVE_PATTERN.search(entry.message)
+        if receive:
+            lease = LEASE_PATTERN.search(entry.message)
+            if lease:
+                self.timers["lease"] = int(lease.group(1))
+            return self._add(DhcpEvent(at, receive.group(1), None, "log", entry.message))
+        return None
+
+    def addPacketEvents(self, packetEvents):
+        """ DHCP events of packetDissector, e.g. PacketCapture.iterationEvents(); packets and logs can be mixed """
+        for packetEvent in packetEvents:
+            if not packetEvent.kind.startswith("DHCP "):
+                continue
+            message = packetEvent.kind[5:]
+            delivery = None
+            if message in CLIENT_MESSAGES:
+                delivery = "broadcast" if packetEvent.dst == "255.255.255.255" else "unicast"
+            for name, field in (("lease", "leaseTime"), ("renewal", "renewalTime"), ("rebind", "rebindingTime")):
+                if field in packetEvent.fields:
+                    self.timers[name] = packetEvent.fields[field]
+            self._add(DhcpEvent(packetEvent.timestamp, message, delivery, "packet", packetEvent.detail))
+        self.events.sort(key=lambda event: event.at)
+
+    def monotonic(self, event):
+        """ Host monotonic time of the event """
+        offset = self.clockOffset if self.clockOffset is not None else time.monotonic() - time.time()
+        return event.at + offset
+
+    def _add(self, event):
+        self.events.append(event)
+        return event
+
+    def waitForRetryPattern(self, message="REQUEST", minRetries=3, maxRetries=5, firstTimeout=265, timeout=45):
+        """
+        Follow the stream until message was retransmitted minRetries times without an answer (confirmed), maxRetries
+        retransmissions are reached, the DUT gets an answer, or no retry comes within timeout (firstTimeout for the
+        first send). unusedSeconds is what is left of the firstTimeout + maxRetries * timeout budget.
+        """
+        started = time.monotonic()
+        budget = firstTimeout + maxRetries * timeout
+        sends = []
+        answered = False
+        lastSendAt = started
+        while len(sends) <= maxRetries:
+            remaining = (firstTimeout if not sends else timeout) - (time.monotonic() - lastSendAt)
+            if remaining <= 0:
+                break
+            entry = self.cursor.waitFor(tag=self.tag, timeout=remaining)
+            if entry is None:
+                break
+            event = self.addLogEntry(entry, arrivedAt=time.monotonic())
+            if event is None:
+                continue
+            if event.message == message:
+                sends.append(event)
+                lastSendAt = time.monotonic()
+                print("{} send {}: {}".format(message, len(sends), entry.line))
+                if len(sends) > minRetries:
+                    break
+            elif event.message in SERVER_MESSAGES and sends:
+                answered = True
+                break
+        elapsed = time.monotonic() - started
+        retries = max(0, len(sends) - 1)
+        return RetryPattern(message, sends, retries, intervals(sends), answered, retries >= minRetries and not answered,
+                            round(elapsed, 3), max(0, int(budget - elapsed)))
+
+    def firstEvent(self, message, after=None):
+        """ First event of message, after: host monotonic time """
+        for event in self.events:
+            if event.message == message and (after is None or self.monotonic(event) >= after):
+                return event
+        return None
+
+    def recoveryTime(self, since):
+        """ Seconds from since (host monotonic, e.g. impairment off) to the first ACK, None without ACK """
+        ack = self.firstEvent("ACK", after=since)
+        return None if ack is None else round(self.monotonic(ack) - since, 3)
+
+    def states(self):
+        """ (at, state) transitions of the lease state machine (RFC 2131 states) """
+        transitions = []
+        state = None
+        bound = False
+        for event in self.events:
+            if event.message == "DISCOVER":
+                newState, bound = "SELECTING", False
+            elif event.message == "REQUEST":
+                # a unicast REQUEST only goes to the server of a lease (T1), even when its ACK was not seen
+                if event.delivery == "unicast":
+                    newState = "RENEWING"
+                else:
+                    newState = "REBINDING" if bound else "REQUESTING"
+            elif event.message == "ACK":
+                newState, bound = "BOUND", True
+            elif event.message == "NAK":
+                newState, bound = "INIT", False
+            else:
+                continue
+            if newState != state:
+                transitions.append((event.at, newState))
+                state = newState
+        return transitions
+
+    def report(self):
+        """ Debug lines: state transitions, retry cadence, lease timers """
+        if not self.events:
+            return ["DHCP: no DhcpClient events"]
+        start = self.events[0].at
+        lines = ["DHCP states: " + ", ".join("{:.3f}s {}".format(at - start, state) for at, state in self.states())]
+        for message in ("DISCOVER", "REQUEST"):
+            for run in retryRuns(self.events, message):
+                if len(run) > 1:
+                    lines.append("DHCP {} x{} at {:.3f}s, intervals {}".format(message, len(run), run[0].at - start,
+                                                                             intervals(run)))
+        if self.timers:
+            lines.append("DHCP lease timers: {}".format(", ".join(
+                "{} {}s".format(name, seconds) for name, seconds in sorted(self.timers.items()))))
+        return lines
@@ -0,0 +1,247 @@
+"""
+Description:
+Local DNS responder that stands in for the resolver of the DUT: every query is recorded with its arrival time and
+forwarded to the upstream resolver, the answer is dropped or delayed per hostname. With rules for www.google.com only
+(or only the CDN host) the DNS impairment hits a single name while the rest of the DUT resolves normally, and the
+recorded queries show the timeout and retry cadence of the resolver of the DUT to the millisecond.
+
+With intercept the DNS queries of the DUT are redirected to the stand-in with an nftables nat rule, the DUT keeps its
+configured resolver. The rule sees the traffic when the host routes the DUT or bridges it with br_netfilter
+(net.bridge.bridge-nf-call-iptables=1). Needs root or sudo, like the netem backend. Every slot has its own listen port
+(DEFAULT_LISTEN_PORT + slotNo) and its own nat table named after its DUT, the stand-ins of the slots of a host never
+share a socket or a chain.
+
+The stand-in has the switchImpairment_ON/OFF API of KImpairment for impairment 'DNS' (drop: % of the answers, delay:
+seconds), the hosts of the impairment are fnmatch patterns, "*" for every name.
+
+Selected with the dnsStandIn parameter: "" (KMAX, default) or "<interface>[:<host>,<host>...]".
+
+Usage:
+dnsServer = createDnsStandIn("eth1:www.google.com", deviceIP, slotNo)
+dnsServer.start()
+dnsServer.switchImpairment_ON(impairment='DNS', delay=15)
+...
+dnsServer.switchImpairment_OFF()
+for line in dnsServer.report(since=dnsServer.impairedAt):
+    print(line)
+dnsServer.stop()
+"""
+import datetime
+import fnmatch
+import json
+import os
+import random
+import socket
+import threading
+import time
+from collections import namedtuple
+
+from testCaseUtils.hostCommands import nft, tableName
+from testCaseUtils.packetDissector import dnsEvent
+
+DEFAULT_LOG_DIR = os.path.join("results", "dns")
+DEFAULT_LISTEN_PORT = 5300
+UPSTREAM_TIMEOUT = 5
+
+# at/answeredAt: wall clock seconds, action: "answered", "dropped" or "delayed", answeredAt None without answer
+DnsQuery = namedtuple("DnsQuery", ["at", "client", "queryId", "name", "type", "action", "delay", "answeredAt",
+                                   "rcode"])
+
+
+def createDnsStandIn(spec, deviceIP, slotNo):
+    """ DnsStandIn for "<interface>[:<host>,<host>...]", None for an empty spec (impairment on the KMAX) """
+    if not spec:
+        return None
+    interface, _, hosts = spec.partition(":")
+    logPath = os.path.join(DEFAULT_LOG_DIR, "slot{}_{}.jsonl".format(
+        slotNo, datetime.datetime.now().strftime("%Y%m%d-%H%M%S")))
+    return DnsStandIn(interface, deviceIP, hosts=hosts.split(",") if hosts else None,
+                      listenPort=DEFAULT_LISTEN_PORT + int(slotNo), logPath=logPath)
+
+
+def systemResolver():
+    """ First nameserver of /etc/resolv.conf """
+    with open("/etc/resolv.conf") as resolvConf:
+        for line in resolvConf:
+            fields = line.split()
+            if len(fields) >= 2 and fields[0] == "nameserver":
+                return fields[1]
+    raise IOError("No nameserver in /etc/resolv.conf")
+
+
+class DnsStandIn(object):
+
+    def __init__(self, interface, deviceIP, hosts=None, upstream=None, listenPort=DEFAULT_LISTEN_PORT, intercept=True,
+                 logPath=None):
+        self.interface = interface
+        self.deviceIP = deviceIP
+        # hosts of switchImpairment_ON() without hosts argument
+        self.hosts = hosts or ["*"]
+        self.upstream = upstream
+        self.listenPort = listenPort
+        self.intercept = intercept
+        self.logPath = logPath
+        self.table = tableName("testCaseDns", interface, deviceIP)
+        # (pattern, drop %, delay seconds), the first matching pattern applies
+        self.rules = []
+        self.queries = []
+        self.lastToggleSeconds = 0.0
+        # wall clock time of the last switchImpairment_ON()
+        self.impairedAt = None
+        self._lock = threading.Lock()
+        self._socket = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.upstream is None:
+            self.upstream = systemResolver()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(("", self.listenPort))
+        self._socket.settimeout(1)
+        if self.intercept:
+            nft(["add table ip {}".format(self.table),
+                 "add chain ip {} prerouting {{ type nat hook prerouting priority -100; }}".format(self.table),
+                 # the table of this DUT only, left over when an earlier run was killed
+                 "flush chain ip {} prerouting".format(self.table),
+                 "add rule ip {} prerouting iifname {} ip saddr {} udp dport 53 redirect to :{}".format(
+                     self.table, self.interface, self.deviceIP, self.listenPort)])
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._serve, name="dnsStandIn", daemon=True)
+        self._thread.start()
+        print("DNS stand-in on port {} for {} ({}), upstream {}".format(self.listenPort, self.deviceIP, self.interface,
+                                                                        self.upstream))
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self.intercept:
+            nft(["delete table ip {}".format(self.table)], check=False)
+        if self.logPath is not None and self.queries:
+            os.makedirs(os.path.dirname(self.logPath), exist_ok=True)
+            with open(self.logPath, "a") as log:
+                for query in self.queries:
+                    log.write(json.dumps(query._asdict()) + "\n")
+            print("DNS queries written to {}".format(self.logPath))
+
+    def setRule(self, pattern, drop=0, delay=0):
+        """ Drop drop % of the answers for the names matching pattern and delay the others by delay seconds """
+        with self._lock:
+            self.rules = [rule for rule in self.rules if rule[0] != pattern.lower()]
+            self.rules.append((pattern.lower(), drop or 0, delay or 0))
+
+    def clearRules(self):
+        with self._lock:
+            self.rules = []
+
+    def switchImpairment_ON(self, impairment="DNS", drop=None, delay=None, filterNo=None, hosts=None):
+        """ drop: % of the answers dropped, delay: seconds, for hosts (default: the hosts of the stand-in) """
+        if impairment != "DNS":
+            raise ValueError("The DNS stand-in only impairs DNS, not {}".format(impairment))
+        self.clearRules()
+        self.impairedAt = time.time()
+        for pattern in hosts or self.hosts:
+            self.setRule(pattern, drop, delay)
+        print("DNS stand-in: drop {}% delay {}s for {}".format(drop or 0, delay or 0, ", ".join(hosts or self.hosts)))
+
+    def switchImpairment_OFF(self, filterNo=None):
+        self.clearRules()
+
+    def ruleFor(self, name):
+        with self._lock:
+            for pattern, drop, delay in self.rules:
+                if fnmatch.fnmatch(name.lower(), pattern):
+                    return drop, delay
+        return 0, 0
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                data, client = self._socket.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            self._handle(data, client, time.time())
+
+    def _handle(self, data, client, at):
+        try:
+            event = dnsEvent(at, client[0], None, data)
+        except (IndexError, UnicodeDecodeError) as e:
+            print("DNS stand-in: malformed query from {} ({})".format(client[0], e))
+            return
+        if event is None or event.kind != "DNS query":
+            return
+        drop, delay = self.ruleFor(event.fields["name"])
+        if drop and random.uniform(0, 100) < drop:
+            action = "dropped"
+        elif delay:
+            action = "delayed"
+        else:
+            action = "answered"
+        query = DnsQuery(at, client[0], event.fields["id"], event.fields["name"], event.fields["type"], action, delay,
+                         None, None)
+        with self._lock:
+            index = len(self.queries)
+            self.queries.append(query)
+        if action != "dropped":
+            threading.Thread(target=self._forward, args=(data, client, index, delay), daemon=True).start()
+
+    def _forward(self, data, client, index, delay):
+        if delay:
+            time.sleep(delay)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as upstream:
+            upstream.settimeout(UPSTREAM_TIMEOUT)
+            try:
+                upstream.sendto(data, (self.upstream, 53))
+                answer = upstream.recv(4096)
+            except OSError as e:
+                print("DNS stand-in: upstream {} failed ({})".format(self.upstream, e))
+                return
+        if self._socket is None:
+            return
+        self._socket.sendto(answer, client)
+        response = dnsEvent(time.time(), self.upstream, client[0], answer)
+        with self._lock:
+            self.queries[index] = self.queries[index]._replace(
+                answeredAt=time.time(), rcode=response.fields.get("rcode") if response is not None else None)
+
+    def queriesSince(self, since=None, name=None):
+        with self._lock:
+            return [query for query in self.queries
+                    if (since is None or query.at >= since) and (name is None or query.name == name)]
+
+    def retryIntervals(self, name, queryType="A", since=None):
+        """ Seconds between the unanswered queries of name and the next query of the same name (resolver retries) """
+        queries = [query for query in self.queriesSince(since, name) if query.type == queryType]
+        return [round(second.at - first.at, 3) for first, second in zip(queries, queries[1:])
+                if first.answeredAt is None or first.answeredAt > second.at]
+
+    def report(self, since=None):
+        """ Debug lines per name: queries, dropped/delayed, retry intervals and answer times """
+        queries = self.queriesSince(since)
+        if not queries:
+            return ["DNS: no queries"]
+        lines = []
+        for name in sorted(set(query.name for query in queries)):
+            ofName = [query for query in queries if query.name == name]
+            actions = {action: sum(1 for query in ofName if query.action == action)
+                       for action in ("answered", "delayed", "dropped")}
+            answerSeconds = [round(query.answeredAt - query.at, 3) for query in ofName if query.answeredAt is not None]
+            line = "DNS {}: {} queries ({})".format(name, len(ofName), ", ".join(
+                "{} {}".format(count, action) for action, count in actions.items() if count))
+            for queryType in sorted(set(query.type for query in ofName)):
+                intervals = self.retryIntervals(name, queryType, since)
+                if intervals:
+                    line += ", {} retries after {}".format(queryType, intervals)
+            if answerSeconds:
+                line += ", answered in {}".format(answerSeconds)
+            lines.append(line)
+        return lines
@@ -0,0 +1,126 @@
+"""
+Description:
+ErrorCheck with a perceptual hash cache in front of the full screen analysis. Every getErrorCode() captures the
+error code text of the dialog (ERROR_CODE_RECT) and hashes it:
+- hash unchanged since the last call: the last result is returned, the code text did not change
+- hash close to exactly one known code and clearly away from all other codes: that error code is returned
+- otherwise ErrorCheck.getErrorCode() analyses the screen, error codes it finds are added to the index
+
+Error dialogs of different codes only differ in the code text, a hash of the whole dialog can not tell Code-0100 from
+Code-0101. Only the code text region is hashed therefore, and without ERROR_CODE_RECT there is no cache at all: every
+call goes to ErrorCheck.
+
+The index of known error codes (Code-0100, Code-0101, ...) is learned from the full analysis and kept in
+results/screenIndex/errorCodes.json, so later runs start with it. Without numpy/Pillow, or when the capture fails,
+every call goes to ErrorCheck.
+
+Usage:
+errorCheck = CachedErrorCheck(ErrorCheck())
+result = errorCheck.waitForErrorCode('Code-0100', timeout=120)
+errorResult = errorCheck.getErrorCode()
+"""
+import os
+
+from framework import api
+
+from testCaseUtils import screenHash
+from testCaseUtils.jsonStore import loadJson, saveMerged
+from testCaseUtils.motionEngine import captureGrayFrame
+from testCaseUtils.screenHash import dHash, hammingDistance, HashIndex
+from testCaseUtils.waitEngine import waitUntil, errorCodeShown
+
+# error codes of the impairment scenarios
+KNOWN_ERROR_CODES = ("Code-0100", "Code-0101", "Code-0102", "Code-0204", "Code-0500", "Code-0601", "Code-11630")
+DEFAULT_INDEX_PATH = os.path.join("results", "screenIndex", "errorCodes.json")
+# (x, y, width, height) of the error code text of the dialog, None: no cache, every call goes to ErrorCheck
+ERROR_CODE_RECT = None
+# 16x16 bits
+HASH_SIZE = 16
+UNCHANGED_DISTANCE = 2
+# a code hit is within MATCH_DISTANCE of its code and no other code is within AMBIGUOUS_DISTANCE
+MATCH_DISTANCE = 2
+AMBIGUOUS_DISTANCE = 12
+POLL_INTERVAL = 1
+
+
+class CachedErrorCheck(object):
+
+    def __init__(self, errorCheck, indexPath=DEFAULT_INDEX_PATH, codeRect=ERROR_CODE_RECT):
+        self.errorCheck = errorCheck
+        self.indexPath = indexPath
+        self.codeRect = codeRect
+        self.lastHash = None
+        self.lastResult = None
+        self.fullChecks = 0
+        self.cachedChecks = 0
+        # error code -> list of code text hashes, as stored in indexPath
+        self.knownScreens = loadJson(self.indexPath, "error screen index")
+        self.index = HashIndex(bits=HASH_SIZE * HASH_SIZE, chunks=16)
+        for code, hashes in self.knownScreens.items():
+            for knownHash in hashes:
+                self.index.add(knownHash, code)
+
+    def getErrorCode(self):
+        """ (errorShown, errorCode) like ErrorCheck.getErrorCode() """
+        codeHash = self._hash(self.codeRect, scale=1) if self.codeRect is not None else None
+        if codeHash is None:
+            return self._fullCheck(None)
+
+        if self.lastHash is not None and hammingDistance(codeHash, self.lastHash) <= UNCHANGED_DISTANCE:
+            self.cachedChecks += 1
+            return self.lastResult
+
+        code = self.lookup(codeHash)
+        if code is not None:
+            self.cachedChecks += 1
+            self.lastHash, self.lastResult = codeHash, (True, code)
+            return self.lastResult
+        return self._fullCheck(codeHash)
+
+    def waitForErrorCode(self, expectedCode=None, timeout=120, interval=POLL_INTERVAL):
+        """ Poll until an error screen (optionally expectedCode) is shown, returns the WaitResult """
+        return waitUntil(errorCodeShown(self, expectedCode), timeout, interval=interval, description="Error screen")
+
+    def lookup(self, codeHash):
+        """
+        The error code with a known code text within MATCH_DISTANCE, None if there is none or another code is within
+        AMBIGUOUS_DISTANCE
+        """
+        matches = self.index.search(codeHash, AMBIGUOUS_DISTANCE)
+        codes = set(code for distance, code in matches)
+        if len(codes) != 1 or matches[0][0] > MATCH_DISTANCE:
+            return None
+        return codes.pop()
+
+    def _fullCheck(self, codeHash):
+        self.fullChecks += 1
+        result = self.errorCheck.getErrorCode()
+        if codeHash is not None:
+            self.lastHash, self.lastResult = codeHash, result
+            if result[0] and result[1] in KNOWN_ERROR_CODES:
+                self._learn(result[1], codeHash)
+        return result
+
+    def _hash(self, rect, scale):
+        if not screenHash.available():
+            return None
+        try:
+            return dHash(captureGrayFrame(scale=scale, rect=rect), HASH_SIZE)
+        except Exception as e:
+            api.writeDebugLine("Error screen hash failed: {}".format(e))
+            return None
+
+    def _learn(self, code, codeHash):
+        if any(known == code for distance, known in self.index.search(codeHash, UNCHANGED_DISTANCE)):
+            return
+        self.index.add(codeHash, code)
+        self.knownScreens.setdefault(code, []).append(codeHash)
+        saveMerged(self.indexPath, self.knownScreens, mergeScreens, "error screen index", indent=2, sort_keys=True)
+
+
+def mergeScreens(knownScreens, stored):
+    """ Add the hashes other slots stored to knownScreens (code -> hashes) """
+    for code, hashes in stored.items():
+        known = knownScreens.setdefault(code, [])
+        known.extend(knownHash for knownHash in hashes if knownHash not in known)
+    return knownScreens
@@ -0,0 +1,142 @@
+"""
+Description:
+Exclusive KMAX filter leases. (slotNo % 4) + 1 maps slots 13 and 17 to the same KImpairment filter, so two test
+cases running at the same time on one KMAX overwrite each other's impairment. A FilterLease hands out a filter that no
+other test case process on this host holds, waits while all filters are taken and gives the filter back on release().
+
+The lease is an OS file lock, so a crashed test case cannot keep a filter blocked.
+
+Usage:
+filterLease = FilterLease(ipKmax, slotNo)
+filterNo = filterLease.acquire()
+...
+finally:
+    filterLease.release()
+"""
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+KMAX_FILTERS = (1, 2, 3, 4)
+DEFAULT_LEASE_DIR = os.path.join(tempfile.gettempdir(), "kmaxFilterLeases")
+
+
+class FilterLeaseTimeout(Exception):
+    pass
+
+
+class FilterLease(object):
+
+    def __init__(self, ipKmax, slotNo, filters=KMAX_FILTERS, leaseDir=DEFAULT_LEASE_DIR):
+        self.ipKmax = ipKmax
+        self.slotNo = int(slotNo)
+        self.filters = tuple(filters)
+        self.leaseDir = os.path.join(leaseDir, str(ipKmax).replace(":", "_"))
+        self.filterNo = None
+        self._lockFile = None
+
+    def acquire(self, timeout=None, interval=5):
+        """
+        Lease a free filter and return its number. The filter of the old (slotNo % 4) + 1 mapping is preferred so a
+        single test case still uses the same filter as before. Waits until a filter is released or timeout is reached.
+        """
+        if self.filterNo is not None:
+            return self.filterNo
+        os.makedirs(self.leaseDir, exist_ok=True)
+
+        preferred = (self.slotNo % len(self.filters))
+        candidates = self.filters[preferred:] + self.filters[:preferred]
+        start = time.monotonic()
+        waiting = False
+        while True:
+            for filterNo in candidates:
+                if self._tryLock(filterNo):
+                    self.filterNo = filterNo
+                    print("KMAX {}: slot {} leased filter {}".format(self.ipKmax, self.slotNo, filterNo))
+                    return filterNo
+            if timeout is not None and time.monotonic() - start >= timeout:
+                raise FilterLeaseTimeout("KMAX {}: no free filter for slot {} after {} Seconds, holders: {}".format(
+                    self.ipKmax, self.slotNo, timeout, self.holders()))
+            if not waiting:
+                print("KMAX {}: all filters taken ({}), slot {} waiting".format(self.ipKmax, self.holders(), self.slotNo))
+                waiting = True
+            time.sleep(interval)
+
+    def release(self):
+        if self._lockFile is None:
+            return
+        unlockFile(self._lockFile)
+        self._lockFile.close()
+        print("KMAX {}: slot {} released filter {}".format(self.ipKmax, self.slotNo, self.filterNo))
+        self._lockFile = None
+        self.filterNo = None
+
+    def holders(self):
+        """ {filterNo: 'slot <n> pid <pid>'} as last written by the holders, free filters are left out """
+        holders = {}
+        for filterNo in self.filters:
+            path = self._path(filterNo)
+            if not os.path.exists(path) or self._isFree(filterNo):
+                continue
+            with open(path) as lockFile:
+                holders[filterNo] = lockFile.read().strip()
+        return holders
+
+    def _path(self, filterNo):
+        return os.path.join(self.leaseDir, "filter{}.lock".format(filterNo))
+
+    def _isFree(self, filterNo):
+        lockFile = open(self._path(filterNo), "a+")
+        try:
+            if not tryLockFile(lockFile):
+                return False
+            unlockFile(lockFile)
+            return True
+        finally:
+            lockFile.close()
+
+    def _tryLock(self, filterNo):
+        lockFile = open(self._path(filterNo), "a+")
+        if not tryLockFile(lockFile):
+            lockFile.close()
+            return False
+        lockFile.seek(0)
+        lockFile.truncate()
+        lockFile.write("slot {} pid {}\n".format(self.slotNo, os.getpid()))
+        lockFile.flush()
+        self._lockFile = lockFile
+        return True
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *excInfo):
+        self.release()
+
+
+def tryLockFile(lockFile):
+    """ Exclusive OS lock of lockFile without waiting, False if another process holds it """
+    try:
+        if fcntl:
+            fcntl.flock(lockFile.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lockFile.seek(0)
+            msvcrt.locking(lockFile.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def unlockFile(lockFile):
+    if fcntl:
+        fcntl.flock(lockFile.fileno(), fcntl.LOCK_UN)
+    else:
+        lockFile.seek(0)
+        msvcrt.locking(lockFile.fileno(), msvcrt.LK_UNLCK, 1)
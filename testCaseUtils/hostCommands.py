@@ -0,0 +1,44 @@
+"""
+Description:
+Privileged commands of the host for the Linux stand-ins of the KMAX and the network services (netem backend, DHCP and
+DNS stand-ins, packet capture): tc, nft and tcpdump run directly as root, otherwise through sudo -n.
+
+The test case processes of the slots share the nftables ruleset of the host, the table of a stand-in is named after
+its DUT (tableName) so that stopping one slot never removes the rules of another.
+
+Usage:
+table = tableName("testCaseDhcp", interface, deviceIP)
+nft(["add table bridge {}".format(table), ...])
+tc("qdisc", "replace", "dev", interface, "root", "handle", "1:", "prio")
+"""
+import os
+import subprocess
+
+
+def privileged(command):
+    """ command prefixed with sudo -n unless the process runs as root """
+    if not hasattr(os, "geteuid") or os.geteuid() == 0:
+        return list(command)
+    return ["sudo", "-n"] + list(command)
+
+
+def tableName(prefix, *parts):
+    """ nft table name of prefix and parts, ("testCaseDhcp", "eth1", "10.0.0.5") -> testCaseDhcp_eth1_10_0_0_5 """
+    return "_".join([prefix] + [str(part).replace("-", "_").replace(".", "_").replace(":", "_") for part in parts])
+
+
+def nft(rules, check=True):
+    """ Apply the nft rules as one transaction (nft -f -) """
+    process = subprocess.Popen(privileged(["nft", "-f", "-"]), stdin=subprocess.PIPE)
+    process.communicate("\n".join(rules).encode())
+    if process.returncode and check:
+        raise subprocess.CalledProcessError(process.returncode, "nft -f -")
+
+
+def tc(*args):
+    subprocess.check_call(privileged(["tc"] + list(args)))
+
+
+def tcOutput(*args):
+    """ Output of a tc show command """
+    return subprocess.check_output(privileged(["tc"] + list(args))).decode(errors="replace")
@@ -0,0 +1,140 @@
+"""
+Description:
+Time based impairment profiles. A profile is a list of steps (seconds after the start, drop, delay); a step without
+drop and delay, or with both 0, switches the impairment off. ProfileRunner plays the profile on a background thread through the
+ImpairmentSession, so the test case starts it with one call and goes on waiting for the error screen while the
+impairment changes, e.g. a delay ramp from 0 to 20 s over 60 s covers the whole degradation curve in one iteration.
+
+Usage:
+profile = ramp("delay", 0, 20, duration=60, step=5) + offAt(90)   # or parseProfile("ramp:delay:0:20:60:5+off:90")
+runner = ProfileRunner(kmaxImpairment, filterNo)
+runner.start('CDN', profile)
+...
+runner.stop()
+"""
+import threading
+import time
+from collections import namedtuple
+
+ProfileStep = namedtuple("ProfileStep", ["at", "drop", "delay"])
+
+
+def ramp(parameter, start, end, duration, step=5, at=0):
+    """ drop or delay going from start to end in duration seconds, one change every step seconds """
+    if parameter not in ("drop", "delay"):
+        raise ValueError("ramp parameter is drop or delay, not {}".format(parameter))
+    if duration <= 0 or step <= 0:
+        raise ValueError("ramp duration and step must be positive")
+    changes = max(1, int(duration // step))
+    steps = []
+    for index in range(changes + 1):
+        value = round(start + (end - start) * index / float(changes), 1)
+        stepAt = at + index * duration / float(changes)
+        if parameter == "drop":
+            steps.append(ProfileStep(stepAt, int(round(value)), None))
+        else:
+            steps.append(ProfileStep(stepAt, None, value))
+    return steps
+
+
+def bursts(drop, every, length, duration, at=0, delay=None):
+    """ drop % (and/or delay) for length seconds every every seconds, off in between """
+    if every <= 0:
+        raise ValueError("bursts every must be positive")
+    steps = []
+    start = at
+    while start < at + duration:
+        steps.append(ProfileStep(start, drop, delay))
+        steps.append(ProfileStep(min(start + length, at + duration), None, None))
+        start += every
+    return steps
+
+
+def window(start, end, drop=None, delay=None):
+    """ Impairment on from start until end seconds """
+    return [ProfileStep(start, drop, delay), ProfileStep(end, None, None)]
+
+
+def offAt(at):
+    return [ProfileStep(at, None, None)]
+
+
+def parseProfile(spec):
+    """
+    Profile from a parameter string, parts joined by '+':
+    ramp:<drop|delay>:<start>:<end>:<duration>[:<step>], bursts:<drop>:<every>:<length>:<duration>,
+    window:<start>:<end>:<drop>[:<delay>], off:<at>
+    e.g. "ramp:delay:0:20:60+off:90"
+    """
+    steps = []
+    for part in spec.split("+"):
+        fields = part.strip().split(":")
+        kind, values = fields[0], fields[1:]
+        try:
+            if kind == "ramp":
+                steps += ramp(values[0], *[float(value) for value in values[1:]])
+            elif kind == "bursts":
+                steps += bursts(*[float(value) for value in values])
+            elif kind == "window":
+                steps += window(*[float(value) for value in values])
+            elif kind == "off":
+                steps += offAt(float(values[0]))
+            else:
+                raise ValueError("unknown profile {}".format(kind))
+        except (TypeError, IndexError, ValueError) as e:
+            raise ValueError("Invalid impairment profile '{}': {}".format(part, e))
+    return steps
+
+
+class ProfileRunner(object):
+
+    def __init__(self, impairmentSession, filterNo):
+        self.session = impairmentSession
+        self.filterNo = filterNo
+        # (seconds after start, step) of the steps that were applied
+        self.applied = []
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, impairment, profile):
+        """ Play the profile of impairment in the background, steps are sorted by their time """
+        self.stop()
+        self._stopped.clear()
+        self.applied = []
+        steps = sorted(profile, key=lambda profileStep: profileStep.at)
+        self._thread = threading.Thread(target=self._play, args=(impairment, steps), name="impairmentProfile",
+                                        daemon=True)
+        self._thread.start()
+
+    def isRunning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.isRunning()
+
+    def stop(self):
+        """ Stop the profile, the impairment stays as the last applied step left it """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def _play(self, impairment, steps):
+        started = time.monotonic()
+        for profileStep in steps:
+            if self._stopped.wait(max(0, profileStep.at - (time.monotonic() - started))):
+                return
+            try:
+                # netem has nothing to impair with 0 % drop and 0 s delay, the filter has to go off
+                if not profileStep.drop and not profileStep.delay:
+                    self.session.switchImpairment_OFF(filterNo=self.filterNo)
+                else:
+                    self.session.switchImpairment_ON(impairment=impairment, drop=profileStep.drop,
+                                                     delay=profileStep.delay, filterNo=self.filterNo)
+            except Exception as e:
+                print("Impairment profile step {} failed: {}".format(profileStep, e))
+                continue
+            self.applied.append((round(time.monotonic() - started, 3), profileStep))
+            print("Impairment profile {:.1f}s: {}".format(time.monotonic() - started, profileStep))
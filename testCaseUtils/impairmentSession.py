@@ -0,0 +1,82 @@
+"""
+Description:
+Filter state cache in front of the impairment backend (KImpairment or netem), one per process and DUT. The
+precondition, the except blocks and the recovery step all switch the filter OFF, most of these calls find it already
+off. ImpairmentSession skips a switchImpairment_ON/OFF whose filter is known to be in that state already, so only real
+transitions go to the KMAX (or netem), and it measures how long every real toggle took. It caches state only: the
+connection to the KMAX is opened and kept by KImpairment as before.
+
+The state of a filter is unknown at the start and after a failed toggle, the next call always goes through.
+
+Usage:
+kmaxImpairment = getImpairmentSession(config.getConfigItem("impairmentBackend"), deviceIP)
+kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+kmaxImpairment.switchImpairment_ON(impairment='DNS', drop=100, filterNo=filterNo)
+metrics.markImpairmentOn(kmaxImpairment.lastToggleSeconds)
+"""
+import threading
+import time
+
+from testCaseUtils.netemImpairment import createImpairment
+
+OFF = ("OFF",)
+
+
+class ImpairmentSession(object):
+
+    def __init__(self, impairment):
+        self.impairment = impairment
+        # filterNo -> ("ON", impairment, drop, delay) or OFF
+        self.filterStates = {}
+        self.lastToggleSeconds = None
+        self.toggles = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def switchImpairment_ON(self, impairment, drop=None, delay=None, filterNo=1):
+        kwargs = {"impairment": impairment, "filterNo": filterNo}
+        if drop is not None:
+            kwargs["drop"] = drop
+        if delay is not None:
+            kwargs["delay"] = delay
+        return self._toggle(filterNo, ("ON", impairment, drop, delay), self.impairment.switchImpairment_ON, kwargs)
+
+    def switchImpairment_OFF(self, filterNo=1):
+        return self._toggle(filterNo, OFF, self.impairment.switchImpairment_OFF, {"filterNo": filterNo})
+
+    def state(self, filterNo):
+        """ Cached state of the filter, None while unknown """
+        return self.filterStates.get(filterNo)
+
+    def __getattr__(self, name):
+        # everything else of KImpairment/NetemImpairment
+        return getattr(self.impairment, name)
+
+    def _toggle(self, filterNo, state, switch, kwargs):
+        with self._lock:
+            if self.filterStates.get(filterNo) == state:
+                self.skipped += 1
+                self.lastToggleSeconds = 0.0
+                print("Filter {} already {}, no toggle needed".format(filterNo, " ".join(str(x) for x in state)))
+                return None
+            self.filterStates.pop(filterNo, None)
+            started = time.monotonic()
+            result = switch(**kwargs)
+            self.lastToggleSeconds = time.monotonic() - started
+            self.filterStates[filterNo] = state
+            self.toggles += 1
+            print("Filter {} {} in {:.2f} Seconds".format(filterNo, state[0], self.lastToggleSeconds))
+            return result
+
+
+_sessions = {}
+_sessionsLock = threading.Lock()
+
+
+def getImpairmentSession(backend, deviceIP):
+    """ Shared ImpairmentSession of this process for the backend and DUT """
+    key = (backend or "kmax", deviceIP)
+    with _sessionsLock:
+        if key not in _sessions:
+            _sessions[key] = ImpairmentSession(createImpairment(backend, deviceIP))
+        return _sessions[key]
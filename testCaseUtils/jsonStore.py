@@ -0,0 +1,52 @@
+"""
+Description:
+JSON files in results/ that the slots of a host share (screen indexes, OCR cache). saveMerged() reads what the other
+slots wrote since the file was loaded, merges it into the entries of this process and replaces the file atomically.
+The read-merge-write holds an OS lock on <path>.lock (the fcntl/msvcrt helpers of filterLease), so two slots saving at
+the same time do not drop each other's entries.
+
+Usage:
+knownScreens = loadJson(indexPath, "error screen index")
+saveMerged(indexPath, knownScreens, mergeScreens, "error screen index", indent=2, sort_keys=True)
+"""
+import json
+import os
+import time
+
+from testCaseUtils.filterLease import tryLockFile, unlockFile
+
+LOCK_POLL = 0.05
+
+
+def loadJson(path, description):
+    """ Content of the JSON file at path, {} if there is none or it is unreadable """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as jsonFile:
+            return json.load(jsonFile)
+    except ValueError:
+        print("Ignoring unreadable {} {}".format(description, path))
+        return {}
+
+
+def saveMerged(path, entries, merge, description, **dumpOptions):
+    """
+    merge(entries, stored) adds the stored content of path to entries and returns the entries to write, entries are
+    then written to path atomically
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + ".lock", "w") as lockFile:
+        while not tryLockFile(lockFile):
+            time.sleep(LOCK_POLL)
+        try:
+            entries = merge(entries, loadJson(path, description))
+            temporaryPath = "{}.{}".format(path, os.getpid())
+            with open(temporaryPath, "w") as jsonFile:
+                json.dump(entries, jsonFile, **dumpOptions)
+            os.replace(temporaryPath, path)
+        finally:
+            unlockFile(lockFile)
+    return entries
@@ -0,0 +1,130 @@
+"""
+Description:
+Time-to-error and time-to-recovery per iteration. The test case marks when the impairment is switched on/off and
+passes the WaitResult of the event driven wait (error screen shown/cleared, motion, ADB line) to the recorder. The
+latency is taken from the first poll that saw the event; resolution is the time since the poll before it, i.e. the
+window in which the event really happened.
+
+Every iteration is written as one JSON line to results/metrics/<scenario>_slot<slotNo>.jsonl.
+
+Usage:
+metrics = LatencyRecorder("41.1", server, slotNo, firmware=readFirmware(deviceIP))
+metrics.startIteration(iteration)
+kmaxImpairment.switchImpairment_ON(impairment='DHCP', drop=100, filterNo=filterNo)
+metrics.markImpairmentOn()
+metrics.timeToError(waitUntil(errorCodeShown(errorCheck), timeout=120))
+...
+metrics.emitIteration()
+"""
+import datetime
+import json
+import os
+import time
+
+DEFAULT_METRICS_DIR = os.path.join("results", "metrics")
+
+
+class LatencyRecorder(object):
+
+    def __init__(self, scenario, server, slotNo, firmware=None, metricsDir=DEFAULT_METRICS_DIR):
+        self.scenario = scenario
+        self.server = server
+        self.slotNo = slotNo
+        self.firmware = firmware
+        self.path = os.path.join(metricsDir, "{}_slot{}.jsonl".format(scenario, slotNo))
+
+        self.iteration = None
+        self._startedAt = None
+        self._marks = {}
+        self._metrics = {}
+
+    def startIteration(self, iteration):
+        if self.iteration is not None:
+            self.emitIteration()
+        self.iteration = iteration
+        self._startedAt = datetime.datetime.now().isoformat()
+        self._marks = {}
+        self._metrics = {}
+
+    def mark(self, name):
+        self._marks[name] = time.monotonic()
+
+    def markImpairmentOn(self, toggleSeconds=None):
+        """ toggleSeconds: how long switchImpairment_ON took, the uncertainty of the impairment start """
+        self.mark("impairmentOn")
+        self._recordToggle("impairmentOnToggle", toggleSeconds)
+
+    def markImpairmentOff(self, toggleSeconds=None):
+        self.mark("impairmentOff")
+        self._recordToggle("impairmentOffToggle", toggleSeconds)
+
+    def _recordToggle(self, name, toggleSeconds):
+        if toggleSeconds is not None:
+            self._metrics[name] = {"seconds": round(toggleSeconds, 3), "resolution": None}
+
+    def timeToError(self, waitResult):
+        """ Error screen after switchImpairment_ON, returns waitResult """
+        return self.recordWait("timeToError", waitResult, since="impairmentOn")
+
+    def timeToRecovery(self, waitResult):
+        """ Error screen gone / motion back after switchImpairment_OFF, returns waitResult """
+        return self.recordWait("timeToRecovery", waitResult, since="impairmentOff")
+
+    def bootDuration(self, waitResult):
+        """ Power on until the DUT is usable, waitResult of BootDetector.powerCycle()/powerOn(), returns waitResult """
+        if waitResult.status:
+            self._metrics["bootDuration"] = {
+                "seconds": round(waitResult.elapsed, 3),
+                "resolution": round(waitResult.detectedAt - waitResult.lastMissAt, 3)
+            }
+        else:
+            self._metrics["bootDuration"] = {"seconds": None, "timedOutAfter": round(waitResult.elapsed, 3)}
+        return waitResult
+
+    def recordWait(self, name, waitResult, since):
+        reference = self._marks.get(since)
+        if reference is None:
+            return waitResult
+        if waitResult.status:
+            self._metrics[name] = {
+                "seconds": round(waitResult.detectedAt - reference, 3),
+                "resolution": round(waitResult.detectedAt - max(waitResult.lastMissAt, reference), 3)
+            }
+        else:
+            self._metrics[name] = {"seconds": None, "timedOutAfter": round(time.monotonic() - reference, 3)}
+        return waitResult
+
+    def markEvent(self, name, since, at=None):
+        """
+        Event that was just observed by a blocking source (e.g. LogcatCursor.waitFor), or that happened at the
+        monotonic time at (e.g. a DhcpLeaseMonitor event)
+        """
+        reference = self._marks.get(since)
+        if reference is not None:
+            at = time.monotonic() if at is None else at
+            self._metrics[name] = {"seconds": round(at - reference, 3), "resolution": None}
+
+    def emitIteration(self):
+        if self.iteration is None:
+            return None
+        record = {
+            "scenario": self.scenario,
+            "server": self.server,
+            "slot": self.slotNo,
+            "firmware": self.firmware,
+            "iteration": self.iteration,
+            "startedAt": self._startedAt,
+            "metrics": self._metrics
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as metricsFile:
+            metricsFile.write(json.dumps(record, sort_keys=True) + "\n")
+        print("Iteration {} latencies: {}".format(self.iteration, json.dumps(self._metrics, sort_keys=True)))
+        self.iteration = None
+        return record
+
+    def close(self):
+        """ Write the iteration that was interrupted by an exception """
+        self.emitIteration()
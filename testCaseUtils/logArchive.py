@@ -0,0 +1,156 @@
+"""
+Description:
+Compressed logcat archive written in the background during the run. The LogcatStream already spools the complete
+logcat of the DUT; at every iteration boundary the lines since the last boundary are queued, a worker thread
+compresses them into one independent frame (zstd when the zstandard package is installed, gzip otherwise) and appends
+it to results/logs/<name>_slot<n>_<time>.logcat.zst|gz.
+
+saveAllLogs() still runs the full log dump of t.adb.saveAllLogs() at the end of the run, in a background thread: the
+test case stops its other helpers while the dump runs. The dump uses the adb connection of the test, close() waits for
+it and has to come before t.disconnect().
+
+The index next to the archive (.index.json) has the byte offset and length of every frame, readFrame() pulls the log
+of one iteration out of the archive without decompressing the rest.
+
+Usage:
+logArchive = LogArchive(logcat, "41.1", slotNo)
+...
+    logArchive.markIteration(iteration)
+...
+finally:
+    logArchive.saveAllLogs(t.adb, server)
+    ...
+    logArchive.close()
+    t.disconnect()
+
+print(readFrame("results/logs/41.1_slot13_20261018-101500.logcat.gz", "3"))
+"""
+import datetime
+import gzip
+import json
+import os
+import queue
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_ARCHIVE_DIR = os.path.join("results", "logs")
+CODEC_EXTENSIONS = {"zstd": "zst", "gzip": "gz"}
+
+
+def compressFrame(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompressFrame(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def readIndex(archivePath):
+    with open(archivePath + ".index.json") as indexFile:
+        return json.load(indexFile)
+
+
+def readFrame(archivePath, label):
+    """ Log text of the frames with label (e.g. iteration "3"), joined in archive order """
+    index = readIndex(archivePath)
+    texts = []
+    with open(archivePath, "rb") as archive:
+        for frame in index["frames"]:
+            if frame["label"] != str(label):
+                continue
+            archive.seek(frame["offset"])
+            texts.append(decompressFrame(index["codec"], archive.read(frame["length"])).decode("utf-8", "replace"))
+    return "".join(texts)
+
+
+class LogArchive(object):
+
+    def __init__(self, logcat, name, slotNo, archiveDir=DEFAULT_ARCHIVE_DIR):
+        self.logcat = logcat
+        self.slotNo = slotNo
+        self.codec = "zstd" if zstandard is not None else "gzip"
+        self.path = os.path.join(archiveDir, "{}_slot{}_{}.logcat.{}".format(
+            name, slotNo, datetime.datetime.now().strftime("%Y%m%d-%H%M%S"), CODEC_EXTENSIONS[self.codec]))
+        self.index = {"codec": self.codec, "spoolPath": logcat.spoolPath, "frames": []}
+        # spool offset of the next frame
+        self.logOffset = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._dumpThread = None
+
+    def markIteration(self, label):
+        """ Archive the log since the last boundary as the frame of label, returns straight away """
+        end = self.logcat.size
+        if end > self.logOffset:
+            self._queue.put((str(label), self.logOffset, end))
+            self.logOffset = end
+        self._startWorker()
+
+    def saveAllLogs(self, adb=None, server=None):
+        """
+        Queue the rest of the log and start adb.saveAllLogs(server, slotNo) (t.adb, ADBLogs) in the background, both
+        keep running until close()
+        """
+        self.markIteration("end")
+        if adb is not None and self._dumpThread is None:
+            self._dumpThread = threading.Thread(target=self._dumpAllLogs, args=(adb, server),
+                                                name="logArchiveDump", daemon=True)
+            self._dumpThread.start()
+
+    def close(self, timeout=None):
+        """ Wait until every queued frame is written and the full log dump is done """
+        if self._dumpThread is not None:
+            self._dumpThread.join(timeout)
+            self._dumpThread = None
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+            print("Logs archived to {} ({} frames)".format(self.path, len(self.index["frames"])))
+
+    def _dumpAllLogs(self, adb, server):
+        try:
+            adb.saveAllLogs(server, self.slotNo)
+        except Exception as e:
+            print("saveAllLogs failed: {}".format(e))
+
+    def _startWorker(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work, name="logArchive", daemon=True)
+            self._thread.start()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._writeFrame(*job)
+            except Exception as e:
+                print("Log archive frame {} failed: {}".format(job[0], e))
+
+    def _writeFrame(self, label, start, end):
+        with open(self.logcat.spoolPath, "rb") as spool:
+            spool.seek(start)
+            data = spool.read(end - start)
+        frame = compressFrame(self.codec, data)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "ab") as archive:
+            offset = archive.tell()
+            archive.write(frame)
+        self.index["frames"].append({"label": label, "offset": offset, "length": len(frame), "logOffset": start,
+                                     "logLength": len(data)})
+        temporaryPath = "{}.index.json.{}".format(self.path, os.getpid())
+        with open(temporaryPath, "w") as indexFile:
+            json.dump(self.index, indexFile, indent=2)
+        os.replace(temporaryPath, self.path + ".index.json")
@@ -0,0 +1,128 @@
+"""
+Description:
+Matches many (tag, search) checks against logcat entries in a single pass. Entries are first filtered by tag with a
+dictionary lookup, the message of an entry with an interesting tag is scanned once by an Aho-Corasick automaton built
+from all search strings, so the cost does not grow with the number of checks.
+
+Usage:
+matcher = MultiPatternMatcher([("VeopApp:D", "first.mpd"), ("VeopApp:D", "Unable to connect to")])
+for hit in matcher.scan(entries):
+    print(hit.timestamp, hit.tag, hit.search)
+"""
+from collections import namedtuple, deque
+
+PRIORITIES = "VDIWEFS"
+
+# tag/search: the check that matched, timestamp: logcat timestamp of the entry, entry: the matching LogEntry
+LogHit = namedtuple("LogHit", ["tag", "search", "timestamp", "entry"])
+
+
+def parseTagSpec(tag):
+    """ "DhcpClient:D" -> ("DhcpClient", index of D in PRIORITIES), a tag without priority matches all priorities """
+    if tag is None:
+        return None, 0
+    name, separator, priority = tag.rpartition(":")
+    if separator and priority in PRIORITIES:
+        return name, PRIORITIES.index(priority)
+    return tag, 0
+
+
+class AhoCorasick(object):
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+        for index, pattern in enumerate(self.patterns):
+            self._add(pattern, index)
+        self._build()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            nextState = self._goto[state].get(char)
+            if nextState is None:
+                nextState = len(self._goto)
+                self._goto[state][char] = nextState
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = nextState
+        self._output[state].add(index)
+
+    def _build(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, nextState in self._goto[state].items():
+                pending.append(nextState)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nextState] = self._goto[fail].get(char, 0)
+                self._output[nextState] |= self._output[self._fail[nextState]]
+
+    def search(self, text):
+        """ Set of pattern indexes that occur in text """
+        found = set()
+        state = 0
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+class MultiPatternMatcher(object):
+
+    def __init__(self, checks):
+        """ checks: list of (tag, search) like the arguments of printGenericLogs, tag "DhcpClient:D" or None """
+        self.checks = [(tag, search) for tag, search in checks]
+        searches = sorted(set(search for tag, search in self.checks if search))
+        self._automaton = AhoCorasick(searches)
+        searchIndex = dict((search, index) for index, search in enumerate(searches))
+
+        # tag name -> [(check order, minimum priority, search index or None, check)]
+        self._byTag = {}
+        self._anyTag = []
+        for order, (tag, search) in enumerate(self.checks):
+            name, minPriority = parseTagSpec(tag)
+            rule = (order, minPriority, searchIndex.get(search), (tag, search))
+            if name is None:
+                self._anyTag.append(rule)
+            else:
+                self._byTag.setdefault(name, []).append(rule)
+
+    def match(self, entry):
+        """ LogHits of one LogEntry, in the order of the checks """
+        rules = self._byTag.get(entry.tag, [])
+        if self._anyTag:
+            rules = sorted(rules + self._anyTag)
+        if not rules:
+            return []
+        priority = PRIORITIES.index(entry.priority)
+        found = None
+        hits = []
+        for order, minPriority, searchIndex, check in rules:
+            if priority < minPriority:
+                continue
+            if searchIndex is not None:
+                if found is None:
+                    found = self._automaton.search(entry.message)
+                if searchIndex not in found:
+                    continue
+            hits.append(LogHit(check[0], check[1], entry.timestamp, entry))
+        return hits
+
+    def scan(self, entries):
+        """ LogHits of all entries in log order """
+        hits = []
+        for entry in entries:
+            hits.extend(self.match(entry))
+        return hits
@@ -0,0 +1,190 @@
+"""
+Description:
+SQLite store of the logcat lines of every run, each line tagged with the server, slot, test case, iteration and step
+it was logged in. The step boundaries come from defineStep: at every boundary the lines that arrived on the
+LogcatStream since the previous boundary are inserted with the step that was running, so a line always belongs to the
+step during which it reached the spool.
+
+The logs table has indexes on (scenario, iteration, step), timestamp and tag, a question like "all DHCPREQUEST lines
+during iteration 3 of 41.3" reads only those rows:
+
+python -m testCaseUtils.logStore --scenario 41.3 --iteration 3 --tag DhcpClient:D --search DHCPREQUEST
+
+All slots and runs share results/logs/logStore.sqlite (WAL mode, runParallel workers write concurrently).
+
+Usage:
+logStore = LogStore(logcat, "41.3", server, slotNo)
+defineStep = logStore.tracking(defineStep)
+...
+    logStore.startIteration(iteration)
+...
+finally:
+    logStore.close()
+
+for row in queryLogs(scenario="41.3", iteration=3, tag="DhcpClient:D", search="DHCPREQUEST"):
+    print(row["line"])
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import threading
+
+from testCaseUtils.logMatcher import PRIORITIES, parseTagSpec
+
+DEFAULT_STORE_PATH = os.path.join("results", "logs", "logStore.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    run TEXT, server TEXT, slot INTEGER, scenario TEXT, iteration INTEGER, step TEXT,
+    timestamp TEXT, pid INTEGER, tid INTEGER, priority TEXT, level INTEGER, tag TEXT, message TEXT, line TEXT
+);
+CREATE INDEX IF NOT EXISTS logsByStep ON logs (scenario, iteration, step, slot);
+CREATE INDEX IF NOT EXISTS logsByTimestamp ON logs (timestamp);
+CREATE INDEX IF NOT EXISTS logsByTag ON logs (tag, level);
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY,
+    run TEXT, server TEXT, slot INTEGER, scenario TEXT, iteration INTEGER, step TEXT,
+    startedAt TEXT
+);
+CREATE INDEX IF NOT EXISTS stepsByScenario ON steps (scenario, iteration, slot);
+"""
+
+
+def connect(path=DEFAULT_STORE_PATH):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class LogStore(object):
+
+    def __init__(self, logcat, scenario, server, slotNo, path=DEFAULT_STORE_PATH):
+        self.scenario = scenario
+        self.server = server
+        self.slotNo = slotNo
+        self.path = path
+        self.connection = connect(path)
+        # the whole stream, lines from before the test case started belong to step None
+        self.cursor = logcat.cursor(fromStart=True)
+        self.run = "{}_slot{}_{}".format(datetime.datetime.now().strftime("%Y%m%d-%H%M%S"), slotNo, os.getpid())
+        self.iteration = None
+        self.step = None
+        self._lock = threading.Lock()
+
+    def tracking(self, defineStep):
+        """ defineStep that also marks the step boundary in the store """
+        def trackedDefineStep(stepName, *args, **kwargs):
+            self.markStep(stepName)
+            return defineStep(stepName, *args, **kwargs)
+        return trackedDefineStep
+
+    def startScenario(self, scenario):
+        """ Next scenario of a ScenarioEngine run, the store keeps reading the same stream """
+        with self._lock:
+            self._flush()
+            self.scenario = scenario
+            self.iteration = None
+
+    def startIteration(self, iteration):
+        with self._lock:
+            self._flush()
+            self.iteration = iteration
+
+    def markStep(self, stepName):
+        """ Store the lines of the previous step, the following lines belong to stepName """
+        with self._lock:
+            self._flush()
+            self.step = stepName
+            self.connection.execute(
+                "INSERT INTO steps (run, server, slot, scenario, iteration, step, startedAt) "
+                "VALUES (?, ?, ?, ?, ?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))",
+                (self.run, self.server, self.slotNo, self.scenario, self.iteration, stepName))
+            self.connection.commit()
+
+    def flush(self):
+        """ Store the lines that arrived since the last boundary with the current step """
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def _flush(self):
+        entries = self.cursor.newEntries()
+        if not entries:
+            return
+        context = (self.run, self.server, self.slotNo, self.scenario, self.iteration, self.step)
+        self.connection.executemany(
+            "INSERT INTO logs (run, server, slot, scenario, iteration, step, timestamp, pid, tid, priority, level, "
+            "tag, message, line) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [context + (entry.timestamp, int(entry.pid), int(entry.tid), entry.priority,
+                        PRIORITIES.index(entry.priority), entry.tag, entry.message, entry.line)
+             for entry in entries])
+        self.connection.commit()
+
+
+def queryLogs(scenario=None, iteration=None, step=None, slot=None, tag=None, search=None, since=None, until=None,
+              run=None, path=DEFAULT_STORE_PATH, limit=None):
+    """
+    Rows of the logs table, oldest first. tag like printGenericLogs ("DhcpClient:D" = D and above), step matches a
+    part of the step name, since/until compare the logcat timestamp ("10-18 12:34:56.789").
+    """
+    conditions, parameters = [], []
+    for column, value in (("scenario", scenario), ("iteration", iteration), ("slot", slot), ("run", run)):
+        if value is not None:
+            conditions.append("{} = ?".format(column))
+            parameters.append(value)
+    if tag is not None:
+        name, level = parseTagSpec(tag)
+        conditions.append("tag = ? AND level >= ?")
+        parameters += [name, level]
+    if step is not None:
+        conditions.append("instr(step, ?) > 0")
+        parameters.append(step)
+    if search is not None:
+        conditions.append("instr(message, ?) > 0")
+        parameters.append(search)
+    if since is not None:
+        conditions.append("timestamp >= ?")
+        parameters.append(since)
+    if until is not None:
+        conditions.append("timestamp <= ?")
+        parameters.append(until)
+    statement = "SELECT * FROM logs"
+    if conditions:
+        statement += " WHERE " + " AND ".join(conditions)
+    statement += " ORDER BY id"
+    if limit is not None:
+        statement += " LIMIT {}".format(int(limit))
+    connection = connect(path)
+    try:
+        return connection.execute(statement, parameters).fetchall()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the logcat lines of the test case runs")
+    parser.add_argument("--scenario")
+    parser.add_argument("--iteration", type=int)
+    parser.add_argument("--step", help="part of the step name")
+    parser.add_argument("--slot", type=int)
+    parser.add_argument("--tag", help="e.g. DhcpClient:D")
+    parser.add_argument("--search")
+    parser.add_argument("--since", help="logcat timestamp, e.g. '10-18 12:00:00.000'")
+    parser.add_argument("--until")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--path", default=DEFAULT_STORE_PATH)
+    args = parser.parse_args()
+    for row in queryLogs(args.scenario, args.iteration, args.step, args.slot, args.tag, args.search, args.since,
+                         args.until, path=args.path, limit=args.limit):
+        print("{} {} slot{} it{} [{}] {}".format(row["run"], row["scenario"], row["slot"], row["iteration"], row["step"],
+                                                 row["line"]))
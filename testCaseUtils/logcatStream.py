@@ -0,0 +1,259 @@
+"""
+Description:
+One persistent "adb logcat" per DUT instead of pulling and scanning the whole log for every printGenericLogs call.
+The stream spools the logcat output to a file, every consumer (LogcatCursor) keeps its own byte offset into that
+file, so a search only reads the lines that arrived since the consumer looked last and can block until a line matches.
+
+Usage:
+logcat = getLogcatStream(deviceIP)
+logcat.printGenericLogs(tag="DhcpClient:D", search="ACK")
+
+dhcpRequests = logcat.cursor()
+entry = dhcpRequests.waitFor(tag="DhcpClient:D", search="DHCPREQUEST", timeout=45)
+
+After an adb drop the stream resumes behind the last line it read (logcat -T). After a reboot of the DUT (new kernel
+boot_id) the whole ring buffer is read instead: the clock of the DUT may restart earlier than the last line seen
+before the reboot (no NTP on an impaired boot), -T would drop the boot up lines.
+"""
+import atexit
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from testCaseUtils.logMatcher import MultiPatternMatcher, PRIORITIES, parseTagSpec
+
+ADB_PORT = 5038
+ADB_DEVICE_PORT = 5555
+
+LogEntry = namedtuple("LogEntry", ["timestamp", "pid", "tid", "priority", "tag", "message", "line"])
+
+# logcat -v threadtime: "10-18 12:34:56.789  1234  1250 D DhcpClient: Broadcasting DHCPDISCOVER"
+THREADTIME_PATTERN = re.compile(r"^(\d\d-\d\d \d\d:\d\d:\d\d\.\d{3})\s+(\d+)\s+(\d+)\s+([VDIWEFS])\s(.*?)\s*: (.*)$")
+
+
+def adbCommand(deviceIP, args, port=ADB_PORT):
+    """ adb command line for the DUT, using the adb server on port like ADBLogs(port=5038) """
+    return ["adb", "-P", str(port), "-s", "{}:{}".format(deviceIP, ADB_DEVICE_PORT)] + list(args)
+
+
+def parseLine(line):
+    """ LogEntry for a threadtime formatted line, None for lines that are not log entries """
+    match = THREADTIME_PATTERN.match(line)
+    if not match:
+        return None
+    timestamp, pid, tid, priority, tag, message = match.groups()
+    return LogEntry(timestamp, int(pid), int(tid), priority, tag, message, line)
+
+
+def matchesTag(tagSpec, entry):
+    """
+    logcat filter spec as used by printGenericLogs: "DhcpClient:D" matches tag DhcpClient with priority D or higher,
+    a spec without priority matches every priority of the tag. None matches every entry.
+    """
+    if tagSpec is None:
+        return True
+    name, minPriority = parseTagSpec(tagSpec)
+    return entry.tag == name and PRIORITIES.index(entry.priority) >= minPriority
+
+
+class LogcatStream(object):
+
+    def __init__(self, deviceIP, port=ADB_PORT, spoolPath=None, reconnectInterval=5):
+        self.deviceIP = deviceIP
+        self.port = port
+        self.reconnectInterval = reconnectInterval
+        # a spool file created here is removed by close()
+        self.ownSpool = spoolPath is None
+        if spoolPath is None:
+            spoolFd, spoolPath = tempfile.mkstemp(prefix="logcat_{}_".format(deviceIP), suffix=".log")
+            os.close(spoolFd)
+        self.spoolPath = spoolPath
+        self.size = 0
+
+        self._condition = threading.Condition()
+        self._process = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lastTimestamp = None
+        self._bootId = None
+        self._cursors = {}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._readLoop, name="logcat-{}".format(self.deviceIP))
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+        if self._thread is not None:
+            self._thread.join(10)
+            self._thread = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def close(self):
+        """ stop() and remove the spool file, the cursors can not read any more """
+        self.stop()
+        if self.ownSpool and os.path.exists(self.spoolPath):
+            os.remove(self.spoolPath)
+
+    def isAlive(self):
+        return self._thread is not None and self._process is not None and self._process.poll() is None
+
+    def cursor(self, fromStart=False):
+        """ New consumer, reading from the beginning of the stream or only lines that arrive from now on """
+        return LogcatCursor(self, 0 if fromStart else self.size)
+
+    def printGenericLogs(self, tag=None, search=None):
+        """
+        Print and return the lines for tag containing search that arrived since the last call with the same tag and
+        search, the first call of a tag/search pair looks at the whole stream.
+        """
+        key = (tag, search)
+        if key not in self._cursors:
+            self._cursors[key] = self.cursor(fromStart=True)
+        entries = self._cursors[key].search(tag=tag, search=search)
+        for entry in entries:
+            print(entry.line)
+        return entries
+
+    def printGenericLogsMulti(self, checks):
+        """
+        printGenericLogs for a list of (tag, search) checks in a single pass over the new lines. Prints the matching
+        lines in log order and returns the LogHits.
+        """
+        key = tuple(checks)
+        if key not in self._cursors:
+            self._cursors[key] = self.cursor(fromStart=True)
+        hits = self._cursors[key].searchMany(checks)
+        for hit in hits:
+            print("[{} '{}'] {}".format(hit.tag, hit.search, hit.entry.line))
+        return hits
+
+    def _command(self, bootId):
+        args = ["logcat", "-v", "threadtime"]
+        if self._lastTimestamp is not None and bootId == self._bootId:
+            # reconnect after an adb drop without reading the ring buffer again
+            args += ["-T", self._lastTimestamp]
+        self._bootId = bootId
+        return adbCommand(self.deviceIP, args, self.port)
+
+    def _readBootId(self):
+        """ Kernel boot id of the DUT, changes with every boot; None if adb does not answer """
+        try:
+            output = subprocess.check_output(
+                adbCommand(self.deviceIP, ["shell", "cat", "/proc/sys/kernel/random/boot_id"], self.port),
+                stderr=subprocess.DEVNULL, timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return output.decode(errors="replace").strip() or None
+
+    def _readLoop(self):
+        with open(self.spoolPath, "ab") as spool:
+            while not self._stopped.is_set():
+                subprocess.call(["adb", "-P", str(self.port), "connect", "{}:{}".format(self.deviceIP, ADB_DEVICE_PORT)],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                bootId = self._readBootId()
+                if bootId is None and self._lastTimestamp is not None:
+                    # DUT not reachable yet, -T or the whole buffer can only be decided with its boot id
+                    self._stopped.wait(self.reconnectInterval)
+                    continue
+                self._process = subprocess.Popen(self._command(bootId), stdout=subprocess.PIPE,
+                                                 stderr=subprocess.DEVNULL)
+                for raw in iter(self._process.stdout.readline, b""):
+                    if not raw.endswith(b"\n"):
+                        raw += b"\n"
+                    spool.write(raw)
+                    spool.flush()
+                    match = THREADTIME_PATTERN.match(raw.decode("utf-8", "replace"))
+                    if match:
+                        self._lastTimestamp = match.group(1)
+                    with self._condition:
+                        self.size += len(raw)
+                        self._condition.notify_all()
+                self._process.wait()
+                self._stopped.wait(self.reconnectInterval)
+
+
+class LogcatCursor(object):
+
+    def __init__(self, stream, offset=0):
+        self.stream = stream
+        self.offset = offset
+
+    def newEntries(self):
+        """ LogEntries that arrived since the last read, moves the cursor to the end of the stream """
+        end = self.stream.size
+        if end <= self.offset:
+            return []
+        with open(self.stream.spoolPath, "rb") as spool:
+            spool.seek(self.offset)
+            data = spool.read(end - self.offset)
+        self.offset = end
+        entries = []
+        for line in data.decode("utf-8", "replace").splitlines():
+            entry = parseLine(line)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def search(self, tag=None, search=None):
+        """ New entries for tag whose message contains search """
+        return [entry for entry in self.newEntries()
+                if matchesTag(tag, entry) and (search is None or search in entry.message)]
+
+    def searchMany(self, checks):
+        """ LogHits of the new entries for a list of (tag, search) checks, see MultiPatternMatcher """
+        return MultiPatternMatcher(checks).scan(self.newEntries())
+
+    def waitFor(self, tag=None, search=None, timeout=60):
+        """
+        Block until an entry for tag containing search arrives and return it, None after timeout. The cursor stops
+        right behind the returned entry, so the next waitFor() sees the following matches.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            end = self.stream.size
+            if end > self.offset:
+                entry = self._nextMatch(end, tag, search)
+                if entry is not None:
+                    return entry
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            with self.stream._condition:
+                if self.stream.size == end:
+                    self.stream._condition.wait(remaining)
+
+    def _nextMatch(self, end, tag, search):
+        with open(self.stream.spoolPath, "rb") as spool:
+            spool.seek(self.offset)
+            while spool.tell() < end:
+                raw = spool.readline()
+                self.offset += len(raw)
+                entry = parseLine(raw.decode("utf-8", "replace").rstrip("\r\n"))
+                if entry is not None and matchesTag(tag, entry) and (search is None or search in entry.message):
+                    return entry
+        return None
+
+
+_streams = {}
+_streamsLock = threading.Lock()
+
+
+def getLogcatStream(deviceIP, port=ADB_PORT):
+    """ The running LogcatStream of the DUT, started on first use and shared by everything in this process """
+    with _streamsLock:
+        stream = _streams.get(deviceIP)
+        if stream is None:
+            stream = _streams[deviceIP] = LogcatStream(deviceIP, port).start()
+            atexit.register(stream.close)
+        return stream
@@ -0,0 +1,158 @@
+"""
+Description:
+Motion detection on downscaled grayscale frames held as NumPy arrays. Frames are captured into a ring buffer and
+differenced in batches, one vectorised operation covers all new frame pairs instead of per-frame Python work on full
+resolution captures. detectMotionContinuously() stops as soon as the outcome can not change any more: enough moving
+pairs for the success rate, or too few pairs left to reach it.
+
+MotionEngine has the same isMotion()/detectMotionContinuously() interface as LinearTV and falls back to the LinearTV
+methods when numpy/Pillow are not installed or a frame can not be captured.
+
+Usage:
+motion = MotionEngine(tv)
+motionResult = motion.isMotion()
+motionDetected, motionStatusList, successRate = motion.detectMotionContinuously(motionTime)
+"""
+import math
+import os
+import tempfile
+import time
+
+from framework import api
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = None
+    Image = None
+
+DEFAULT_SCALE = 8
+DEFAULT_INTERVAL = 0.5
+DEFAULT_BATCH = 4
+# a pair of frames is moving when PIXEL_FRACTION of the downscaled pixels changed by more than PIXEL_THRESHOLD
+PIXEL_THRESHOLD = 12
+PIXEL_FRACTION = 0.005
+# share of moving frame pairs detectMotionContinuously() needs to pass
+SUCCESS_RATE = 0.8
+
+
+def available():
+    return np is not None
+
+
+def captureGrayFrame(scale=DEFAULT_SCALE, path=None, rect=None):
+    """
+    Capture the current video frame (or the rect (x, y, width, height) of it), returns it as a grayscale uint8 array
+    downscaled by block averaging
+    """
+    path = path or os.path.join(tempfile.gettempdir(), "motionFrame_{}.png".format(os.getpid()))
+    image = api.captureImageEx(rect, path)[0][2]
+    try:
+        with Image.open(path) as capture:
+            frame = np.asarray(capture.convert("L"), dtype=np.uint16)
+    finally:
+        image.Close()
+    height, width = frame.shape[0] // scale, frame.shape[1] // scale
+    blocks = frame[:height * scale, :width * scale].reshape(height, scale, width, scale)
+    return blocks.mean(axis=(1, 3)).astype(np.uint8)
+
+
+class FrameRing(object):
+    """ Fixed size ring buffer of equally shaped frames """
+
+    def __init__(self, capacity, shape):
+        self.frames = np.empty((capacity,) + tuple(shape), dtype=np.uint8)
+        self.capacity = capacity
+        self.count = 0
+
+    def push(self, frame):
+        self.frames[self.count % self.capacity] = frame
+        self.count += 1
+
+    def latest(self, n):
+        """ The last n frames, oldest first """
+        n = min(n, self.count, self.capacity)
+        indexes = [(self.count - n + i) % self.capacity for i in range(n)]
+        return self.frames[indexes]
+
+
+def pairMotion(frames, pixelThreshold=PIXEL_THRESHOLD, pixelFraction=PIXEL_FRACTION):
+    """ Boolean array, element i tells whether frames[i] -> frames[i + 1] moved """
+    if len(frames) < 2:
+        return np.zeros(0, dtype=bool)
+    diffs = np.abs(np.diff(frames.astype(np.int16), axis=0))
+    changed = (diffs > pixelThreshold).mean(axis=(1, 2))
+    return changed >= pixelFraction
+
+
+class MotionEngine(object):
+
+    def __init__(self, tv, grabFrame=None, interval=DEFAULT_INTERVAL, batch=DEFAULT_BATCH,
+                 successRate=SUCCESS_RATE, pixelThreshold=PIXEL_THRESHOLD, pixelFraction=PIXEL_FRACTION):
+        """ tv: LinearTV used as fallback, grabFrame: callable returning a grayscale frame (default captureGrayFrame) """
+        self.tv = tv
+        self.grabFrame = grabFrame or captureGrayFrame
+        self.interval = interval
+        self.batch = batch
+        self.successRate = successRate
+        self.pixelThreshold = pixelThreshold
+        self.pixelFraction = pixelFraction
+
+    def isMotion(self, frames=3):
+        """ (motion, motionStatusList) over frames captures, like LinearTV.isMotion() """
+        if not available():
+            return self.tv.isMotion()
+        try:
+            ring = self._capture(frames)
+        except Exception as e:
+            api.writeDebugLine("Frame capture failed, using LinearTV.isMotion(): {}".format(e))
+            return self.tv.isMotion()
+        statuses = pairMotion(ring.latest(frames), self.pixelThreshold, self.pixelFraction).tolist()
+        return any(statuses), statuses
+
+    def detectMotionContinuously(self, motionTime):
+        """
+        (motionDetected, motionStatusList, successRate) over motionTime seconds, like
+        LinearTV.detectMotionContinuously(). successRate is the percentage of moving frame pairs.
+        """
+        if not available():
+            return self.tv.detectMotionContinuously(motionTime)
+        try:
+            return self._detectContinuously(motionTime)
+        except Exception as e:
+            api.writeDebugLine("Frame capture failed, using LinearTV.detectMotionContinuously(): {}".format(e))
+            return self.tv.detectMotionContinuously(motionTime)
+
+    def _detectContinuously(self, motionTime):
+        pairs = max(1, int(motionTime / self.interval))
+        required = int(math.ceil(self.successRate * pairs))
+        statuses = []
+
+        first = self.grabFrame()
+        ring = FrameRing(self.batch + 1, first.shape)
+        ring.push(first)
+        while len(statuses) < pairs:
+            newFrames = min(self.batch, pairs - len(statuses))
+            for _ in range(newFrames):
+                time.sleep(self.interval)
+                ring.push(self.grabFrame())
+            statuses.extend(pairMotion(ring.latest(newFrames + 1), self.pixelThreshold,
+                                       self.pixelFraction).tolist())
+
+            moving = sum(statuses)
+            remaining = pairs - len(statuses)
+            if moving >= required or moving + remaining < required:
+                break
+
+        successRate = round(100.0 * sum(statuses) / len(statuses), 1)
+        return sum(statuses) >= required, statuses, successRate
+
+    def _capture(self, frames):
+        first = self.grabFrame()
+        ring = FrameRing(frames, first.shape)
+        ring.push(first)
+        for _ in range(frames - 1):
+            time.sleep(self.interval)
+            ring.push(self.grabFrame())
+        return ring
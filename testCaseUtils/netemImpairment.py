@@ -0,0 +1,190 @@
+"""
+Description:
+Stand-in for the KMAX network emulator on a Linux host. NetemImpairment has the switchImpairment_ON/OFF API of
+KImpairment and applies the loss/delay with tc netem on the bridge port that faces the DUT:
+- the port gets a prio qdisc with one netem band per filter (up to 15 filters instead of the 4 KMAX filters)
+- nftables marks the packets of the impaired service (DHCP, DNS, CDN hosts, ...) going to the DUT with the filter
+  number, a tc fw filter sends the marked packets through the band of that filter
+
+The slots of the host share the prio qdisc, its bands and the nft table of the interface: the first process creates
+them, the others find them in place, and a slot only changes the band and the chain of the filter it leased.
+
+DHCP, DNS and Gateway are matched by port/address of the DUT, the DHCP replies by the MAC of the DUT in the BOOTP
+header (broadcast OFFERs do not carry its address) and the Gateway by the default gateway of the DUT, both read over
+adb when the impairment is first switched on. The host based impairments are resolved from IMPAIRMENT_TARGETS,
+the operator hosts (CDN, SG, CSDS, ApplicationConnectivity) have to be filled in through a JSON file
+({"CDN": ["cdn.example.com"], ...}) passed as targetsPath.
+
+The backend is chosen by the impairmentBackend parameter of the test cases: "kmax" (default), "netem" or
+"netem:<interface>". Needs root or sudo for tc/nft.
+
+Usage:
+kmaxImpairment = createImpairment(config.getConfigItem("impairmentBackend"), deviceIP)
+filterLease = createFilterLease(kmaxImpairment, ipKmax, slotNo)
+filterNo = filterLease.acquire()
+kmaxImpairment.switchImpairment_ON(impairment='DNS', drop=100, filterNo=filterNo)
+kmaxImpairment.switchImpairment_OFF(filterNo=filterNo)
+"""
+import json
+import os
+import re
+import socket
+import tempfile
+import time
+
+from testCaseUtils.deviceAddress import readDeviceMac, readGateway
+from testCaseUtils.filterLease import FilterLease, tryLockFile, unlockFile
+from testCaseUtils.hostCommands import nft, tc, tcOutput, tableName
+
+DEFAULT_INTERFACE = "eth1"
+NETEM_FILTERS = tuple(range(1, 16))
+MARK_BASE = 0x7400
+SETUP_POLL = 0.2
+
+# nft match expressions for the traffic to the DUT per impairment, {deviceIP}, {deviceMac} (hex digits) and {gateway}
+# are filled in. DHCP: chaddr of the BOOTP reply (UDP payload offset 28)
+IMPAIRMENT_TARGETS = {
+    "DHCP": {"matches": ["udp sport 67 udp dport 68 @th,288,48 0x{deviceMac}"]},
+    "DNS": {"matches": ["ip daddr {deviceIP} udp sport 53", "ip daddr {deviceIP} tcp sport 53"]},
+    "Gateway": {"matches": ["ip saddr {gateway} ip daddr {deviceIP}"]},
+    "AndroidConnectivity": {"hosts": ["connectivitycheck.gstatic.com", "www.google.com", "clients3.google.com"]},
+    "ApplicationConnectivity": {"hosts": []},
+    "CDN": {"hosts": []},
+    "SG": {"hosts": []},
+    "CSDS": {"hosts": []}
+}
+
+
+def createImpairment(backend, deviceIP, targetsPath=None):
+    """ KImpairment for backend "kmax" (or None), NetemImpairment for "netem" / "netem:<interface>" """
+    if not backend or backend == "kmax":
+        from framework.model.utility.connectivityImpairment import KImpairment
+        return KImpairment(deviceIP=deviceIP)
+    name, _, interface = backend.partition(":")
+    if name != "netem":
+        raise ValueError("Unknown impairment backend {}, use kmax or netem[:<interface>]".format(backend))
+    return NetemImpairment(deviceIP, interface=interface or DEFAULT_INTERFACE, targetsPath=targetsPath)
+
+
+def createFilterLease(impairment, ipKmax, slotNo):
+    """ FilterLease on the KMAX filters, or on the filters of the netem interface (impairment may be a session) """
+    impairment = getattr(impairment, "impairment", impairment)
+    if isinstance(impairment, NetemImpairment):
+        return FilterLease("netem_{}".format(impairment.interface), slotNo, filters=impairment.filters)
+    return FilterLease(ipKmax, slotNo)
+
+
+class NetemImpairment(object):
+
+    def __init__(self, deviceIP, interface=DEFAULT_INTERFACE, filters=NETEM_FILTERS, targetsPath=None, deviceMac=None,
+                 gateway=None):
+        self.deviceIP = deviceIP
+        # None: read over adb when a match needs it
+        self.deviceMac = deviceMac
+        self.gateway = gateway
+        self.interface = interface
+        self.filters = tuple(filters)
+        self.table = tableName("testCaseImpairment", interface)
+        self.targets = dict((name, dict(target)) for name, target in IMPAIRMENT_TARGETS.items())
+        if targetsPath:
+            with open(targetsPath) as targetsFile:
+                for name, hosts in json.load(targetsFile).items():
+                    self.targets.setdefault(name, {})["hosts"] = hosts
+        self._ready = False
+
+    def switchImpairment_ON(self, impairment, drop=None, delay=None, filterNo=1):
+        """ drop: packet loss in %, delay: seconds, like KImpairment.switchImpairment_ON() """
+        self._setup()
+        matches = self._matches(impairment)
+        netem = []
+        if delay:
+            netem += ["delay", "{}s".format(delay)]
+        if drop:
+            netem += ["loss", "{}%".format(drop)]
+        if not netem:
+            print("{}: nothing to impair (drop={}, delay={})".format(impairment, drop, delay))
+            return
+        tc("qdisc", "replace", "dev", self.interface, "parent", self._band(filterNo), "handle",
+           "{}:".format(self._handle(filterNo)), "netem", *netem)
+        rules = ["flush chain bridge {} filter{}".format(self.table, filterNo)]
+        rules += ["add rule bridge {} filter{} oifname \"{}\" {} meta mark set {}".format(
+            self.table, filterNo, self.interface, match, MARK_BASE + filterNo) for match in matches]
+        nft(rules)
+        print("netem {}: {} {} on filter {}".format(self.interface, impairment, " ".join(netem), filterNo))
+
+    def switchImpairment_OFF(self, filterNo=1):
+        self._setup()
+        nft(["flush chain bridge {} filter{}".format(self.table, filterNo)])
+        tc("qdisc", "replace", "dev", self.interface, "parent", self._band(filterNo), "handle",
+           "{}:".format(self._handle(filterNo)), "pfifo")
+
+    def _setup(self):
+        """
+        prio qdisc with a band per filter and the nft table of the interface, created by the first slot process and
+        left in place for the others. Every filter has its own base chain, no chain is shared between the slots.
+        """
+        if self._ready:
+            return
+        lockPath = os.path.join(tempfile.gettempdir(), "{}.lock".format(self.table))
+        with open(lockPath, "w") as lockFile:
+            while not tryLockFile(lockFile):
+                time.sleep(SETUP_POLL)
+            try:
+                if not self._qdiscReady():
+                    self._createQdisc()
+                nft(["add table bridge {}".format(self.table)] +
+                    ["add chain bridge {} filter{} {{ type filter hook forward priority 0; policy accept; }}".format(
+                        self.table, filterNo) for filterNo in self.filters])
+            finally:
+                unlockFile(lockFile)
+        self._ready = True
+
+    def _qdiscReady(self):
+        qdiscs = tcOutput("qdisc", "show", "dev", self.interface)
+        return re.search(r"qdisc prio 1: root .*bands {} ".format(len(self.filters) + 1), qdiscs) is not None
+
+    def _createQdisc(self):
+        tc("qdisc", "replace", "dev", self.interface, "root", "handle", "1:", "prio", "bands",
+           str(len(self.filters) + 1), "priomap", *(["0"] * 16))
+        for filterNo in self.filters:
+            tc("qdisc", "replace", "dev", self.interface, "parent", self._band(filterNo), "handle",
+               "{}:".format(self._handle(filterNo)), "pfifo")
+            tc("filter", "replace", "dev", self.interface, "parent", "1:", "protocol", "all", "prio", "1",
+               "handle", str(MARK_BASE + filterNo), "fw", "flowid", self._band(filterNo))
+
+    def _matches(self, impairment):
+        if impairment not in self.targets:
+            raise ValueError("No netem target for impairment {}".format(impairment))
+        target = self.targets[impairment]
+        matches = [self._fill(match) for match in target.get("matches", [])]
+        addresses = set()
+        for host in target.get("hosts", []):
+            try:
+                addresses.update(info[4][0] for info in socket.getaddrinfo(host, None, socket.AF_INET))
+            except socket.gaierror as e:
+                print("Cannot resolve {} for {}: {}".format(host, impairment, e))
+        if addresses:
+            matches.append("ip saddr {{ {} }} ip daddr {}".format(", ".join(sorted(addresses)), self.deviceIP))
+        if not matches:
+            raise ValueError("No hosts configured for impairment {}, add them to the netem targets file".format(
+                impairment))
+        return matches
+
+    def _fill(self, match):
+        if "{deviceMac}" in match and self.deviceMac is None:
+            self.deviceMac = readDeviceMac(self.deviceIP)
+            if self.deviceMac is None:
+                raise ValueError("MAC address of {} not readable over adb, needed for {}".format(self.deviceIP, match))
+        if "{gateway}" in match and self.gateway is None:
+            self.gateway = readGateway(self.deviceIP)
+            if self.gateway is None:
+                raise ValueError("Gateway of {} not readable over adb, needed for {}".format(self.deviceIP, match))
+        return match.format(deviceIP=self.deviceIP, deviceMac=(self.deviceMac or "").replace(":", ""),
+                            gateway=self.gateway)
+
+    def _band(self, filterNo):
+        # band 1:1 carries the unimpaired traffic
+        return "1:{}".format(self.filters.index(filterNo) + 2)
+
+    def _handle(self, filterNo):
+        return 10 + self.filters.index(filterNo)
@@ -0,0 +1,168 @@
+"""
+Description:
+OCR of screen regions with a cache keyed by the pixels of the region. read() captures the bounding box of all
+requested regions once and hashes every region: SHA-1 of its grayscale pixels, averaged over 2x2 blocks and quantised
+to 16 levels, so that capture noise below the quantisation step does not change the hash:
+- hash seen before (this run, an earlier run or another slot): the cached text is returned, no OCR
+- otherwise all the missing regions are read by one screenDefinition Match, not one Match per region
+
+Noise that crosses a quantisation step still misses the cache and costs one OCR, the hash stays fine enough that a
+changed character changes it.
+
+The StormTest OCR reads the live screen, so it can not be queued behind the navigation of the test: the batch runs
+while the screen is shown. The slots of a server share the OCR capacity instead, at most OCR_WORKERS slot processes of
+the host run a Match at a time (lock files in results/ocrCache), the others wait for a free worker.
+
+The cache is kept in results/ocrCache/regions.json and merged with the entries of the other slots when it is written.
+Without Pillow the region is hashed from the captured PNG file (exact, only bit identical captures hit).
+
+Usage:
+ocr = OcrCache()
+texts = ocr.read([ETHERNET_IP_REGION])
+api.writeDebugLine("Actual IP: {}".format(texts["ethernetIP"]))
+"""
+import hashlib
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+from framework import api
+
+from testCaseUtils.filterLease import tryLockFile, unlockFile
+from testCaseUtils.jsonStore import loadJson, saveMerged
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+OcrRegion = namedtuple("OcrRegion", ["name", "rect"])
+
+# Ethernet IP in the network settings of the launcher
+ETHERNET_IP_REGION = OcrRegion("ethernetIP", (2492, 1529, 265, 54))
+
+DEFAULT_CACHE_DIR = os.path.join("results", "ocrCache")
+OCR_WORKERS = 2
+MAX_ENTRIES = 2000
+# gray levels are shifted right by QUANTISE_BITS after the 2x2 block average
+QUANTISE_BITS = 4
+WORKER_POLL = 0.2
+
+
+def boundingRect(rects):
+    left = min(rect[0] for rect in rects)
+    top = min(rect[1] for rect in rects)
+    right = max(rect[0] + rect[2] for rect in rects)
+    bottom = max(rect[1] + rect[3] for rect in rects)
+    return left, top, right - left, bottom - top
+
+
+def ocrBatch(regions):
+    """ name -> text of all regions from a single screenDefinition Match """
+    sdo = api.screenDefinition()
+    for region in regions:
+        sdo.Regions.append(api.ocrRegion("", region.name, rect=region.rect, verify=False))
+    matched = sdo.Match()[0][1]
+    return {region.name: result.ResultText for region, result in zip(regions, matched.Regions)}
+
+
+class OcrWorker(object):
+    """ One of OCR_WORKERS lock files of the host, held while a slot process runs an OCR batch """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, workers=OCR_WORKERS):
+        self.paths = [os.path.join(directory, "worker{}.lock".format(index)) for index in range(workers)]
+        self._lockFile = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.paths[0]), exist_ok=True)
+        for path in self.paths:
+            lockFile = open(path, "w")
+            if tryLockFile(lockFile):
+                self._lockFile = lockFile
+                return self
+            lockFile.close()
+        # all workers busy, wait for this process' share
+        lockFile = open(self.paths[os.getpid() % len(self.paths)], "w")
+        while not tryLockFile(lockFile):
+            time.sleep(WORKER_POLL)
+        self._lockFile = lockFile
+        return self
+
+    def __exit__(self, *exc):
+        unlockFile(self._lockFile)
+        self._lockFile.close()
+        self._lockFile = None
+
+
+class OcrCache(object):
+
+    def __init__(self, cacheDir=DEFAULT_CACHE_DIR, workers=OCR_WORKERS):
+        self.cachePath = os.path.join(cacheDir, "regions.json")
+        self.worker = OcrWorker(cacheDir, workers)
+        self.capturePath = os.path.join(tempfile.gettempdir(), "ocrRegions_{}.png".format(os.getpid()))
+        self.hits = 0
+        self.misses = 0
+        # pixel hash -> [text, last used (epoch seconds)]
+        self.entries = loadJson(self.cachePath, "OCR cache")
+
+    def read(self, regions):
+        """ name -> OCR text of every region, unchanged regions come from the cache """
+        hashes = self.regionHashes(regions)
+        texts = {}
+        missing = []
+        for region in regions:
+            entry = self.entries.get(hashes.get(region.name))
+            if entry is not None:
+                entry[1] = time.time()
+                texts[region.name] = entry[0]
+            else:
+                missing.append(region)
+        self.hits += len(regions) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            with self.worker:
+                ocrTexts = ocrBatch(missing)
+            texts.update(ocrTexts)
+            for region in missing:
+                if hashes.get(region.name) is not None:
+                    self.entries[hashes[region.name]] = [ocrTexts[region.name], time.time()]
+            self.entries = saveMerged(self.cachePath, self.entries, mergeEntries, "OCR cache")
+        return texts
+
+    def regionHashes(self, regions):
+        """ name -> hash of the region pixels, empty when the capture fails (every region is read by OCR) """
+        try:
+            if Image is None:
+                return {region.name: self._fileHash(region.rect) for region in regions}
+            bounds = boundingRect([region.rect for region in regions])
+            api.captureImageEx(bounds, self.capturePath)[0][2].Close()
+            hashes = {}
+            with Image.open(self.capturePath) as capture:
+                gray = capture.convert("L")
+                for region in regions:
+                    x, y, width, height = region.rect
+                    crop = gray.crop((x - bounds[0], y - bounds[1], x - bounds[0] + width, y - bounds[1] + height))
+                    quantised = crop.reduce(2).point(lambda level: level >> QUANTISE_BITS)
+                    digest = hashlib.sha1("{}x{}q{}".format(width, height, QUANTISE_BITS).encode())
+                    digest.update(quantised.tobytes())
+                    hashes[region.name] = digest.hexdigest()
+            return hashes
+        except Exception as e:
+            api.writeDebugLine("OCR region hash failed: {}".format(e))
+            return {}
+
+    def _fileHash(self, rect):
+        api.captureImageEx(rect, self.capturePath)[0][2].Close()
+        with open(self.capturePath, "rb") as capture:
+            return hashlib.sha1(capture.read()).hexdigest()
+
+
+def mergeEntries(entries, stored):
+    """ Add the entries other slots stored (newest use wins), keep the MAX_ENTRIES last used ones """
+    for regionHash, entry in stored.items():
+        if regionHash not in entries or entries[regionHash][1] < entry[1]:
+            entries[regionHash] = entry
+    if len(entries) > MAX_ENTRIES:
+        entries = dict(sorted(entries.items(), key=lambda item: item[1][1], reverse=True)[:MAX_ENTRIES])
+    return entries
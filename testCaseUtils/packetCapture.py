@@ -0,0 +1,129 @@
+"""
+Description:
+Wireshark check of the README done by the test run: tcpdump records the traffic of the DUT on a local interface (the
+bridge port or a mirror port) into a ring of pcap files, the iteration boundaries are kept as wall clock times and
+packetDissector turns the packets of an iteration into a millisecond timeline of DHCP, DNS and TCP connect events.
+
+The capture filter takes the packets to and from deviceIP plus the DHCP packets with the MAC of the DUT as client
+hardware address (BOOTP chaddr), a DISCOVER is sent from 0.0.0.0 before the DUT has its address. The DHCP traffic of
+the other DUTs on the segment is not recorded. The MAC is read over adb when it is not given, without it only the
+packets of deviceIP are captured. Needs tcpdump and root or sudo, like the netem backend.
+
+Usage:
+capture = PacketCapture(deviceIP, "eth1", slotNo, deviceMac=slotInfo[server][slotNo].get("mac"))
+capture.start()
+capture.startIteration(iteration)
+...
+for line in capture.timeline(iteration):
+    api.writeDebugLine(line)
+capture.stop()
+"""
+import glob
+import os
+import subprocess
+import time
+
+from testCaseUtils.deviceAddress import readDeviceMac
+from testCaseUtils.hostCommands import privileged
+from testCaseUtils.packetDissector import dissect, readPcap
+
+DEFAULT_CAPTURE_DIR = os.path.join("results", "captures")
+RING_FILES = 10
+RING_FILE_MB = 20
+
+
+class PacketCapture(object):
+
+    def __init__(self, deviceIP, interface, slotNo, captureDir=DEFAULT_CAPTURE_DIR, files=RING_FILES,
+                 fileMegabytes=RING_FILE_MB, deviceMac=None):
+        self.deviceIP = deviceIP
+        # None: read over adb by start()
+        self.deviceMac = deviceMac
+        self.interface = interface
+        self.directory = os.path.join(captureDir, "slot{}".format(slotNo))
+        self.prefix = os.path.join(self.directory, "capture.pcap")
+        self.files = files
+        self.fileMegabytes = fileMegabytes
+        # iteration -> (start, end) wall clock seconds, end None while running
+        self.iterations = {}
+        self._current = None
+        self._process = None
+
+    def start(self):
+        if self.isAlive():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for path in glob.glob(self.prefix + "*"):
+            os.remove(path)
+        captureFilter = self.captureFilter()
+        command = privileged(["tcpdump", "-i", self.interface, "-n", "-U", "-s", "0", "-C", str(self.fileMegabytes),
+                              "-W", str(self.files), "-w", self.prefix, captureFilter])
+        self._process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print("Capturing {} on {} to {}*".format(self.deviceIP, self.interface, self.prefix))
+
+    def captureFilter(self):
+        """ BPF filter: deviceIP, plus the DHCP packets with the MAC of the DUT as chaddr (UDP offset 36) """
+        if self.deviceMac is None:
+            self.deviceMac = readDeviceMac(self.deviceIP)
+        if self.deviceMac is None:
+            print("MAC of {} unknown, DHCP packets before it has its address are not captured".format(self.deviceIP))
+            return "host {}".format(self.deviceIP)
+        mac = self.deviceMac.lower().replace(":", "")
+        return "host {} or ((udp port 67 or udp port 68) and udp[36:4] = 0x{} and udp[40:2] = 0x{})".format(
+            self.deviceIP, mac[:8], mac[8:])
+
+    def isAlive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def stop(self):
+        self.endIteration()
+        if self.isAlive():
+            self._process.terminate()
+            try:
+                self._process.wait(10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+    def startIteration(self, iteration):
+        self.endIteration()
+        self._current = iteration
+        self.iterations[iteration] = (time.time(), None)
+
+    def endIteration(self):
+        if self._current is not None:
+            self.iterations[self._current] = (self.iterations[self._current][0], time.time())
+            self._current = None
+
+    def events(self, since=None, until=None):
+        """ PacketEvents of the ring between the wall clock times since and until, oldest first """
+        ringFiles = sorted(glob.glob(self.prefix + "*"), key=os.path.getmtime)
+        for path in ringFiles:
+            if since is not None and os.path.getmtime(path) < since:
+                # rotated before the window started
+                continue
+            try:
+                for event in dissect(readPcap(path)):
+                    if since is not None and event.timestamp < since:
+                        continue
+                    if until is not None and event.timestamp > until:
+                        return
+                    yield event
+            except (IOError, ValueError) as e:
+                print("Cannot read {}: {}".format(path, e))
+
+    def iterationEvents(self, iteration):
+        start, end = self.iterations.get(iteration, (None, None))
+        if start is None:
+            return []
+        return list(self.events(start, end))
+
+    def timeline(self, iteration, kinds=None):
+        """ One line per event of the iteration: seconds since the iteration started, kind and detail """
+        start = self.iterations.get(iteration, (None, None))[0]
+        lines = []
+        for event in self.iterationEvents(iteration):
+            if kinds is None or event.kind in kinds:
+                lines.append("{:9.3f}s {:<14} {} ({} -> {})".format(event.timestamp - start, event.kind, event.detail,
+                                                                   event.src, event.dst))
+        return lines
@@ -0,0 +1,204 @@
+"""
+Description:
+Pure Python reader for the pcap files of tcpdump and a dissector for the packets the impairment test cases care about:
+DHCP (DISCOVER/OFFER/REQUEST/ACK/NAK/...), DNS queries and responses and TCP connect attempts (SYN, SYN-ACK, RST).
+Both work as generators, a ring of capture files is read packet by packet without loading a file into memory.
+
+Classic pcap (not pcapng) with Ethernet, Linux cooked (tcpdump -i any) or raw IP link types, IPv4 only.
+
+Usage:
+for event in dissect(readPcap("results/captures/slot13/capture.pcap0")):
+    print(event.timestamp, event.kind, event.detail)
+"""
+import socket
+import struct
+from collections import namedtuple
+
+PacketEvent = namedtuple("PacketEvent", ["timestamp", "kind", "detail", "src", "dst", "fields"])
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+DHCP_MESSAGE_TYPES = {1: "DISCOVER", 2: "OFFER", 3: "REQUEST", 4: "DECLINE", 5: "ACK", 6: "NAK", 7: "RELEASE",
+                      8: "INFORM"}
+DHCP_MAGIC_COOKIE = b"\x63\x82\x53\x63"
+DNS_TYPES = {1: "A", 5: "CNAME", 28: "AAAA", 33: "SRV", 65: "HTTPS"}
+DNS_RCODES = {0: "NOERROR", 2: "SERVFAIL", 3: "NXDOMAIN", 5: "REFUSED"}
+
+
+def readPcap(path):
+    """ (timestamp, linkType, frame) of every packet in the pcap file, a truncated last packet is skipped """
+    with open(path, "rb") as pcap:
+        header = pcap.read(24)
+        if len(header) < 24:
+            return
+        magic = header[:4]
+        if magic in (b"\xd4\xc3\xb2\xa1", b"\x4d\x3c\xb2\xa1"):
+            endian = "<"
+        elif magic in (b"\xa1\xb2\xc3\xd4", b"\xa1\xb2\x3c\x4d"):
+            endian = ">"
+        else:
+            raise ValueError("{} is not a pcap file".format(path))
+        # nanosecond resolution files have a different magic
+        fraction = 1e-9 if magic in (b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d") else 1e-6
+        linkType = struct.unpack(endian + "I", header[20:24])[0] & 0x0FFFFFFF
+        recordHeader = struct.Struct(endian + "IIII")
+        while True:
+            record = pcap.read(16)
+            if len(record) < 16:
+                return
+            seconds, fractionPart, capturedLength, _ = recordHeader.unpack(record)
+            frame = pcap.read(capturedLength)
+            if len(frame) < capturedLength:
+                return
+            yield seconds + fractionPart * fraction, linkType, frame
+
+
+def ipv4Payload(linkType, frame):
+    """ IPv4 packet in the frame, None for other protocols """
+    if linkType == LINKTYPE_ETHERNET:
+        offset, etherType = 14, frame[12:14]
+        while etherType == b"\x81\x00":
+            # VLAN tag
+            offset, etherType = offset + 4, frame[offset + 2:offset + 4]
+    elif linkType == LINKTYPE_LINUX_SLL:
+        offset, etherType = 16, frame[14:16]
+    elif linkType == LINKTYPE_RAW:
+        offset, etherType = 0, b"\x08\x00"
+    else:
+        return None
+    if etherType != b"\x08\x00" or len(frame) < offset + 20:
+        return None
+    return frame[offset:]
+
+
+def dissect(packets):
+    """ PacketEvents of (timestamp, linkType, frame) packets, e.g. from readPcap() """
+    for timestamp, linkType, frame in packets:
+        packet = ipv4Payload(linkType, frame)
+        if packet is None or packet[0] >> 4 != 4:
+            continue
+        headerLength = (packet[0] & 0x0F) * 4
+        protocol = packet[9]
+        src, dst = socket.inet_ntoa(packet[12:16]), socket.inet_ntoa(packet[16:20])
+        if struct.unpack("!H", packet[6:8])[0] & 0x1FFF:
+            # later fragments have no transport header
+            continue
+        segment = packet[headerLength:]
+        try:
+            if protocol == 17 and len(segment) >= 8:
+                sourcePort, destinationPort = struct.unpack("!HH", segment[:4])
+                payload = segment[8:]
+                if {sourcePort, destinationPort} & {67, 68}:
+                    event = dhcpEvent(timestamp, src, dst, payload)
+                elif 53 in (sourcePort, destinationPort):
+                    event = dnsEvent(timestamp, src, dst, payload)
+                else:
+                    event = None
+            elif protocol == 6 and len(segment) >= 20:
+                event = tcpEvent(timestamp, src, dst, segment)
+            else:
+                event = None
+        except (IndexError, struct.error, UnicodeDecodeError):
+            # truncated or malformed packet
+            event = None
+        if event is not None:
+            yield event
+
+
+def dhcpEvent(timestamp, src, dst, payload):
+    if len(payload) < 240 or payload[236:240] != DHCP_MAGIC_COOKIE:
+        return None
+    transactionId = "{:08x}".format(struct.unpack("!I", payload[4:8])[0])
+    fields = {
+        "xid": transactionId,
+        "clientIP": socket.inet_ntoa(payload[12:16]),
+        "yourIP": socket.inet_ntoa(payload[16:20]),
+        "mac": ":".join("{:02x}".format(byte) for byte in payload[28:34])
+    }
+    options = dhcpOptions(payload[240:])
+    messageType = DHCP_MESSAGE_TYPES.get(options.get(53, b"\x00")[0], "UNKNOWN")
+    if 50 in options:
+        fields["requestedIP"] = socket.inet_ntoa(options[50])
+    if 54 in options:
+        fields["serverId"] = socket.inet_ntoa(options[54])
+    if 51 in options:
+        fields["leaseTime"] = struct.unpack("!I", options[51])[0]
+    if 58 in options:
+        fields["renewalTime"] = struct.unpack("!I", options[58])[0]
+    if 59 in options:
+        fields["rebindingTime"] = struct.unpack("!I", options[59])[0]
+    detail = "{} xid {}".format(messageType, transactionId)
+    address = fields["yourIP"] if fields["yourIP"] != "0.0.0.0" else fields.get("requestedIP")
+    if address:
+        detail += " {}".format(address)
+    return PacketEvent(timestamp, "DHCP " + messageType, detail, src, dst, fields)
+
+
+def dhcpOptions(data):
+    options = {}
+    index = 0
+    while index < len(data):
+        code = data[index]
+        if code == 255:
+            break
+        if code == 0:
+            index += 1
+            continue
+        length = data[index + 1]
+        options[code] = data[index + 2:index + 2 + length]
+        index += 2 + length
+    return options
+
+
+def dnsEvent(timestamp, src, dst, payload):
+    if len(payload) < 12:
+        return None
+    transactionId, flags, questions, answers = struct.unpack("!HHHH", payload[:8])
+    if not questions:
+        return None
+    name, offset = dnsName(payload, 12)
+    queryType = struct.unpack("!H", payload[offset:offset + 2])[0]
+    fields = {"id": transactionId, "name": name, "type": DNS_TYPES.get(queryType, str(queryType))}
+    if flags & 0x8000:
+        fields["rcode"] = DNS_RCODES.get(flags & 0x000F, str(flags & 0x000F))
+        fields["answers"] = answers
+        return PacketEvent(timestamp, "DNS response", "{} {} {} answers {}".format(
+            name, fields["type"], fields["rcode"], answers), src, dst, fields)
+    return PacketEvent(timestamp, "DNS query", "{} {}".format(name, fields["type"]), src, dst, fields)
+
+
+def dnsName(payload, offset):
+    """ (name, offset behind the name) of the (possibly compressed) name at offset """
+    labels = []
+    end = None
+    for _ in range(128):
+        length = payload[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | payload[offset + 1]
+            continue
+        if length == 0:
+            return ".".join(labels), end if end is not None else offset + 1
+        labels.append(payload[offset + 1:offset + 1 + length].decode("ascii"))
+        offset += 1 + length
+    raise IndexError("DNS name loop")
+
+
+def tcpEvent(timestamp, src, dst, segment):
+    sourcePort, destinationPort = struct.unpack("!HH", segment[:4])
+    flags = segment[13]
+    syn, ack, rst = flags & 0x02, flags & 0x10, flags & 0x04
+    if syn and not ack:
+        kind = "TCP SYN"
+    elif syn and ack:
+        kind = "TCP SYN-ACK"
+    elif rst:
+        kind = "TCP RST"
+    else:
+        return None
+    fields = {"sourcePort": sourcePort, "destinationPort": destinationPort}
+    return PacketEvent(timestamp, kind, "{}:{} -> {}:{}".format(src, sourcePort, dst, destinationPort), src, dst,
+                       fields)
@@ -0,0 +1,525 @@
+"""
+Description:
+Runs the impairment scenarios of testCaseUtils.scenarios with the shared 8 step flow of the test case scripts.
+One engine keeps a single Test/LinearTV/KImpairment/ErrorCheck/logcat session and a single KMAX filter lease for all
+scenarios, so the StormTest connection and the DUT initialisation are done once for the whole suite.
+
+A scenario with a profile (or the impairmentProfile parameter) plays the impairment schedule on a ProfileRunner while
+the error screen is awaited, removeImpairment stops it before the filter is switched off.
+
+With adaptiveTimeouts the error and recovery waits use the ceilings learned from the earlier iterations of the
+scenario on the same firmware (testCaseUtils.adaptiveTimeouts), the scenario values stay the upper limit.
+
+With captureInterface tcpdump records the traffic of the DUT on that interface and the DHCP/DNS/TCP connect
+timeline of every iteration is written to the debug log (testCaseUtils.packetCapture).
+
+With dhcpStandIn ("<interface>[:<leaseSeconds>[:<router>[:<dns>,...]]]") a local DHCP server with short leases replaces
+the production server for the MAC of the DUT while the engine runs (testCaseUtils.dhcpStandIn), the DHCP impairments
+drop/delay the replies of the stand-in.
+With dnsStandIn ("<interface>[:<host>,...]") the DNS impairments drop/delay only the answers for those hosts (or the
+dnsHosts of the scenario) on a local DNS responder, the queries of every iteration are written to the debug log
+(testCaseUtils.dnsStandIn).
+
+The DHCP scenarios follow the lease state machine of the DUT (testCaseUtils.dhcpTimeline): the retry cadence and
+the time from impairment off to the DHCP ACK are reported for every iteration.
+
+With verifySettings the IP of the DUT is read over adb and checked against slotInfo (testCaseUtils.deviceAddress),
+ocrAudit also reads it from the network settings of the launcher (testCaseUtils.ocrCache).
+
+With reuseSession the precondition of a scenario is skipped while a cheap health probe (no error screen, motion on the
+live screen) passes, the DUT is only brought back to the linear channel when the probe fails.
+
+Usage:
+engine = ScenarioEngine(t, motionTime=10, debugApk=True, verifySettings=True, reboot=True, reuseSession=True,
+                        impairmentBackend="kmax", impairmentProfile=None, adaptiveTimeouts=True,
+                        captureInterface=None, dhcpStandIn="", dnsStandIn="", ocrAudit=False)
+engine.open()
+passed = engine.runAll(selectScenarios("41.1,43.10"), times=5)
+engine.close()
+t.disconnect()
+engine.logArchive.close()
+"""
+import time
+
+from framework import api
+from framework.configs.slotInfo import slotInfo
+from framework.model.application.linearTV.LinearTV import LinearTV
+from framework.model.utility.errorDetection import ErrorCheck
+from framework.model.utility.testUtil import defineStep, setStepStatus, handleTestException, resetStepNumber
+
+from testCaseUtils.adaptiveTimeouts import readFirmware, TimeoutHistory
+from testCaseUtils.bootDetector import BootDetector, BOOT_TIMEOUT
+from testCaseUtils.deviceAddress import checkDeviceAddress, describeAddressCheck
+from testCaseUtils.dhcpStandIn import createDhcpStandIn
+from testCaseUtils.dhcpTimeline import DhcpLeaseMonitor, readUtcOffset
+from testCaseUtils.dnsStandIn import createDnsStandIn
+from testCaseUtils.errorScreenCache import CachedErrorCheck
+from testCaseUtils.impairmentProfile import ProfileRunner, parseProfile
+from testCaseUtils.impairmentSession import getImpairmentSession
+from testCaseUtils.latencyMetrics import LatencyRecorder
+from testCaseUtils.logArchive import LogArchive
+from testCaseUtils.logcatStream import getLogcatStream
+from testCaseUtils.logStore import LogStore
+from testCaseUtils.motionEngine import MotionEngine
+from testCaseUtils.netemImpairment import createFilterLease
+from testCaseUtils.ocrCache import OcrCache, ETHERNET_IP_REGION
+from testCaseUtils.packetCapture import PacketCapture
+from testCaseUtils.screenIndex import ScreenIdentifier
+from testCaseUtils.screenRecorder import ScreenRecorder
+from testCaseUtils.waitEngine import waitUntil, errorCodeCleared
+
+
+class ScenarioEngine(object):
+
+    def __init__(self, t, motionTime=10, debugApk=True, verifySettings=True, reboot=True, reuseSession=True,
+                 impairmentBackend="kmax", impairmentProfile=None, adaptiveTimeouts=True, captureInterface=None,
+                 dhcpStandIn="", dnsStandIn="", ocrAudit=False):
+        self.t = t
+        self.config = t.config
+        self.motionTime = motionTime
+        self.debugApk = debugApk
+        self.verifySettings = verifySettings
+        self.reboot = reboot
+        self.reuseSession = reuseSession
+        self.ocrAudit = ocrAudit
+        self.impairmentProfile = parseProfile(impairmentProfile) if impairmentProfile else None
+        self.adaptiveTimeouts = adaptiveTimeouts
+        self.sessionReady = False
+
+        self.server = self.config.getConfigItem("server")
+        self.slotNo = self.config.getConfigItem("slotNumber")
+        self.ipKmax = self.config.getConfigItem("ipKmax")
+
+        self.tv = LinearTV(self.config)
+        self.motion = MotionEngine(self.tv)
+        self.screens = ScreenIdentifier(self.tv)
+        self.nav = self.tv.utility.navigator
+        self.deviceIP = slotInfo[t.server][str(t.slotNo)]["ip"]
+        self.logcat = getLogcatStream(self.deviceIP, port=5038)
+        self.firmware = readFirmware(self.deviceIP)
+        self.utcOffset = readUtcOffset(self.deviceIP)
+        self.bootDetector = BootDetector(self.logcat, self.motion)
+        self.kmaxImpairment = getImpairmentSession(impairmentBackend, self.deviceIP)
+        self.errorCheck = CachedErrorCheck(ErrorCheck())
+        self.ocr = OcrCache()
+        self.filterLease = createFilterLease(self.kmaxImpairment, self.ipKmax, self.slotNo)
+        self.filterNo = None
+        self.profileRunner = None
+        self.dhcp = None
+        # unused part of the dhcpRetries budget, added to the error screen wait
+        self.extraErrorSeconds = 0
+        self.metrics = None
+        self.timeouts = None
+        self.recorder = ScreenRecorder(self.slotNo)
+        self.logArchive = LogArchive(self.logcat, "runScenarios", self.slotNo)
+        self.logStore = LogStore(self.logcat, None, self.server, self.slotNo)
+        self.trackedDefineStep = self.logStore.tracking(defineStep)
+        self.capture = None
+        if captureInterface:
+            self.capture = PacketCapture(self.deviceIP, captureInterface, self.slotNo,
+                                         deviceMac=slotInfo[t.server][str(t.slotNo)].get("mac"))
+        self.dhcpServer = createDhcpStandIn(dhcpStandIn, self.deviceIP,
+                                            clientMac=slotInfo[t.server][str(t.slotNo)].get("mac"))
+        self.dnsServer = createDnsStandIn(dnsStandIn, self.deviceIP, self.slotNo)
+
+    def open(self):
+        self.filterNo = self.filterLease.acquire()
+        self.profileRunner = ProfileRunner(self.kmaxImpairment, self.filterNo)
+        self.recorder.start()
+        if self.capture is not None:
+            self.capture.start()
+        if self.dhcpServer is not None:
+            self.dhcpServer.start()
+        if self.dnsServer is not None:
+            self.dnsServer.start()
+
+    def close(self):
+        """ Stop the helpers while the full log dump runs, then wait for the dump and the log archive """
+        self.logArchive.saveAllLogs(self.t.adb, self.server)
+        if self.capture is not None:
+            self.capture.stop()
+        if self.dhcpServer is not None:
+            self.dhcpServer.stop()
+        if self.dnsServer is not None:
+            self.dnsServer.stop()
+        self.recorder.stop()
+        self.filterLease.release()
+        self.logStore.close()
+        self.logArchive.close()
+
+    def runAll(self, scenarios, times):
+        """ Run every scenario times iterations, returns True if no scenario was aborted by an exception """
+        results = []
+        for scenario in scenarios:
+            results.append((scenario["id"], self.run(scenario, times)))
+        api.writeDebugLine("Scenario results: {}".format(results))
+        return all(passed for scenarioId, passed in results)
+
+    def run(self, scenario, times):
+        self.metrics = LatencyRecorder(scenario["id"], self.server, self.slotNo, firmware=self.firmware)
+        self.timeouts = TimeoutHistory(scenario["id"], self.firmware)
+        self.logStore.startScenario(scenario["id"])
+        resetStepNumber()
+        try:
+            if self.reuseSession and self.sessionReady:
+                self.reuseOrRecover(scenario)
+            else:
+                self.precondition(scenario)
+            self.sessionReady = True
+            for iteration in range(1, int(times) + 1):
+                self.metrics.startIteration(iteration)
+                self.logStore.startIteration(iteration)
+                if self.capture is not None:
+                    self.capture.startIteration("{}:{}".format(scenario["id"], iteration))
+                iterationStartedAt = time.time()
+                self.runIteration(scenario, iteration)
+                self.printPacketTimeline("{}:{}".format(scenario["id"], iteration))
+                self.printDnsQueries(iterationStartedAt)
+                self.metrics.emitIteration()
+                self.logArchive.markIteration("{}:{}".format(scenario["id"], iteration))
+                self.trackedDefineStep("{} Closing Iteration {}".format(scenario["id"], iteration),
+                                       "Close test gracefully")
+                resetStepNumber()
+
+            self.defineStep(scenario, None, "Teardown Environment", "Scenario finished")
+            api.writeDebugLine(scenario["summary"])
+            for message in TimeoutHistory(scenario["id"], self.firmware).regressions():
+                api.writeDebugLine(message)
+            setStepStatus(api.TM.PASS)
+            return True
+
+        except Exception as e:
+            self.sessionReady = False
+            self.profileRunner.stop()
+            self.kmaxImpairment.switchImpairment_OFF(filterNo=self.filterNo)
+            for standIn in (self.dhcpServer, self.dnsServer):
+                if standIn is not None:
+                    standIn.switchImpairment_OFF()
+            print(e)
+            self.recorder.capture("Failure_Exception.png")
+            self.logArchive.markIteration("{}:exception".format(scenario["id"]))
+            handleTestException()
+            return False
+
+        finally:
+            self.metrics.close()
+
+    def reportDhcp(self, impairmentOffAt):
+        if self.dhcp is None:
+            return
+        self.dhcp.update()
+        ack = self.dhcp.firstEvent("ACK", after=impairmentOffAt)
+        if ack is not None:
+            self.metrics.markEvent("dhcpAck", since="impairmentOff", at=self.dhcp.monotonic(ack))
+        for line in self.dhcp.report():
+            api.writeDebugLine(line)
+
+    def printPacketTimeline(self, iteration):
+        if self.capture is None:
+            return
+        self.capture.endIteration()
+        lines = self.capture.timeline(iteration)
+        api.writeDebugLine("Packet timeline {} ({} events)".format(iteration, len(lines)))
+        for line in lines:
+            api.writeDebugLine(line)
+
+    def printDnsQueries(self, since):
+        if self.dnsServer is None:
+            return
+        for line in self.dnsServer.report(since):
+            api.writeDebugLine(line)
+
+    def impairmentFor(self, scenario):
+        """ The DHCP/DNS stand-ins impair their own replies, everything else goes to the KMAX/netem session """
+        if self.dhcpServer is not None and scenario["impairment"] == "DHCP":
+            return self.dhcpServer
+        if self.dnsServer is not None and scenario["impairment"] == "DNS":
+            return self.dnsServer
+        return self.kmaxImpairment
+
+    def defineStep(self, scenario, iteration, name, expectedResult):
+        if iteration is None:
+            stepName = "{} {}".format(scenario["id"], name)
+        else:
+            stepName = "{} Iteration: {} : {}".format(scenario["id"], iteration, name)
+        self.trackedDefineStep(stepName, stepName, expectedResult)
+
+    def timeout(self, metric, ceiling, pad=0):
+        """ Learned timeout of the wait (adaptiveTimeouts), ceiling otherwise """
+        if not self.adaptiveTimeouts:
+            return ceiling
+        return self.timeouts.timeout(metric, ceiling, pad=pad)
+
+    # ============
+    # Steps
+    # ============
+
+    def probeHealth(self):
+        """
+        Cheap check that the DUT can go straight into the next scenario: logcat is streaming, no error screen and
+        motion on the current screen. Returns (healthy, reason).
+        """
+        if not self.logcat.isAlive():
+            api.writeDebugLine("Logcat stream is reconnecting")
+        errorResult = self.errorCheck.getErrorCode()
+        if errorResult[0]:
+            return False, "Error screen {}".format(errorResult[1])
+        motionResult = self.motion.isMotion()
+        if not motionResult[0]:
+            return False, "No motion"
+        return True, "Motion"
+
+    def reuseOrRecover(self, scenario):
+        healthy, reason = self.probeHealth()
+        api.writeDebugLine("Session health probe: {}".format(reason))
+        if not healthy:
+            self.precondition(scenario)
+            return
+        self.defineStep(scenario, None, "Precondition: Reuse session", "DUT is healthy, linear channel playing")
+        setStepStatus(api.TM.PASS)
+
+    def precondition(self, scenario):
+        self.defineStep(scenario, None, "Precondition: Open Linear Channel", "Precondition should be fulfilled")
+        self.kmaxImpairment.switchImpairment_OFF(filterNo=self.filterNo)
+        api.pressButtons(['OK', 'MENU', '5'], 3)
+
+        result = self.tv.open('LiveScreen')
+        api.writeDebugLine("Return values for tv.open(): {}".format(result))
+        if result[0]:
+            setStepStatus(api.TM.PASS)
+            return
+
+        result = self.screens.checkUnExpectedScreen()
+        api.writeDebugLine("Check UnExpectedScreen Results: {}".format(result))
+        if result[1] != 'Motion':
+            result = self.tv.recoverFromUnExpectedScreen(screenToRecoverFrom=result[1])
+            api.writeDebugLine("Recover UnExpectedScreen Results: {}".format(result))
+
+            if result is None or not result[0]:
+                self.recorder.capture("Failure_Exception.png")
+                raise Exception("Unexpected Screen. Cannot proceed....")
+
+    def runIteration(self, scenario, iteration):
+        self.startIteration(scenario, iteration)
+        self.switchImpairmentOn(scenario, iteration)
+        self.validateErrorScreen(scenario, iteration)
+        self.removeImpairment(scenario, iteration)
+        self.validateLiveScreen(scenario, iteration)
+
+    def startIteration(self, scenario, iteration):
+        trigger = scenario["trigger"]
+        if trigger == "powerOff":
+            self.defineStep(scenario, iteration, "Power off the DUT", "Switch off the DUT without any issue")
+            api.powerOffSTB()
+            powerOffStatus = self.tv.executeSDO('noVideo')
+            setStepStatus(api.TM.PASS if powerOffStatus['VerifyStatus'] else api.TM.FAIL)
+
+        elif trigger in ("bootUp", "swdl"):
+            self.defineStep(scenario, iteration, "Fresh boot up from the powerless state", "Booting up without any issue")
+            if self.reboot:
+                api.powerOffSTB()
+                api.powerOnSTB()
+            else:
+                print("No need to reboot")
+            setStepStatus(api.TM.PASS)
+
+        else:
+            self.defineStep(scenario, iteration, "Linear channel is playing",
+                            "Linear Channel should be played and motion should be detected continuously")
+            if trigger == "reboot" and self.reboot:
+                self.metrics.bootDuration(self.bootDetector.powerCycle(timeout=BOOT_TIMEOUT))
+            api.pressButtons(['MENU', '5'], 10)
+
+            motionResult = self.motion.isMotion()
+            api.writeDebugLine("Motion Result::{}".format(motionResult))
+            setStepStatus(api.TM.PASS if motionResult[0] else api.TM.FAIL)
+
+    def switchImpairmentOn(self, scenario, iteration):
+        self.defineStep(scenario, iteration, "Initialise KMAX network emulator", "Set up network impairment as per filter")
+
+        if scenario["trigger"] == "settingsMenu":
+            if self.verifySettings:
+                self.nav.resetLastNavScreen()
+                self.nav.navigateTo("OpenSystemSetting")
+                api.waitSec(5)
+                api.pressButtons(["OK", "OK", "DOWN"], 5)
+            else:
+                api.pressButtons(['POWER', 'POWER', '5'], 10)
+
+        requests = None
+        if scenario["requestLogs"]:
+            requests = self.logcat.cursor()
+        self.dhcp = None
+        if scenario["impairment"] == "DHCP":
+            self.dhcp = DhcpLeaseMonitor(self.logcat.cursor(), utcOffset=self.utcOffset)
+        self.extraErrorSeconds = 0
+
+        profile = self.impairmentProfile or scenario["profile"]
+        if profile:
+            if isinstance(profile, str):
+                profile = parseProfile(profile)
+            self.profileRunner.session = self.impairmentFor(scenario)
+            self.profileRunner.start(scenario["impairment"], profile)
+            self.metrics.markImpairmentOn()
+        else:
+            kwargs = {"impairment": scenario["impairment"], "filterNo": self.filterNo}
+            if scenario["drop"] is not None:
+                kwargs["drop"] = scenario["drop"]
+            if scenario["delay"] is not None:
+                kwargs["delay"] = scenario["delay"]
+            impairment = self.impairmentFor(scenario)
+            if impairment is self.dnsServer and scenario["dnsHosts"]:
+                kwargs["hosts"] = scenario["dnsHosts"]
+            impairment.switchImpairment_ON(**kwargs)
+            self.metrics.markImpairmentOn(impairment.lastToggleSeconds)
+
+        if requests is not None:
+            tag, search, count, firstTimeout, timeout = scenario["requestLogs"]
+            print("{} messages".format(search))
+            for index in range(count):
+                entry = requests.waitFor(tag=tag, search=search, timeout=firstTimeout if index == 0 else timeout)
+                if entry is None:
+                    break
+                print(entry.line)
+        if scenario["dhcpRetries"]:
+            retries = self.dhcp.waitForRetryPattern(*scenario["dhcpRetries"])
+            api.writeDebugLine("DHCP {} retries {} after {}s, intervals {}, confirmed {}".format(
+                retries.message, retries.retries, retries.elapsed, retries.intervals, retries.confirmed))
+            self.extraErrorSeconds = retries.unusedSeconds
+        setStepStatus(api.TM.PASS)
+
+        if scenario["trigger"] == "powerOff":
+            self.defineStep(scenario, iteration, "Power ON the DUT", "DUT wakes up, it shows android animation")
+            api.powerOnSTB()
+            setStepStatus(api.TM.PASS)
+
+    def validateErrorScreen(self, scenario, iteration):
+        self.defineStep(scenario, iteration, "Validate the current screen",
+                        "Error code {} on the screen".format(scenario["expectedError"]))
+
+        if scenario["trigger"] == "settingsMenu":
+            api.pressButton('MENU')
+        if scenario["errorWait"] == "event":
+            timeout = self.timeout("timeToError", scenario["errorTimeout"]) + self.extraErrorSeconds
+            expectedCode = "Code-" + scenario["expectedError"]
+            self.metrics.timeToError(self.errorCheck.waitForErrorCode(expectedCode, timeout=timeout))
+        else:
+            api.waitSec(scenario["errorTimeout"])
+
+        self.printLogs(scenario, scenario["errorLogs"])
+        if scenario["errorKeys"]:
+            api.pressButtons(*scenario["errorKeys"])
+
+        errorResult = self.errorCheck.getErrorCode()
+        print(errorResult)
+        if errorResult[0]:
+            setStepStatus(api.TM.PASS)
+        else:
+            print('This is not an error screen/unknown error screen')
+            self.recorder.capture("currentScreen.png")
+            setStepStatus(api.TM.FAIL)
+
+    def removeImpairment(self, scenario, iteration):
+        self.defineStep(scenario, iteration, "Remove the network impairment", "Reset the KMAX and recover the error state")
+
+        ackCursor = self.logcat.cursor() if scenario["recoveryLogWait"] else None
+        self.profileRunner.stop()
+        if self.profileRunner.applied:
+            api.writeDebugLine("Impairment profile applied: {}".format(self.profileRunner.applied))
+        impairmentOffAt = time.monotonic()
+        impairment = self.impairmentFor(scenario)
+        impairment.switchImpairment_OFF(filterNo=self.filterNo)
+        self.metrics.markImpairmentOff(impairment.lastToggleSeconds)
+        if scenario["recoveryWait"] == "event":
+            self.metrics.timeToRecovery(waitUntil(errorCodeCleared(self.errorCheck),
+                                                  timeout=self.timeout("timeToRecovery", scenario["recoveryTimeout"],
+                                                                       pad=10),
+                                                  stableFor=10, description="Error screen cleared"))
+        else:
+            api.waitSec(scenario["recoveryTimeout"])
+        if scenario["recoveryKeys"]:
+            api.pressButtons(*scenario["recoveryKeys"])
+        self.reportDhcp(impairmentOffAt)
+
+        errorResult = self.errorCheck.getErrorCode()
+        print(errorResult)
+        if errorResult[0]:
+            api.writeDebugLine("DUT stuck in the error state")
+            if scenario["skipRebootOn"] and errorResult[1] == scenario["skipRebootOn"]:
+                api.pressButtons(['OK', 'MENU'], 10)
+            else:
+                self.recorder.capture("currentScreen.png")
+                self.metrics.bootDuration(self.bootDetector.powerCycle(timeout=BOOT_TIMEOUT))
+                if scenario["stuckKeys"]:
+                    api.pressButtons(*scenario["stuckKeys"])
+            setStepStatus(api.TM.FAIL)
+            return
+
+        if ackCursor is not None:
+            tag, search, timeout = scenario["recoveryLogWait"]
+            ackCursor.waitFor(tag=tag, search=search, timeout=timeout)
+            self.printLogs(scenario, [(tag, search)])
+        self.printLogs(scenario, scenario["recoveryLogs"])
+        api.writeDebugLine("Successfully recover from the error state")
+        setStepStatus(api.TM.PASS)
+
+    def validateLiveScreen(self, scenario, iteration):
+        self.defineStep(scenario, iteration, "Validate the current screen",
+                        "Linear channel playing and motion shall be detected continuously for {} Seconds".format(
+                            self.motionTime))
+
+        if scenario["verifySettings"] and self.verifySettings:
+            self.verifyAddress()
+
+        if scenario["liveKeys"]:
+            api.pressButtons(*scenario["liveKeys"])
+
+        checkForReady = False
+        screenStatus = self.screens.identifyScreen()
+        if screenStatus[1] == "LiveScreen":
+            checkForReady = True
+        elif screenStatus[1] == "parentalPIN":
+            checkForReady = self.tv.verifyAndEnterParentalPin()[0]
+            if not checkForReady:
+                self.recorder.capture("parentalPIN.png")
+        elif screenStatus[1] in ["premiumChannel", "technicalErrorPage", "generalLinearStreamingError"]:
+            self.recorder.capture("{}.png".format(screenStatus[1]))
+        else:
+            self.recorder.capture("Failure_Exception.png")
+            api.pressButtons(['BACK', 'BACK', 'BACK'], 2)
+
+        if not checkForReady:
+            self.recorder.capture("Failure_Exception.png")
+            setStepStatus(api.TM.FAIL, "Unexpected Screen")
+            return
+
+        motionDetected, motionStatusList, successRate = self.motion.detectMotionContinuously(self.motionTime)
+        api.writeDebugLine("DetectMotion:: " + str(motionDetected))
+        if motionDetected:
+            api.writeDebugLine("Motion Detected, success rate: {}".format(successRate))
+            setStepStatus(api.TM.PASS)
+        else:
+            api.writeDebugLine("Motion Not Detected, success rate: {}".format(successRate))
+            self.recorder.capture("MotionDetection_Failure.png")
+            setStepStatus(api.TM.FAIL, "Motion detection failed. SuccessRate was {}".format(successRate))
+
+    def verifyAddress(self):
+        """ IP of the DUT over adb against slotInfo, the settings screen only for ocrAudit or without adb """
+        addressCheck = checkDeviceAddress(self.deviceIP)
+        api.writeDebugLine(describeAddressCheck(addressCheck))
+        if not self.ocrAudit and addressCheck.actual is not None:
+            return
+        self.nav.resetLastNavScreen()
+        self.nav.navigateTo("OpenSystemSetting")
+        api.waitSec(5)
+        api.pressButtons(["OK", "OK", "DOWN", "DOWN", "DOWN", "DOWN"], 5)
+        ocrTexts = self.ocr.read([ETHERNET_IP_REGION])
+        api.writeDebugLine("Actual IP (settings): {}".format(ocrTexts["ethernetIP"]))
+
+    def printLogs(self, scenario, checks):
+        if not checks or (scenario["debugLogs"] and not self.debugApk):
+            return
+        if len(checks) == 1:
+            self.logcat.printGenericLogs(tag=checks[0][0], search=checks[0][1])
+        else:
+            self.logcat.printGenericLogsMulti(checks)
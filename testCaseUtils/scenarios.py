@@ -0,0 +1,404 @@
+"""
+Description:
+Scenario table of the 41.x/42.x/43.x impairment test cases for the ScenarioEngine. Every row holds only what differs
+between the test case scripts, the flow itself is the 8 step structure from the README.
+
+trigger:         how the iteration starts
+                 "bootUp"       fresh boot up from the powerless state (reboot parameter), then switch the impairment on
+                 "swdl"         same as bootUp, the software download check runs during the boot
+                 "LTV"          linear channel is playing (MENU, 5 and motion check), then switch the impairment on
+                 "settingsMenu" as LTV, the launcher goes to the system settings (verifySettings) or to standby and
+                                back before the impairment is switched on and comes back to foreground with MENU
+                 "powerOff"     power off (no video), switch the impairment on, power on
+                 "reboot"       as LTV with a reboot before (reboot parameter)
+impairment/drop/delay: arguments of KImpairment.switchImpairment_ON
+dnsHosts:        hostnames (fnmatch patterns) the DNS impairment applies to when the DNS stand-in is used, None for the
+                 hosts of the dnsStandIn parameter (all names by default)
+profile:         impairment profile (testCaseUtils.impairmentProfile steps or a parseProfile string) played instead of
+                 the fixed drop/delay, e.g. "ramp:delay:0:20:60+off:90"
+expectedError:   error code expected on the screen
+errorTimeout:    ceiling for the error screen after the impairment is switched on
+errorWait:       "event" returns as soon as the error screen is detected, "fixed" always waits errorTimeout
+errorKeys:       (buttons, gap) pressed before the error screen is checked
+errorLogs:       (tag, search) ADB checks printed when the error is expected
+requestLogs:     (tag, search, count, firstTimeout, timeout) ADB lines awaited one by one after the impairment is on
+dhcpRetries:     (message, minRetries, maxRetries, firstTimeout, timeout) DHCP retransmissions awaited after the
+                 impairment is on, done after minRetries unanswered ones (testCaseUtils.dhcpTimeline); the unused part
+                 of the budget is added to errorTimeout
+recoveryTimeout: ceiling for the error screen to go away after the impairment is switched off
+recoveryWait:    "event" or "fixed" as errorWait
+recoveryKeys:    (buttons, gap) pressed after the recovery wait
+recoveryLogs:    (tag, search) ADB checks printed after the recovery check
+recoveryLogWait: (tag, search, timeout) ADB line awaited after a successful recovery
+debugLogs:       ADB checks are only printed with debugApk (needs the debug launcher APK)
+stuckKeys:       (buttons, gap) pressed after the recovery reboot when the DUT was stuck in the error state
+skipRebootOn:    error code that is left with OK/MENU instead of a reboot when the DUT is stuck in it
+liveKeys:        (buttons, gap) pressed before the final live screen check
+verifySettings:  check the IP of the DUT over adb (verifySettings parameter), ocrAudit reads the system settings
+summary:         debug line of the teardown step
+"""
+
+DEFAULTS = {
+    "drop": None,
+    "delay": None,
+    "profile": None,
+    "dnsHosts": None,
+    "errorWait": "event",
+    "errorKeys": None,
+    "errorLogs": [],
+    "requestLogs": None,
+    "dhcpRetries": None,
+    "recoveryWait": "event",
+    "recoveryKeys": None,
+    "recoveryLogs": [],
+    "recoveryLogWait": None,
+    "debugLogs": False,
+    "stuckKeys": None,
+    "skipRebootOn": None,
+    "liveKeys": None,
+    "verifySettings": False
+}
+
+APP_CONNECTIVITY_LOGS = [("VeopApp:E", "www.google.com")]
+GLOBAL_CONNECTION_LOGS = [("chromium:I", "Global connection")]
+NETWORK_STATE_LOGS = [("VeopApp:D", "mNetworkStateListener"), ("VeopApp:I", "notifyNetworkStatusListeners")]
+SESSION_GUARD_LOGS = [("VeopApp:D", "connect: failed to connect")]
+
+SCENARIOS = [
+    {
+        "id": "41.1",
+        "name": "Platform-DHCP Discover packet drop",
+        "trigger": "powerOff",
+        "impairment": "DHCP", "drop": 100,
+        "expectedError": "0100",
+        "errorTimeout": 120,
+        "recoveryTimeout": 180,
+        "recoveryLogWait": ("DhcpClient:D", "ACK", 270),
+        "stuckKeys": (["5"], 10),
+        "liveKeys": (["MENU", "5"], 10),
+        "verifySettings": True,
+        "summary": "DHCP Discover packet dropped and recover passed"
+    },
+    {
+        "id": "41.2",
+        "name": "Platform-DHCP Discover Packet delay",
+        "trigger": "bootUp",
+        "impairment": "DHCP", "drop": 0, "delay": 20,
+        "expectedError": "0100",
+        "errorTimeout": 105,
+        "recoveryTimeout": 180,
+        "recoveryLogWait": ("DhcpClient:D", "ACK", 300),
+        "stuckKeys": (["5"], 5),
+        "liveKeys": (["MENU", "5"], 10),
+        "verifySettings": True,
+        "summary": "DHCP Discover packet delayed and recover passed"
+    },
+    {
+        "id": "41.3",
+        "name": "Platform-DHCP renewal IP ACK drop",
+        "trigger": "reboot",
+        "impairment": "DHCP", "drop": 100,
+        "expectedError": "0100",
+        "dhcpRetries": ("REQUEST", 3, 5, 265, 45),
+        "errorTimeout": 60,
+        "recoveryTimeout": 180,
+        "stuckKeys": (["5"], 10),
+        "liveKeys": (["MENU", "5"], 10),
+        "summary": "DHCP Discover packet dropped and recover passed"
+    },
+    {
+        "id": "42.1",
+        "name": "Android- Default Gateway packet drop",
+        "trigger": "bootUp",
+        "impairment": "Gateway", "drop": 100,
+        "expectedError": "0101",
+        "errorTimeout": 280,
+        "recoveryTimeout": 90,
+        "summary": "Default Gateway packet dropped and recover passed"
+    },
+    {
+        "id": "42.2",
+        "name": "Android- DNS response drop(bootUp)",
+        "trigger": "bootUp",
+        "impairment": "DNS", "drop": 100,
+        "expectedError": "0102",
+        "errorTimeout": 270,
+        "errorLogs": [("chromium:E", "Connectivity check"), ("VeopApp:E", "www.google.com"),
+                      ("VeopApp:E", "Unable to resolve host")],
+        "recoveryTimeout": 30,
+        "recoveryLogs": GLOBAL_CONNECTION_LOGS,
+        "skipRebootOn": "Code-0204",
+        "summary": "DNS response dropped and recover passed"
+    },
+    {
+        "id": "42.3",
+        "name": "Android- DNS response delay (bootUp)",
+        "trigger": "bootUp",
+        "impairment": "DNS", "delay": 15,
+        "expectedError": "0102",
+        "errorTimeout": 250,
+        "errorLogs": [("chromium:E", "Connectivity check"), ("VeopApp:E", "www.google.com"),
+                      ("VeopApp:E", "Unable to resolve host")],
+        "recoveryTimeout": 30,
+        "recoveryLogs": GLOBAL_CONNECTION_LOGS,
+        "skipRebootOn": "Code-0204",
+        "summary": "DNS response dropped and recover passed"
+    },
+    {
+        "id": "42.4",
+        "name": "Android- Connectivity drop (bootUp)",
+        "trigger": "bootUp",
+        "impairment": "AndroidConnectivity", "drop": 100,
+        "expectedError": "0102",
+        "errorTimeout": 150,
+        "errorLogs": [("chromium:E", "time out"),
+                      ("NetworkMonitor/NetworkAgentInfo [Ethernet () - 100]:D", "https://www.google.com/generate_204")],
+        "recoveryTimeout": 35,
+        "recoveryLogs": GLOBAL_CONNECTION_LOGS,
+        "summary": "Android connectivity packet dropped and recover passed"
+    },
+    {
+        "id": "42.5",
+        "name": "Android Connectivity delay(bootUp)",
+        "trigger": "bootUp",
+        "impairment": "AndroidConnectivity", "delay": 5,
+        "expectedError": "0102",
+        "errorTimeout": 150,
+        "errorLogs": [("chromium:E", "time out"),
+                      ("NetworkMonitor/NetworkAgentInfo [Ethernet () - 100]:D", "https://www.google.com/generate_204")],
+        "recoveryTimeout": 35,
+        "recoveryLogs": GLOBAL_CONNECTION_LOGS,
+        "summary": "Android connectivity packet delayed and recover passed"
+    },
+    {
+        "id": "42.6",
+        "name": "Android-Connectivity drop (LTV)",
+        "trigger": "LTV",
+        "impairment": "AndroidConnectivity", "drop": 100,
+        "expectedError": "0102",
+        "errorTimeout": 75,
+        "errorLogs": NETWORK_STATE_LOGS,
+        "recoveryTimeout": 30,
+        "recoveryLogs": NETWORK_STATE_LOGS,
+        "debugLogs": True,
+        "summary": "Android connectivity packet dropped and recover passed"
+    },
+    {
+        "id": "42.7",
+        "name": "Android connectivity delay(LTV)",
+        "trigger": "LTV",
+        "impairment": "AndroidConnectivity", "delay": 6,
+        "expectedError": "0102",
+        "errorTimeout": 75,
+        "errorLogs": NETWORK_STATE_LOGS,
+        "recoveryTimeout": 30,
+        "recoveryLogs": NETWORK_STATE_LOGS,
+        "debugLogs": True,
+        "summary": "Android connectivity packet delayed and recover passed"
+    },
+    {
+        "id": "43.1",
+        "name": "App-Connectivity drop(bootUp)",
+        "trigger": "bootUp",
+        "impairment": "ApplicationConnectivity", "drop": 100,
+        "expectedError": "0102",
+        "errorTimeout": 130,
+        "errorLogs": APP_CONNECTIVITY_LOGS,
+        "recoveryTimeout": 40,
+        "recoveryLogs": GLOBAL_CONNECTION_LOGS,
+        "debugLogs": True,
+        "summary": "Application connectivity packet dropped and recover passed"
+    },
+    {
+        "id": "43.2",
+        "name": "App-Connectivity delay(bootUp)",
+        "trigger": "bootUp",
+        "impairment": "ApplicationConnectivity", "delay": 6,
+        "expectedError": "0102",
+        "errorTimeout": 135,
+        "errorLogs": APP_CONNECTIVITY_LOGS + GLOBAL_CONNECTION_LOGS,
+        "recoveryTimeout": 40,
+        "recoveryLogs": GLOBAL_CONNECTION_LOGS,
+        "debugLogs": True,
+        "summary": "Application connectivity packet delayed and recover passed"
+    },
+    {
+        "id": "43.3",
+        "name": "App-Connectivity drop(LTV)",
+        "trigger": "LTV",
+        "impairment": "ApplicationConnectivity", "drop": 100,
+        "expectedError": "0102",
+        "errorTimeout": 90,
+        "errorLogs": APP_CONNECTIVITY_LOGS,
+        "recoveryTimeout": 30,
+        "recoveryLogs": GLOBAL_CONNECTION_LOGS,
+        "debugLogs": True,
+        "summary": "Application connectivity packet dropped and recover passed"
+    },
+    {
+        "id": "43.4",
+        "name": "App-Connectivity delay(LTV)",
+        "trigger": "LTV",
+        "impairment": "ApplicationConnectivity", "delay": 6,
+        "expectedError": "0102",
+        "errorTimeout": 90,
+        "errorLogs": APP_CONNECTIVITY_LOGS,
+        "recoveryTimeout": 30,
+        "recoveryLogs": GLOBAL_CONNECTION_LOGS,
+        "debugLogs": True,
+        "summary": "Application connectivity packet delayed and recover passed"
+    },
+    {
+        "id": "43.5",
+        "name": "App-CSDS connectivity drop(bootUp)",
+        "trigger": "bootUp",
+        "impairment": "CSDS", "drop": 100,
+        "expectedError": "0204",
+        "errorTimeout": 150,
+        "errorLogs": [("VeopApp:D", "onBootflowFailed")],
+        "recoveryTimeout": 10, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "MENU"], 10),
+        "debugLogs": True,
+        "summary": "Vodafone Launcher Service discovery connectivity dropped and recover passed"
+    },
+    {
+        "id": "43.6",
+        "name": "App-CSDS connectivity delay(bootUp)",
+        "trigger": "bootUp",
+        "impairment": "CSDS", "delay": 6,
+        "expectedError": "0204",
+        "errorTimeout": 180,
+        "errorLogs": [("VeopApp:D", "onBootflowFailed")],
+        "recoveryTimeout": 10, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "MENU"], 10),
+        "debugLogs": True,
+        "summary": "Vodafone Launcher CSDS connectivity delayed and recover passed"
+    },
+    {
+        "id": "43.7",
+        "name": "App-SG connectivity drop (bootUp)",
+        "trigger": "bootUp",
+        "impairment": "SG", "drop": 100,
+        "expectedError": "0500",
+        "errorTimeout": 240,
+        "errorLogs": SESSION_GUARD_LOGS,
+        "recoveryTimeout": 30, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "MENU"], 10),
+        "debugLogs": True,
+        "summary": "Session Guard connectivity packet dropped and recover passed"
+    },
+    {
+        "id": "43.8",
+        "name": "App-SG connectivity delay (bootUp)",
+        "trigger": "bootUp",
+        "impairment": "SG", "delay": 6,
+        "expectedError": "0500",
+        "errorTimeout": 240,
+        "errorLogs": SESSION_GUARD_LOGS,
+        "recoveryTimeout": 30, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "MENU"], 10),
+        "debugLogs": True,
+        "summary": "Session Guard connectivity packet delayed and recover passed"
+    },
+    {
+        "id": "43.9",
+        "name": "App-SG connectivity drop (settingsMenu)",
+        "trigger": "settingsMenu",
+        "impairment": "SG", "drop": 100,
+        "expectedError": "0500",
+        "errorTimeout": 300,
+        "errorLogs": SESSION_GUARD_LOGS,
+        "recoveryTimeout": 30, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "MENU"], 3),
+        "debugLogs": True,
+        "summary": "Session Guard connectivity packet dropped and recover passed"
+    },
+    {
+        "id": "43.10",
+        "name": "App-SG connectivity delay(settingsMenu)",
+        "trigger": "settingsMenu",
+        "impairment": "SG", "delay": 6,
+        "expectedError": "0500",
+        "errorTimeout": 300,
+        "errorLogs": SESSION_GUARD_LOGS,
+        "recoveryTimeout": 30, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "MENU"], 3),
+        "debugLogs": True,
+        "summary": "Session Guard connectivity packet delayed and recover passed"
+    },
+    {
+        "id": "43.11",
+        "name": "App- CDN connectivity drop (LTV)",
+        "trigger": "LTV",
+        "impairment": "CDN", "drop": 100,
+        "expectedError": "11630",
+        "errorTimeout": 100, "errorWait": "fixed",
+        "errorLogs": [("VeopApp:D", "first.mpd"), ("VeopApp:D", "Unable to connect to")],
+        "errorKeys": (["OK", "MENU"], 5),
+        "recoveryTimeout": 30, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "5"], 10),
+        "recoveryLogs": [("VeopApp:D", "first.mpd")],
+        "debugLogs": True,
+        "summary": "CDN connectivity packet dropped and recover passed"
+    },
+    {
+        "id": "43.12",
+        "name": "App-CDN connectivity delay (LTV)",
+        "trigger": "LTV",
+        "impairment": "CDN", "delay": 8,
+        "expectedError": "11630",
+        "errorTimeout": 100, "errorWait": "fixed",
+        "errorLogs": [("VeopApp:D", "Unable to connect to")],
+        "errorKeys": (["OK", "MENU"], 5),
+        "recoveryTimeout": 30, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "5"], 10),
+        "recoveryLogs": [("VeopApp:D", "first.mpd")],
+        "debugLogs": True,
+        "summary": "CDN connectivity packet delayed and recover passed"
+    },
+    {
+        "id": "43.13",
+        "name": "App-CDN Connectivity drop(swdl)",
+        "trigger": "swdl",
+        "impairment": "CDN", "drop": 100,
+        "expectedError": "0601",
+        "errorTimeout": 100,
+        "errorLogs": [("VeopApp:D", "versionCheckFailureType")],
+        "recoveryTimeout": 30, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "MENU"], 3),
+        "recoveryLogs": [("VeopApp:I", "LocalVersionInformation")],
+        "debugLogs": True,
+        "summary": "CDN connectivity packet dropped and recover passed"
+    },
+    {
+        "id": "43.14",
+        "name": "App-CDN Connectivity delay(swdl)",
+        "trigger": "swdl",
+        "impairment": "CDN", "delay": 8,
+        "expectedError": "0601",
+        "errorTimeout": 120,
+        "errorLogs": [("VeopApp:D", "versionCheckFailureType")],
+        "recoveryTimeout": 30, "recoveryWait": "fixed",
+        "recoveryKeys": (["OK", "MENU"], 3),
+        "recoveryLogs": [("VeopApp:I", "LocalVersionInformation")],
+        "debugLogs": True,
+        "summary": "CDN connectivity packet delayed and recover passed"
+    }
+]
+
+
+def getScenario(scenarioId):
+    """ Scenario row with the defaults filled in """
+    for row in SCENARIOS:
+        if row["id"] == scenarioId:
+            scenario = dict(DEFAULTS)
+            scenario.update(row)
+            return scenario
+    raise KeyError("Unknown scenario {}".format(scenarioId))
+
+
+def selectScenarios(selection="all"):
+    """ Scenarios for a comma separated list of ids ("41.1,43.10") or "all", in table order """
+    if not selection or selection == "all":
+        return [getScenario(row["id"]) for row in SCENARIOS]
+    return [getScenario(scenarioId.strip()) for scenarioId in selection.split(",") if scenarioId.strip()]
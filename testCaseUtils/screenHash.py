@@ -0,0 +1,95 @@
+"""
+Description:
+Perceptual hashes of screen captures. A difference hash (dHash) compares the brightness of neighbouring cells of a
+downscaled grayscale frame, screens that look the same get hashes with a small Hamming distance even when the
+capture is noisy. Hashes are plain ints so they can be stored in JSON.
+
+HashIndex finds the known hashes within a Hamming distance without comparing against all of them (multi-index
+hashing): the hash is split into chunks and every chunk has its own lookup table. Two hashes within maxDistance
+share at least one chunk within maxDistance // chunks bits, so only the entries found through those table probes
+are compared.
+
+Usage:
+frame = captureGrayFrame()
+screenHash = dHash(frame)
+index = HashIndex()
+index.add(screenHash, "parentalPIN")
+index.nearest(dHash(captureGrayFrame()), maxDistance=7)   # (distance, "parentalPIN") or None
+"""
+import itertools
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = None
+    Image = None
+
+DEFAULT_HASH_SIZE = 8
+
+
+def available():
+    return np is not None
+
+
+def dHash(frame, hashSize=DEFAULT_HASH_SIZE):
+    """ hashSize * hashSize bit difference hash of a grayscale uint8 frame """
+    cells = Image.fromarray(frame).resize((hashSize + 1, hashSize), Image.BILINEAR)
+    pixels = np.asarray(cells, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hammingDistance(first, second):
+    return bin(first ^ second).count("1")
+
+
+class HashIndex(object):
+
+    def __init__(self, bits=DEFAULT_HASH_SIZE * DEFAULT_HASH_SIZE, chunks=4):
+        self.chunkBits = bits // chunks
+        self.chunkMask = (1 << self.chunkBits) - 1
+        self.tables = [{} for _ in range(chunks)]
+        # (hash, label)
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, hashValue, label):
+        entryId = len(self.entries)
+        self.entries.append((hashValue, label))
+        for table, chunk in zip(self.tables, self._chunks(hashValue)):
+            table.setdefault(chunk, []).append(entryId)
+
+    def search(self, hashValue, maxDistance):
+        """ (distance, label) of the entries within maxDistance, closest first """
+        radius = maxDistance // len(self.tables)
+        candidates = set()
+        for table, chunk in zip(self.tables, self._chunks(hashValue)):
+            for probe in self._neighbours(chunk, radius):
+                candidates.update(table.get(probe, ()))
+        results = []
+        for entryId in candidates:
+            knownHash, label = self.entries[entryId]
+            distance = hammingDistance(hashValue, knownHash)
+            if distance <= maxDistance:
+                results.append((distance, label))
+        return sorted(results, key=lambda result: result[0])
+
+    def nearest(self, hashValue, maxDistance):
+        """ (distance, label) of the closest entry within maxDistance, None if there is none """
+        results = self.search(hashValue, maxDistance)
+        return results[0] if results else None
+
+    def _chunks(self, hashValue):
+        return [(hashValue >> (index * self.chunkBits)) & self.chunkMask for index in range(len(self.tables))]
+
+    def _neighbours(self, chunk, radius):
+        """ chunk and every value within radius bits of it """
+        for flips in range(radius + 1):
+            for bits in itertools.combinations(range(self.chunkBits), flips):
+                probe = chunk
+                for bit in bits:
+                    probe ^= 1 << bit
+                yield probe
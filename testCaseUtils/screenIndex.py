@@ -0,0 +1,123 @@
+"""
+Description:
+Perceptual hash lookup in front of tv.identifyScreen() and tv.checkUnExpectedScreen(). The current frame is hashed
+(64 bit dHash) and looked up in an index of reference screens; a hit within MATCH_DISTANCE returns the stored result
+straight away, only unknown screens go to the full SDO match of LinearTV.
+
+Only static screens are indexed (parental PIN, premium channel, error pages, ...). The live screen and 'Motion' are
+moving video whose hash says nothing about the screen, they always take the full match:
+- after a full match found moving video the next call goes straight to the full match, without capturing a frame to
+  hash, until the full match finds a static screen again
+- an index hit is only returned when a second frame STATIC_INTERVAL later has the same hash, so a live frame that
+  happens to be close to a static screen does not pass
+
+The reference screens are learned from the full match results and kept in results/screenIndex/screens.json, shared by
+all slots and runs. Without numpy/Pillow every call goes to LinearTV.
+
+Usage:
+screens = ScreenIdentifier(tv)
+screenStatus = screens.identifyScreen()
+result = screens.checkUnExpectedScreen()
+"""
+import json
+import os
+import time
+
+from framework import api
+
+from testCaseUtils import screenHash
+from testCaseUtils.jsonStore import loadJson, saveMerged
+from testCaseUtils.motionEngine import captureGrayFrame
+from testCaseUtils.screenHash import dHash, hammingDistance, HashIndex
+
+DEFAULT_INDEX_PATH = os.path.join("results", "screenIndex", "screens.json")
+MATCH_DISTANCE = 7
+STATIC_DISTANCE = 2
+STATIC_INTERVAL = 0.3
+# results of moving video, never indexed
+DYNAMIC_SCREENS = ("LiveScreen", "Motion")
+
+
+class ScreenIdentifier(object):
+
+    def __init__(self, tv, indexPath=DEFAULT_INDEX_PATH):
+        self.tv = tv
+        self.indexPath = indexPath
+        self.fullMatches = 0
+        self.indexHits = 0
+        # method name -> True while the last full match found moving video
+        self.moving = {}
+        # method name -> list of [hash, result], as stored in indexPath
+        self.referenceScreens = loadJson(self.indexPath, "screen index")
+        self.indexes = {}
+        for method, references in self.referenceScreens.items():
+            for knownHash, result in references:
+                self._index(method).add(knownHash, tuple(result))
+
+    def identifyScreen(self):
+        """ Result of tv.identifyScreen(), e.g. (True, 'parentalPIN') """
+        return self._identify("identifyScreen", self.tv.identifyScreen)
+
+    def checkUnExpectedScreen(self):
+        """ Result of tv.checkUnExpectedScreen(), e.g. (True, 'Motion') """
+        return self._identify("checkUnExpectedScreen", self.tv.checkUnExpectedScreen)
+
+    def _identify(self, method, fullMatch):
+        currentHash = None if self.moving.get(method) else self._hash()
+        if currentHash is not None:
+            hit = self._index(method).nearest(currentHash, MATCH_DISTANCE)
+            if hit is not None and self._static(currentHash):
+                self.indexHits += 1
+                api.writeDebugLine("{}: {} from the screen index (distance {})".format(method, hit[1], hit[0]))
+                return hit[1]
+
+        self.fullMatches += 1
+        result = fullMatch()
+        self.moving[method] = isinstance(result, (list, tuple)) and len(result) >= 2 and result[1] in DYNAMIC_SCREENS
+        if currentHash is not None and self._indexable(result):
+            self._learn(method, currentHash, result)
+        return result
+
+    def _static(self, currentHash):
+        """ True if the frame STATIC_INTERVAL later has the same hash (no moving video) """
+        time.sleep(STATIC_INTERVAL)
+        laterHash = self._hash()
+        return laterHash is not None and hammingDistance(currentHash, laterHash) <= STATIC_DISTANCE
+
+    def _index(self, method):
+        if method not in self.indexes:
+            self.indexes[method] = HashIndex()
+        return self.indexes[method]
+
+    def _indexable(self, result):
+        if not isinstance(result, (list, tuple)) or len(result) < 2 or result[1] in DYNAMIC_SCREENS:
+            return False
+        try:
+            json.dumps(list(result))
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    def _hash(self):
+        if not screenHash.available():
+            return None
+        try:
+            return dHash(captureGrayFrame())
+        except Exception as e:
+            api.writeDebugLine("Screen hash failed: {}".format(e))
+            return None
+
+    def _learn(self, method, currentHash, result):
+        if self._index(method).nearest(currentHash, 0) is not None:
+            return
+        self._index(method).add(currentHash, tuple(result))
+        self.referenceScreens.setdefault(method, []).append([currentHash, list(result)])
+        saveMerged(self.indexPath, self.referenceScreens, mergeReferences, "screen index", indent=2, sort_keys=True)
+
+
+def mergeReferences(referenceScreens, stored):
+    """ Add the reference screens other slots stored to referenceScreens (method -> [hash, result] list) """
+    for method, references in stored.items():
+        known = referenceScreens.setdefault(method, [])
+        known.extend(reference for reference in references if reference not in known)
+    return referenceScreens
@@ -0,0 +1,122 @@
+"""
+Description:
+Failure screenshots of a slot with a ring buffer of the recent frames. capture() takes the failure screenshot
+synchronously with api.captureImageEx() under the usual file name, so the screenshot shows the failure moment and is
+attached to the test result like before; that is the only capture the test thread waits for.
+
+A background thread keeps the frames of the last seconds in memory (one capture every interval seconds): on a failure
+a dump thread writes the frames from before and after the failure to results/screenshots/slot<slotNo>/<name>_<time>/.
+The captures of the ring and of the test thread never run at the same time. interval=None turns the ring off.
+
+Usage:
+recorder = ScreenRecorder(slotNo)
+recorder.start()
+...
+# instead of api.captureImageEx(None, "Failure_Exception.png")[0][2].Close()
+recorder.capture("Failure_Exception.png")
+...
+recorder.stop()
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+from framework import api
+
+DEFAULT_SECONDS = 30
+# seconds between the ring buffer captures, None: no ring buffer
+DEFAULT_INTERVAL = 2
+DEFAULT_POST_SECONDS = 6
+DEFAULT_SCREENSHOT_DIR = os.path.join("results", "screenshots")
+
+
+class ScreenRecorder(object):
+
+    def __init__(self, slotNo, seconds=DEFAULT_SECONDS, interval=DEFAULT_INTERVAL, postSeconds=DEFAULT_POST_SECONDS,
+                 screenshotDir=DEFAULT_SCREENSHOT_DIR):
+        """ Keeps the last seconds of frames captured every interval seconds, postSeconds are added after a failure """
+        self.slotNo = slotNo
+        self.seconds = seconds
+        self.interval = interval
+        self.postSeconds = postSeconds
+        self.outputDir = os.path.join(screenshotDir, "slot{}".format(slotNo))
+        self.framePath = os.path.join(tempfile.gettempdir(),
+                                      "screenRecorder_slot{}_{}.png".format(slotNo, os.getpid()))
+
+        # (time.time(), png bytes)
+        self.frames = deque(maxlen=max(1, int(seconds / interval)) if interval else 1)
+        self._lock = threading.Lock()
+        # one api.captureImageEx() at a time
+        self._captureLock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._dumps = []
+
+    def start(self):
+        if not self.interval or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._captureLoop, name="screenRecorder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Wait for the pending dumps (they still collect their frames after the failure), then stop capturing """
+        for dump in self._dumps:
+            dump.join()
+        self._dumps = []
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if os.path.exists(self.framePath):
+            os.remove(self.framePath)
+
+    def isAlive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def capture(self, fileName):
+        """
+        Failure screenshot: fileName is captured now, with the ring buffer the frames around it are written to a
+        directory in the background
+        """
+        eventAt = time.time()
+        with self._captureLock:
+            api.captureImageEx(None, fileName)[0][2].Close()
+        if not self.isAlive():
+            return
+        dump = threading.Thread(target=self._dump, args=(fileName, eventAt), name="screenRecorderDump", daemon=True)
+        dump.start()
+        self._dumps = [thread for thread in self._dumps if thread.is_alive()] + [dump]
+
+    def _captureLoop(self):
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            try:
+                with self._captureLock:
+                    api.captureImageEx(None, self.framePath)[0][2].Close()
+                with open(self.framePath, "rb") as frameFile:
+                    frame = (time.time(), frameFile.read())
+                with self._lock:
+                    self.frames.append(frame)
+            except Exception as e:
+                print("Screen recorder capture failed: {}".format(e))
+            self._stopped.wait(max(0, self.interval - (time.monotonic() - started)))
+
+    def _dump(self, fileName, eventAt):
+        # keep the capture thread filling the buffer for the frames after the failure
+        self._stopped.wait(self.postSeconds)
+        with self._lock:
+            frames = [frame for frame in self.frames if frame[0] >= eventAt - self.seconds]
+        if not frames:
+            return
+
+        name = os.path.splitext(os.path.basename(fileName))[0]
+        sequenceDir = os.path.join(self.outputDir, "{}_{}".format(name, time.strftime("%Y%m%d-%H%M%S",
+                                                                                       time.localtime(eventAt))))
+        os.makedirs(sequenceDir, exist_ok=True)
+        for index, (frameAt, data) in enumerate(frames):
+            framePath = os.path.join(sequenceDir, "{:03d}_{:+.1f}s.png".format(index, frameAt - eventAt))
+            with open(framePath, "wb") as frameFile:
+                frameFile.write(data)
+        print("Saved {} frames around {} to {}".format(len(frames), fileName, sequenceDir))
@@ -0,0 +1,125 @@
+"""
+Description:
+Runs the impairment test case scripts in parallel, one worker per slot. Every worker takes the next scenario from a
+shared queue and starts it as its own process with --server/--slot, so a slot that finishes early picks up more work.
+"""
+import glob
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+
+SCENARIO_PATTERN = re.compile(r"^(4[123]\.\d+)\s")
+
+
+def scenarioId(scriptPath):
+    """ '43.10 App-SG connectivity delay(settingsMenu).py' -> '43.10' """
+    match = SCENARIO_PATTERN.match(os.path.basename(scriptPath))
+    return match.group(1) if match else None
+
+
+def _sortKey(scriptPath):
+    major, minor = scenarioId(scriptPath).split(".")
+    return int(major), int(minor)
+
+
+def discoverScenarios(directory, scenarioIds=None):
+    """ Test case scripts in directory ordered by their number, optionally restricted to scenarioIds """
+    scripts = [path for path in glob.glob(os.path.join(directory, "4*.py")) if scenarioId(path)]
+    if scenarioIds:
+        scripts = [path for path in scripts if scenarioId(path) in scenarioIds]
+    return sorted(scripts, key=_sortKey)
+
+
+def freeSlots(slotInfo, server, slots=None, exclude=None):
+    """ Slot numbers of server from slotInfo, optionally restricted to slots and without exclude """
+    available = sorted(int(slotNo) for slotNo in slotInfo[server])
+    if slots:
+        available = [slotNo for slotNo in available if slotNo in slots]
+    if exclude:
+        available = [slotNo for slotNo in available if slotNo not in exclude]
+    return available
+
+
+class SlotRunner(object):
+
+    def __init__(self, server, slots, scripts, extraArgs=None, logDir="results", progressInterval=60):
+        self.server = server
+        self.slots = slots
+        self.scripts = scripts
+        self.extraArgs = extraArgs or []
+        self.logDir = logDir
+        self.progressInterval = progressInterval
+
+        self.results = []
+        self.running = {}
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._startTime = None
+
+    def run(self):
+        """ Run all scripts on all slots and return a list of (scenarioId, slotNo, passed, duration) """
+        for script in self.scripts:
+            self._pending.put(script)
+
+        self._startTime = time.monotonic()
+        workers = [threading.Thread(target=self._worker, args=(slotNo,), name="slot{}".format(slotNo))
+                   for slotNo in self.slots]
+        progress = threading.Thread(target=self._progressLoop, name="progress")
+        progress.daemon = True
+        for worker in workers:
+            worker.start()
+        progress.start()
+        for worker in workers:
+            worker.join()
+        self._done.set()
+        return self.results
+
+    def command(self, script, slotNo):
+        return [sys.executable, os.path.abspath(script), "--server", self.server, "--slot", str(slotNo)] + self.extraArgs
+
+    def _worker(self, slotNo):
+        while True:
+            try:
+                script = self._pending.get_nowait()
+            except queue.Empty:
+                return
+
+            scenario = scenarioId(script)
+            with self._lock:
+                self.running[slotNo] = scenario
+            self.printProgress()
+
+            logPath = os.path.join(self.logDir, "slot{}".format(slotNo), "{}.log".format(scenario))
+            if not os.path.isdir(os.path.dirname(logPath)):
+                os.makedirs(os.path.dirname(logPath))
+
+            start = time.monotonic()
+            with open(logPath, "w") as logFile:
+                returnCode = subprocess.call(self.command(script, slotNo), stdout=logFile, stderr=subprocess.STDOUT,
+                                             cwd=os.path.dirname(os.path.abspath(script)))
+            duration = time.monotonic() - start
+
+            with self._lock:
+                del self.running[slotNo]
+                self.results.append((scenario, slotNo, returnCode == 0, duration))
+            print("{} on slot {} {} in {:.0f} Seconds, log: {}".format(
+                scenario, slotNo, "PASSED" if returnCode == 0 else "FAILED", duration, logPath))
+            self.printProgress()
+
+    def _progressLoop(self):
+        while not self._done.wait(self.progressInterval):
+            self.printProgress()
+
+    def printProgress(self):
+        with self._lock:
+            finished = len(self.results)
+            passed = len([result for result in self.results if result[2]])
+            running = ", ".join("slot{}={}".format(slotNo, scenario) for slotNo, scenario in sorted(self.running.items()))
+        print("[{}/{}] passed: {} failed: {} elapsed: {:.0f} Seconds running: {}".format(
+            finished, len(self.scripts), passed, finished - passed, time.monotonic() - self._startTime,
+            running or "-"))
@@ -0,0 +1,98 @@
+"""
+Description:
+Event driven waits for the impairment test cases. waitUntil() polls a condition and returns as soon as it holds,
+the timeout is the hard ceiling that used to be passed to api.waitSec().
+
+Usage:
+result = waitUntil(errorCodeShown(errorCheck), timeout=120)
+if result.status:
+    api.writeDebugLine("Error screen after {:.1f} Seconds".format(result.elapsed))
+"""
+import time
+from collections import namedtuple
+
+# status: condition held before the timeout, value: last value returned by the condition,
+# elapsed: seconds from the start of the wait until the condition was first seen holding,
+# detectedAt: time.monotonic() of that observation, lastMissAt: time.monotonic() of the poll before it
+WaitResult = namedtuple("WaitResult", ["status", "value", "elapsed", "detectedAt", "lastMissAt"])
+
+DEFAULT_INTERVAL = 1
+
+
+def waitUntil(condition, timeout, interval=DEFAULT_INTERVAL, stableFor=0, description=None):
+    """
+    Poll condition() until it holds or timeout seconds have passed.
+
+    condition returns either a bool or a framework style result (tuple/list/dict) whose first element tells whether
+    it holds. With stableFor the condition has to keep holding for that many seconds, so a transient screen
+    (e.g. black frames while the launcher restarts) is not taken as the final state.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    lastMissAt = start
+    holdingSince = None
+    value = None
+    while True:
+        value = condition()
+        now = time.monotonic()
+        if _holds(value):
+            if holdingSince is None:
+                holdingSince = now
+            if now - holdingSince >= stableFor:
+                if description:
+                    print("{} after {:.1f} Seconds".format(description, holdingSince - start))
+                return WaitResult(True, value, holdingSince - start, holdingSince, lastMissAt)
+        else:
+            holdingSince = None
+            lastMissAt = now
+        if now >= deadline:
+            break
+        time.sleep(max(0, min(interval, deadline - now)))
+
+    if description:
+        print("{} not seen within {} Seconds".format(description, timeout))
+    return WaitResult(False, value, time.monotonic() - start, None, lastMissAt)
+
+
+def _holds(value):
+    if isinstance(value, dict):
+        return bool(value.get("VerifyStatus"))
+    if isinstance(value, (list, tuple)):
+        return bool(value) and bool(value[0])
+    return bool(value)
+
+
+# ============
+# Conditions
+# ============
+
+def errorCodeShown(errorCheck, expectedCode=None):
+    """ Error screen is on the DUT, optionally with the given code (e.g. 'Code-0100') """
+    def condition():
+        errorResult = errorCheck.getErrorCode()
+        if expectedCode is None or not errorResult[0]:
+            return errorResult
+        return errorResult[1] == expectedCode, errorResult[1]
+    return condition
+
+
+def errorCodeCleared(errorCheck):
+    """ No error screen is detected on the DUT any more """
+    def condition():
+        errorResult = errorCheck.getErrorCode()
+        return not errorResult[0], errorResult
+    return condition
+
+
+def motionResumed(tv):
+    """ Video is playing again """
+    def condition():
+        return tv.isMotion()
+    return condition
+
+
+def logcatMatches(cursor, tag, search):
+    """ A line for tag containing search arrived on the LogcatCursor since the last poll """
+    def condition():
+        return bool(cursor.search(tag=tag, search=search))
+    return condition
@@ -0,0 +1,12 @@
+"""
+Description:
+The tests import testCaseUtils from the repository root, without the StormTest framework. Only the pure logic
+modules are tested here, the test case scripts need a slot.
+
+Usage:
+python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,81 @@
+import json
+import math
+import random
+
+from testCaseUtils.adaptiveTimeouts import MAX_SAMPLES, MIN_SAMPLES, percentile, TimeoutHistory
+
+
+def referencePercentile(values, percent):
+    """ Nearest rank: the smallest value with at least percent % of the values at or below it """
+    ordered = sorted(values)
+    for value in ordered:
+        if sum(1 for other in ordered if other <= value) * 100.0 >= percent * len(ordered):
+            return value
+    return ordered[-1]
+
+
+def writeRecords(path, records):
+    with open(path, "w") as metricsFile:
+        for index, (firmware, metrics) in enumerate(records):
+            metricsFile.write(json.dumps({"firmware": firmware, "startedAt": "2026-10-18T10:{:02d}:00".format(index),
+                                          "metrics": metrics}) + "\n")
+
+
+def seconds(value):
+    return {"timeToError": {"seconds": value}}
+
+
+def testPercentile():
+    assert percentile([5], 95) == 5
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+    generator = random.Random(11)
+    for _ in range(300):
+        values = [generator.randint(0, 50) for _ in range(generator.randint(1, 30))]
+        percent = generator.choice([1, 25, 50, 90, 95, 99, 100])
+        assert percentile(values, percent) == referencePercentile(values, percent)
+
+
+def testTimeout(tmp_path):
+    writeRecords(str(tmp_path / "9.9_slot1.jsonl"), [("fw1", seconds(20))] * MIN_SAMPLES)
+    writeRecords(str(tmp_path / "9.9_slot2.jsonl"), [("fw2", seconds(20))] * (MIN_SAMPLES - 1))
+    assert TimeoutHistory("9.9", "fw1", str(tmp_path)).timeout("timeToError", 120) == 25
+    assert TimeoutHistory("9.9", "fw1", str(tmp_path)).timeout("timeToError", 120, pad=10) == 35
+    assert TimeoutHistory("9.9", "fw1", str(tmp_path)).timeout("timeToError", 22) == 22
+    # too few samples on this firmware
+    assert TimeoutHistory("9.9", "fw2", str(tmp_path)).timeout("timeToError", 120) == 120
+
+
+def testTimedOutIterations(tmp_path):
+    records = [("fw1", seconds(20))] * MIN_SAMPLES + [("fw1", {"timeToError": {"timedOutAfter": 120}})] * 2
+    writeRecords(str(tmp_path / "9.9_slot1.jsonl"), records)
+    history = TimeoutHistory("9.9", "fw1", str(tmp_path))
+    assert math.isinf(history.latencies("timeToError")[-1])
+    assert history.timeout("timeToError", 120) == 120
+
+
+def testLatestSamplesOnly(tmp_path):
+    records = [("fw1", seconds(100))] * 10 + [("fw1", seconds(10))] * MAX_SAMPLES
+    writeRecords(str(tmp_path / "9.9_slot1.jsonl"), records)
+    assert TimeoutHistory("9.9", "fw1", str(tmp_path)).latencies("timeToError") == [10] * MAX_SAMPLES
+
+
+def testRegressions(tmp_path):
+    writeRecords(str(tmp_path / "9.9_slot1.jsonl"), [("old", seconds(10))] * MIN_SAMPLES +
+                 [("new", seconds(20))] * MIN_SAMPLES + [("same", seconds(11))] * MIN_SAMPLES)
+    messages = TimeoutHistory("9.9", "new", str(tmp_path)).regressions()
+    assert len(messages) == 1 and "median 20.0s" in messages[0]
+    assert TimeoutHistory("9.9", "old", str(tmp_path)).regressions() == []
+    # not enough samples for timeToRecovery
+    assert all("timeToRecovery" not in message for message in messages)
+
+
+def testUnknownFirmwareIsIgnored(tmp_path):
+    # records of runs where adb did not answer the firmware version
+    writeRecords(str(tmp_path / "9.9_slot1.jsonl"), [(None, seconds(5))] * MIN_SAMPLES +
+                 [("new", seconds(20))] * MIN_SAMPLES)
+    assert TimeoutHistory("9.9", "new", str(tmp_path)).regressions() == []
+    unknown = TimeoutHistory("9.9", None, str(tmp_path))
+    assert unknown.latencies("timeToError") == []
+    assert unknown.timeout("timeToError", 120) == 120
+    assert unknown.regressions() == []
@@ -0,0 +1,120 @@
+import random
+import time
+
+from testCaseUtils.dhcpTimeline import DhcpEvent, DhcpLeaseMonitor, intervals, logSeconds, retryRuns
+from testCaseUtils.logcatStream import LogEntry
+
+SEND_LINES = {("DISCOVER", "broadcast"): "Broadcasting DHCPDISCOVER",
+              ("REQUEST", "broadcast"): "Broadcasting DHCPREQUEST ciaddr=0.0.0.0",
+              ("REQUEST", "unicast"): "Unicasting DHCPREQUEST ciaddr=10.0.0.5"}
+RECEIVE_LINES = {"OFFER": "Received packet: 02:00:00:aa:bb:01 OFFER: your new IP /10.0.0.5",
+                 "ACK": "Received packet: 02:00:00:aa:bb:01 ACK: your new IP /10.0.0.5, lease time 120",
+                 "NAK": "Received packet: 02:00:00:aa:bb:01 NAK"}
+
+
+def referenceStates(events):
+    """ RFC 2131 figure 5 client states, written out as a table of (message, delivery, bound) """
+    table = {("DISCOVER", None, False): ("SELECTING", False),
+             ("DISCOVER", None, True): ("SELECTING", False),
+             ("REQUEST", "broadcast", False): ("REQUESTING", False),
+             ("REQUEST", "broadcast", True): ("REBINDING", True),
+             ("REQUEST", "unicast", False): ("RENEWING", False),
+             ("REQUEST", "unicast", True): ("RENEWING", True),
+             ("ACK", None, False): ("BOUND", True),
+             ("ACK", None, True): ("BOUND", True),
+             ("NAK", None, False): ("INIT", False),
+             ("NAK", None, True): ("INIT", False)}
+    transitions, state, bound = [], None, False
+    for event in events:
+        delivery = event.delivery if event.message == "REQUEST" else None
+        if (event.message, delivery, bound) not in table:
+            continue
+        newState, bound = table[(event.message, delivery, bound)]
+        if newState != state:
+            transitions.append((event.at, newState))
+            state = newState
+    return transitions
+
+
+def logEntry(second, message, tag="DhcpClient"):
+    return LogEntry("10-18 10:{:02d}:{:02d}.250".format(second // 60, second % 60), "1", "2", "D", tag, message,
+                    message)
+
+
+def monitorOf(sequence):
+    monitor = DhcpLeaseMonitor(utcOffset=0)
+    for second, (message, delivery) in enumerate(sequence):
+        line = SEND_LINES[(message, delivery)] if delivery else RECEIVE_LINES[message]
+        monitor.addLogEntry(logEntry(second * 5, line))
+    return monitor
+
+
+def testLogSeconds():
+    seconds = logSeconds("10-18 10:00:05.500", utcOffset=7200)
+    local = time.gmtime(seconds + 7200)
+    assert (local.tm_mon, local.tm_mday, local.tm_hour, local.tm_min, local.tm_sec) == (10, 18, 10, 0, 5)
+    assert round(seconds % 1, 3) == 0.5
+
+
+def testParsesLogLines():
+    monitor = DhcpLeaseMonitor(utcOffset=0)
+    assert monitor.addLogEntry(logEntry(0, "Scheduling renewal in 60s")) is None
+    assert monitor.addLogEntry(logEntry(1, "Broadcasting DHCPDISCOVER", tag="Other")) is None
+    discover = monitor.addLogEntry(logEntry(2, SEND_LINES[("DISCOVER", "broadcast")]))
+    assert (discover.message, discover.delivery) == ("DISCOVER", "broadcast")
+    ack = monitor.addLogEntry(logEntry(3, RECEIVE_LINES["ACK"]))
+    assert ack.message == "ACK"
+    assert monitor.timers == {"renewal": 60, "lease": 120}
+    assert ack.at - discover.at == 1
+
+
+def testLeaseLifecycle():
+    monitor = monitorOf([("DISCOVER", "broadcast"), ("OFFER", None), ("REQUEST", "broadcast"), ("ACK", None),
+                         ("REQUEST", "unicast"), ("REQUEST", "unicast"), ("REQUEST", "broadcast"), ("NAK", None),
+                         ("DISCOVER", "broadcast")])
+    assert [state for at, state in monitor.states()] == ["SELECTING", "REQUESTING", "BOUND", "RENEWING", "REBINDING",
+                                                        "INIT", "SELECTING"]
+
+
+def testStatesMatchReference():
+    generator = random.Random(3)
+    choices = [("DISCOVER", "broadcast"), ("REQUEST", "broadcast"), ("REQUEST", "unicast"), ("OFFER", None),
+               ("ACK", None), ("NAK", None)]
+    for _ in range(200):
+        monitor = monitorOf([generator.choice(choices) for _ in range(generator.randint(0, 11))])
+        assert monitor.states() == referenceStates(monitor.events)
+
+
+def testRetryRuns():
+    events = [DhcpEvent(at, message, "broadcast", "log", "") for at, message in
+              [(0, "DISCOVER"), (4, "DISCOVER"), (12, "DISCOVER"), (13, "OFFER"), (14, "REQUEST"), (15, "ACK")]]
+    runs = retryRuns(events, "DISCOVER")
+    assert [len(run) for run in runs] == [3]
+    assert intervals(runs[0]) == [4, 8]
+    assert [len(run) for run in retryRuns(events, "REQUEST")] == [1]
+
+
+class ScriptedCursor(object):
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+
+    def waitFor(self, tag=None, search=None, timeout=None):
+        return self.entries.pop(0) if self.entries else None
+
+
+def testRetryPatternCountsRetransmissions():
+    requests = [logEntry(second * 5, SEND_LINES[("REQUEST", "broadcast")]) for second in range(6)]
+    retries = DhcpLeaseMonitor(ScriptedCursor(requests), utcOffset=0).waitForRetryPattern(
+        "REQUEST", minRetries=3, maxRetries=5, firstTimeout=5, timeout=5)
+    assert (len(retries.sends), retries.retries, retries.confirmed, retries.answered) == (4, 3, True, False)
+
+    # the first send alone is no retry
+    retries = DhcpLeaseMonitor(ScriptedCursor(requests[:1]), utcOffset=0).waitForRetryPattern(
+        "REQUEST", minRetries=1, maxRetries=5, firstTimeout=5, timeout=5)
+    assert (retries.retries, retries.confirmed) == (0, False)
+
+    answered = requests[:2] + [logEntry(11, RECEIVE_LINES["ACK"])]
+    retries = DhcpLeaseMonitor(ScriptedCursor(answered), utcOffset=0).waitForRetryPattern(
+        "REQUEST", minRetries=3, maxRetries=5, firstTimeout=5, timeout=5)
+    assert (retries.retries, retries.confirmed, retries.answered) == (1, False, True)
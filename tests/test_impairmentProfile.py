@@ -0,0 +1,66 @@
+import pytest
+
+from testCaseUtils.impairmentProfile import bursts, offAt, parseProfile, ProfileRunner, ProfileStep, ramp, window
+
+
+def referenceRamp(parameter, start, end, duration, step):
+    """ One value every step seconds from start to end, written out with a loop over the times """
+    steps = []
+    changes = int(duration // step)
+    for index in range(changes + 1):
+        value = start + (end - start) * index / changes
+        at = index * duration / changes
+        if parameter == "drop":
+            steps.append(ProfileStep(at, int(round(value)), None))
+        else:
+            steps.append(ProfileStep(at, None, round(value, 1)))
+    return steps
+
+
+def testRamp():
+    assert ramp("delay", 0, 20, duration=60, step=5) == referenceRamp("delay", 0, 20, 60, 5)
+    assert ramp("drop", 0, 100, duration=60, step=20) == referenceRamp("drop", 0, 100, 60, 20)
+    assert ramp("delay", 0, 20, duration=60, step=20)[-1] == ProfileStep(60, None, 20)
+    # a step longer than the duration is one change
+    assert ramp("drop", 0, 100, duration=10, step=60) == [ProfileStep(0, 0, None), ProfileStep(10, 100, None)]
+
+
+def testParseProfile():
+    assert parseProfile("ramp:delay:0:20:60:5") == ramp("delay", 0, 20, duration=60, step=5)
+    assert parseProfile("ramp:delay:0:20:60+off:90") == ramp("delay", 0, 20, duration=60) + offAt(90)
+    assert parseProfile("bursts:100:30:10:60") == [ProfileStep(0, 100, None), ProfileStep(10, None, None),
+                                                   ProfileStep(30, 100, None), ProfileStep(40, None, None)]
+    assert parseProfile("window:10:20:50") == window(10, 20, drop=50)
+    assert bursts(100, 30, 40, 50) == [ProfileStep(0, 100, None), ProfileStep(40, None, None),
+                                       ProfileStep(30, 100, None), ProfileStep(50, None, None)]
+
+
+@pytest.mark.parametrize("spec", ["ramp:drop:0:100:60:0", "ramp:drop:0:100:0", "ramp:drop:0:100:60:-5",
+                                  "bursts:100:0:5:60", "ramp:jitter:0:1:60", "ramp:drop", "off", "spike:1",
+                                  "window:a:b"])
+def testInvalidProfiles(spec):
+    with pytest.raises(ValueError):
+        parseProfile(spec)
+
+
+class RecordingSession(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def switchImpairment_ON(self, impairment, drop=None, delay=None, filterNo=1):
+        self.calls.append(("ON", impairment, drop, delay, filterNo))
+
+    def switchImpairment_OFF(self, filterNo=1):
+        self.calls.append(("OFF", filterNo))
+
+
+def testZeroStepsSwitchOff():
+    session = RecordingSession()
+    runner = ProfileRunner(session, 3)
+    profile = ramp("delay", 0, 0.2, duration=0.02, step=0.01) + [ProfileStep(0.03, 0, None)] + offAt(0.04)
+    runner.start("CDN", profile)
+    assert runner.wait(timeout=5)
+    assert session.calls == [("OFF", 3), ("ON", "CDN", None, 0.1, 3), ("ON", "CDN", None, 0.2, 3), ("OFF", 3),
+                             ("OFF", 3)]
+    assert len(runner.applied) == 5
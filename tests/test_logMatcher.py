@@ -0,0 +1,64 @@
+import random
+
+from testCaseUtils.logcatStream import LogEntry
+from testCaseUtils.logMatcher import AhoCorasick, MultiPatternMatcher, parseTagSpec, PRIORITIES
+
+
+def naiveSearch(patterns, text):
+    return set(index for index, pattern in enumerate(patterns) if pattern in text)
+
+
+def naiveMatch(checks, entry):
+    hits = []
+    for tag, search in checks:
+        name, minPriority = parseTagSpec(tag)
+        if name is not None and name != entry.tag:
+            continue
+        if PRIORITIES.index(entry.priority) < minPriority:
+            continue
+        if search and search not in entry.message:
+            continue
+        hits.append((tag, search))
+    return hits
+
+
+def entry(tag, priority, message):
+    return LogEntry("10-18 10:00:00.000", "1", "2", priority, tag, message, message)
+
+
+def testOverlappingPatterns():
+    patterns = ["he", "she", "his", "hers", "DHCPREQUEST", "REQUEST"]
+    automaton = AhoCorasick(patterns)
+    for text in ["ushers", "ahishers", "Broadcasting DHCPREQUEST", "", "h", "REQUES"]:
+        assert automaton.search(text) == naiveSearch(patterns, text)
+
+
+def testRandomTextsMatchNaiveSearch():
+    generator = random.Random(5)
+    for _ in range(200):
+        patterns = list(set("".join(generator.choice("abc") for _ in range(generator.randint(1, 4)))
+                            for _ in range(generator.randint(1, 8))))
+        text = "".join(generator.choice("abcd") for _ in range(generator.randint(0, 40)))
+        assert AhoCorasick(patterns).search(text) == naiveSearch(patterns, text)
+
+
+def testParseTagSpec():
+    assert parseTagSpec("DhcpClient:D") == ("DhcpClient", PRIORITIES.index("D"))
+    assert parseTagSpec("VeopApp") == ("VeopApp", 0)
+    assert parseTagSpec("chromium:E") == ("chromium", PRIORITIES.index("E"))
+    assert parseTagSpec(None) == (None, 0)
+
+
+def testMatcherMatchesNaiveChecks():
+    checks = [("VeopApp:D", "first.mpd"), ("VeopApp:E", "Unable to connect to"), ("DhcpClient:D", "DHCPREQUEST"),
+              ("DhcpClient", None), (None, "www.google.com"), ("chromium:I", "Global connection")]
+    matcher = MultiPatternMatcher(checks)
+    generator = random.Random(7)
+    tags = ["VeopApp", "DhcpClient", "chromium", "Other"]
+    messages = ["GET first.mpd", "Unable to connect to www.google.com", "Broadcasting DHCPREQUEST",
+                "Global connection up", "nothing", ""]
+    entries = [entry(generator.choice(tags), generator.choice("VDIWEF"), generator.choice(messages))
+               for _ in range(300)]
+    for logEntry in entries:
+        assert [(hit.tag, hit.search) for hit in matcher.match(logEntry)] == naiveMatch(checks, logEntry)
+    assert len(matcher.scan(entries)) == sum(len(naiveMatch(checks, logEntry)) for logEntry in entries)
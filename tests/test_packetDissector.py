@@ -0,0 +1,127 @@
+import socket
+import struct
+
+from testCaseUtils.packetDissector import (dissect, readPcap, LINKTYPE_ETHERNET, LINKTYPE_LINUX_SLL, LINKTYPE_RAW,
+                                           DHCP_MAGIC_COOKIE)
+
+
+def ipv4(src, dst, protocol, segment, fragmentOffset=0):
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(segment), 1, fragmentOffset, 64, protocol, 0,
+                         socket.inet_aton(src), socket.inet_aton(dst))
+    return header + segment
+
+
+def udp(sourcePort, destinationPort, payload):
+    return struct.pack("!HHHH", sourcePort, destinationPort, 8 + len(payload), 0) + payload
+
+
+def tcp(sourcePort, destinationPort, flags):
+    return struct.pack("!HHIIBBHHH", sourcePort, destinationPort, 1, 0, 0x50, flags, 1024, 0, 0)
+
+
+def ethernet(packet, vlan=False):
+    header = b"\x02\x00\x00\x00\x00\x01" + b"\x02\x00\x00\x00\x00\x02"
+    if vlan:
+        header += b"\x81\x00\x00\x05"
+    return header + b"\x08\x00" + packet
+
+
+def linuxCooked(packet):
+    return b"\x00\x00\x00\x01\x00\x06" + b"\x02\x00\x00\x00\x00\x01\x00\x00" + b"\x08\x00" + packet
+
+
+def dhcp(messageType, xid, mac, yourIP="0.0.0.0", options=b""):
+    bootp = struct.pack("!BBBBIHH4s4s4s4s", 1, 1, 6, 0, xid, 0, 0, b"\0" * 4, socket.inet_aton(yourIP), b"\0" * 4,
+                        b"\0" * 4)
+    bootp += bytes(int(part, 16) for part in mac.split(":")) + b"\0" * 10 + b"\0" * 192
+    return bootp + DHCP_MAGIC_COOKIE + bytes([53, 1, messageType]) + options + b"\xff"
+
+
+def dnsName(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.split(".")) + b"\0"
+
+
+def dnsQuery(transactionId, name, queryType=1):
+    return struct.pack("!HHHHHH", transactionId, 0x0100, 1, 0, 0, 0) + dnsName(name) + struct.pack("!HH", queryType, 1)
+
+
+def dnsResponse(transactionId, name, rcode, answers):
+    # the answers point back to the question name (compression)
+    answer = b"\xc0\x0c" + struct.pack("!HHIH4s", 1, 1, 60, 4, socket.inet_aton("1.2.3.4"))
+    return (struct.pack("!HHHHHH", transactionId, 0x8180 | rcode, 1, answers, 0, 0) + dnsName(name) +
+            struct.pack("!HH", 1, 1) + answer * answers)
+
+
+def writePcap(path, packets, linkType, endian="<", nanoseconds=False):
+    magic = 0xa1b23c4d if nanoseconds else 0xa1b2c3d4
+    with open(path, "wb") as pcap:
+        pcap.write(struct.pack(endian + "IHHiIII", magic, 2, 4, 0, 0, 65535, linkType))
+        for timestamp, frame in packets:
+            fraction = int(round((timestamp % 1) * (1e9 if nanoseconds else 1e6)))
+            pcap.write(struct.pack(endian + "IIII", int(timestamp), fraction, len(frame), len(frame)) + frame)
+
+
+def testDhcpExchange(tmp_path):
+    mac = "02:00:00:aa:bb:01"
+    requested = bytes([50, 4]) + socket.inet_aton("10.0.0.5")
+    lease = bytes([51, 4]) + struct.pack("!I", 120) + bytes([58, 4]) + struct.pack("!I", 60)
+    server = bytes([54, 4]) + socket.inet_aton("10.0.0.1")
+    packets = [
+        (100.25, ethernet(ipv4("0.0.0.0", "255.255.255.255", 17, udp(68, 67, dhcp(1, 0x1234, mac))))),
+        (100.5, ethernet(ipv4("10.0.0.1", "10.0.0.5", 17, udp(67, 68, dhcp(2, 0x1234, mac, "10.0.0.5", server))))),
+        (101.0, ethernet(ipv4("0.0.0.0", "255.255.255.255", 17, udp(68, 67, dhcp(3, 0x1234, mac, options=requested))),
+                         vlan=True)),
+        (101.5, ethernet(ipv4("10.0.0.1", "10.0.0.5", 17, udp(67, 68, dhcp(5, 0x1234, mac, "10.0.0.5", lease))))),
+    ]
+    path = str(tmp_path / "dhcp.pcap")
+    writePcap(path, packets, LINKTYPE_ETHERNET)
+    events = list(dissect(readPcap(path)))
+    assert [event.kind for event in events] == ["DHCP DISCOVER", "DHCP OFFER", "DHCP REQUEST", "DHCP ACK"]
+    assert [event.timestamp for event in events] == [100.25, 100.5, 101.0, 101.5]
+    assert events[0].fields["mac"] == mac
+    assert events[0].fields["xid"] == "00001234"
+    assert events[1].fields["serverId"] == "10.0.0.1"
+    assert events[2].fields["requestedIP"] == "10.0.0.5"
+    assert events[2].detail == "REQUEST xid 00001234 10.0.0.5"
+    assert (events[3].fields["leaseTime"], events[3].fields["renewalTime"]) == (120, 60)
+
+
+def testDnsAndTcp(tmp_path):
+    packets = [
+        (1.0, linuxCooked(ipv4("10.0.0.5", "10.0.0.1", 17, udp(40000, 53, dnsQuery(7, "www.google.com"))))),
+        (1.5, linuxCooked(ipv4("10.0.0.1", "10.0.0.5", 17, udp(53, 40000, dnsResponse(7, "www.google.com", 0, 2))))),
+        (2.0, linuxCooked(ipv4("10.0.0.5", "10.0.0.1", 17, udp(40001, 53, dnsQuery(8, "cdn.example", 28))))),
+        (2.5, linuxCooked(ipv4("10.0.0.1", "10.0.0.5", 17, udp(53, 40001, dnsResponse(8, "cdn.example", 3, 0))))),
+        (3.0, linuxCooked(ipv4("10.0.0.5", "10.0.0.9", 6, tcp(50000, 443, 0x02)))),
+        (3.5, linuxCooked(ipv4("10.0.0.9", "10.0.0.5", 6, tcp(443, 50000, 0x12)))),
+        (4.0, linuxCooked(ipv4("10.0.0.9", "10.0.0.5", 6, tcp(443, 50000, 0x04)))),
+        # plain ACK, not a connect event
+        (4.5, linuxCooked(ipv4("10.0.0.5", "10.0.0.9", 6, tcp(50000, 443, 0x10)))),
+    ]
+    path = str(tmp_path / "any.pcap")
+    writePcap(path, packets, LINKTYPE_LINUX_SLL, endian=">")
+    events = list(dissect(readPcap(path)))
+    assert [event.kind for event in events] == ["DNS query", "DNS response", "DNS query", "DNS response", "TCP SYN",
+                                                "TCP SYN-ACK", "TCP RST"]
+    assert events[0].fields == {"id": 7, "name": "www.google.com", "type": "A"}
+    assert (events[1].fields["rcode"], events[1].fields["answers"]) == ("NOERROR", 2)
+    assert events[2].fields["type"] == "AAAA"
+    assert events[3].fields["rcode"] == "NXDOMAIN"
+    assert events[4].detail == "10.0.0.5:50000 -> 10.0.0.9:443"
+
+
+def testSkipsFragmentsAndTruncatedPackets(tmp_path):
+    query = udp(40000, 53, dnsQuery(9, "www.google.com"))
+    packets = [
+        (1.0, ipv4("10.0.0.5", "10.0.0.1", 17, query, fragmentOffset=10)),
+        (2.0, ipv4("10.0.0.5", "10.0.0.1", 17, query[:14])),
+        (3.0, ipv4("10.0.0.5", "10.0.0.1", 17, query)),
+    ]
+    path = str(tmp_path / "raw.pcap")
+    writePcap(path, packets, LINKTYPE_RAW, nanoseconds=True)
+    with open(path, "ab") as pcap:
+        # the record tcpdump was writing when it was stopped
+        pcap.write(struct.pack("<IIII", 4, 0, 100, 100) + b"\0" * 10)
+    assert [timestamp for timestamp, linkType, frame in readPcap(path)] == [1.0, 2.0, 3.0]
+    events = list(dissect(readPcap(path)))
+    assert [(event.timestamp, event.kind) for event in events] == [(3.0, "DNS query")]
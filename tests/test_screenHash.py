@@ -0,0 +1,57 @@
+import random
+
+from testCaseUtils.screenHash import hammingDistance, HashIndex
+
+
+def bruteForce(entries, hashValue, maxDistance):
+    return sorted((hammingDistance(hashValue, knownHash), label) for knownHash, label in entries
+                  if hammingDistance(hashValue, knownHash) <= maxDistance)
+
+
+def flipBits(generator, hashValue, bits, count):
+    for bit in generator.sample(range(bits), count):
+        hashValue ^= 1 << bit
+    return hashValue
+
+
+def testHammingDistance():
+    assert hammingDistance(0, 0) == 0
+    assert hammingDistance(0b1011, 0b0001) == 2
+    assert hammingDistance((1 << 64) - 1, 0) == 64
+
+
+def searchMatchesBruteForce(bits, chunks, maxDistance, seed):
+    generator = random.Random(seed)
+    index = HashIndex(bits=bits, chunks=chunks)
+    entries = []
+    for label in range(200):
+        knownHash = generator.getrandbits(bits)
+        entries.append((knownHash, label))
+        index.add(knownHash, label)
+        # near duplicates, the screens an index has to find
+        nearHash = flipBits(generator, knownHash, bits, generator.randint(0, maxDistance + 2))
+        entries.append((nearHash, -label))
+        index.add(nearHash, -label)
+    assert len(index) == len(entries)
+    for _ in range(300):
+        knownHash = generator.choice(entries)[0]
+        query = flipBits(generator, knownHash, bits, generator.randint(0, maxDistance + 3))
+        assert sorted(index.search(query, maxDistance)) == bruteForce(entries, query, maxDistance)
+
+
+def testSearch64Bit():
+    searchMatchesBruteForce(bits=64, chunks=4, maxDistance=7, seed=1)
+
+
+def testSearch256Bit():
+    # the 16x16 code text hashes of errorScreenCache
+    searchMatchesBruteForce(bits=256, chunks=16, maxDistance=12, seed=2)
+
+
+def testNearest():
+    index = HashIndex()
+    index.add(0b1111, "four")
+    index.add(0b0111, "three")
+    assert index.nearest(0b0011, maxDistance=7) == (1, "three")
+    assert index.nearest((1 << 64) - 1, maxDistance=7) is None
+    assert HashIndex().nearest(0, maxDistance=7) is None